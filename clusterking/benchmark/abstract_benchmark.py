@@ -67,5 +67,5 @@ class AbstractBenchmarkResult(DataResult):
         Returns:
             None
         """
-        self._data.df[bpoint_column] = self._bpoints
+        self._data._set_column(bpoint_column, self._bpoints)
         self._data.md["bpoint"][bpoint_column] = self._md
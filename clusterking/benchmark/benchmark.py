@@ -3,7 +3,6 @@
 # std
 
 # 3rd
-import copy
 import numpy as np
 from typing import Callable
 
@@ -90,20 +89,10 @@ class Benchmark(AbstractBenchmark):
             )
             return
 
-        clusters = data.df[self.cluster_column]
-
         result = np.full(data.n, False, bool)
-        for cluster in set(clusters):
-            # The indizes of all spoints that are in the current cluster
-            # Note: Do not use to_numpy (requires pandas 0.24)
-            indizes = np.squeeze(
-                np.argwhere(np.array(clusters) == cluster), axis=1
-            )
-            # A data object with only these spoints
-            # todo: Can't we somehow implement this nicer?
-            d_cut = type(data)()
-            d_cut.df = data.df.iloc[indizes]
-            d_cut.md = copy.deepcopy(data.md)
+        for cluster, indizes in data.cluster_rows(self.cluster_column).items():
+            # A data object with only the spoints of the current cluster
+            d_cut = data.subset(indizes)
             m = self.fom(uncondense_distance_matrix(self.metric(d_cut)))
             # The index of the wpoint of the current cluster that has the lowest
             # sum of distances to all other elements in the same cluster
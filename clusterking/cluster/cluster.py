@@ -65,6 +65,6 @@ class ClusterResult(DataResult):
     def write(self, cluster_column="cluster"):
         """ Write results back in the :py:class:`~clusterking.data.Data`
         object. """
-        self._data.df[cluster_column] = self._clusters
+        self._data._set_column(cluster_column, self._clusters)
         self._data.md["cluster"][cluster_column] = self._md
         self._data.rename_clusters(column=cluster_column)
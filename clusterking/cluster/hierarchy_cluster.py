@@ -16,10 +16,13 @@ from clusterking.util.matplotlib_utils import import_matplotlib
 
 
 class HierarchyClusterResult(ClusterResult):
-    def __init__(self, data, md, clusters, hierarchy, worker_id):
+    def __init__(
+        self, data, md, clusters, hierarchy, worker_id, data_fingerprint=None
+    ):
         super().__init__(data=data, md=md, clusters=clusters)
         self._hierarchy = hierarchy
         self._worker_id = worker_id
+        self._data_fingerprint = data_fingerprint
 
     @property
     def hierarchy(self):
@@ -36,6 +39,13 @@ class HierarchyClusterResult(ClusterResult):
         """
         return id(self._data)
 
+    @property
+    def data_fingerprint(self) -> Optional[str]:
+        """ Fingerprint (see :meth:`clusterking.data.Data.fingerprint`) of the
+        data that the HierarchyCluster worker was run on.
+        """
+        return self._data_fingerprint
+
     def dendrogram(
         self,
         output: Optional[Union[None, str, pathlib.Path]] = None,
@@ -235,20 +245,21 @@ class HierarchyCluster(Cluster):
                         id(self), reuse_hierarchy_from.worker_id
                     )
                 )
-            if not id(data) == reuse_hierarchy_from.data_id:
+            # Compare the content rather than the id, so that the
+            # hierarchy can also be reused for copies or reloaded data
+            fingerprint = data.fingerprint()
+            if not fingerprint == reuse_hierarchy_from.data_fingerprint:
                 raise ValueError(
                     "It seems like the hierarchy you passed corresponds to a"
                     " different data object than the one you gave me now. "
-                    "IDs don't match (passed to me: {} vs "
+                    "Fingerprints don't match (passed to me: {} vs "
                     "reuse_hierarchy_from: {})".format(
-                        id(data), reuse_hierarchy_from.data_id
+                        fingerprint, reuse_hierarchy_from.data_fingerprint
                     )
                 )
-            # Without caching properties of data and cluster class, we can't
-            # really check that they weren't modified in place, so this is
-            # about all we can do right now.
             hierarchy = reuse_hierarchy_from.hierarchy
         else:
+            fingerprint = data.fingerprint()
             hierarchy = self._build_hierarchy(data)
 
         # noinspection PyTypeChecker
@@ -262,4 +273,5 @@ class HierarchyCluster(Cluster):
             clusters=clusters,
             hierarchy=hierarchy,
             worker_id=id(self),
+            data_fingerprint=fingerprint,
         )
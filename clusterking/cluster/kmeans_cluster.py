@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 # 3rd
+import numpy as np
 import sklearn.cluster
 
 # ours
@@ -8,6 +9,11 @@ from clusterking.cluster.cluster import Cluster, ClusterResult
 from clusterking.util.metadata import failsafe_serialize, nested_dict
 
 
+#: Options of :func:`sklearn.cluster.KMeans` that only choose how the result
+#: is computed and that :func:`sklearn.cluster.MiniBatchKMeans` doesn't accept
+_KMEANS_ONLY_KWARGS = ("algorithm", "copy_x")
+
+
 class KmeansClusterResult(ClusterResult):
     pass
 
@@ -28,26 +34,95 @@ class KmeansCluster(Cluster):
         r = c.run(d)                        # Perform clustering on data
         r.write()                           # Write results back to data
 
+    For data that doesn't fit in memory, the clustering can be performed in
+    chunks of rows (see :meth:`set_chunks`).
     """
 
     def __init__(self):
         super().__init__()
         self._kmeans_kwargs = {}
+        self._chunk_rows = None
         self.md = nested_dict()
 
     def set_kmeans_options(self, **kwargs) -> None:
         """ Configure clustering algorithms.
 
         Args:
-            **kwargs: Keyword arguments to :func:`sklearn.cluster.KMeans`.
+            **kwargs: Keyword arguments to :func:`sklearn.cluster.KMeans`
+                (or :func:`sklearn.cluster.MiniBatchKMeans` if the data is
+                clustered in chunks, see :meth:`set_chunks`, in which case
+                the options ``algorithm`` and ``copy_x`` are ignored).
         """
+        _check_chunks(self._chunk_rows, kwargs)
         self._kmeans_kwargs = kwargs
         self.md["kmeans"]["kwargs"] = failsafe_serialize(kwargs)
 
+    def set_chunks(self, rows=None) -> None:
+        """ Cluster the data in chunks of rows (see
+        :meth:`clusterking.data.Data.iter_chunks`) with
+        :func:`sklearn.cluster.MiniBatchKMeans`, so that only one chunk
+        has to be held in memory at a time. The result is an approximation of
+        the result of the normal k-means algorithm.
+
+        Args:
+            rows: Number of rows per chunk. If None (default), all data is
+                clustered at once. Must be at least the number of clusters.
+
+        Returns:
+            None
+        """
+        _check_chunks(rows, self._kmeans_kwargs)
+        self._chunk_rows = rows
+        self.md["kmeans"]["chunk_rows"] = rows
+
     def run(self, data) -> KmeansClusterResult:
+        if self._chunk_rows is not None:
+            return self._run_chunks(data)
         kmeans = sklearn.cluster.KMeans(**self._kmeans_kwargs)
         matrix = data.data()
         kmeans.fit(matrix)
         return KmeansClusterResult(
             data=data, md=self.md, clusters=kmeans.predict(matrix)
         )
+
+    def _run_chunks(self, data) -> KmeansClusterResult:
+        kmeans = _minibatch_kmeans(self._kmeans_kwargs)
+        for _, matrix in data.iter_chunks(self._chunk_rows, arrays=True):
+            kmeans.partial_fit(matrix)
+        clusters = [
+            kmeans.predict(matrix)
+            for _, matrix in data.iter_chunks(self._chunk_rows, arrays=True)
+        ]
+        return KmeansClusterResult(
+            data=data,
+            md=self.md,
+            clusters=np.concatenate(clusters) if clusters else np.array([]),
+        )
+
+
+def _minibatch_kmeans(kwargs) -> sklearn.cluster.MiniBatchKMeans:
+    """ :func:`sklearn.cluster.MiniBatchKMeans` object with those of the
+    k-means options that apply to it.
+    """
+    kwargs = {
+        key: value
+        for key, value in kwargs.items()
+        if key not in _KMEANS_ONLY_KWARGS
+    }
+    return sklearn.cluster.MiniBatchKMeans(**kwargs)
+
+
+def _check_chunks(rows, kwargs) -> None:
+    """ Raise ValueError if chunks of ``rows`` rows can't be clustered with
+    the k-means options ``kwargs``: The first chunk initializes the clusters,
+    so it needs at least as many rows as there are clusters.
+    """
+    if rows is None:
+        return
+    n_clusters = _minibatch_kmeans(kwargs).n_clusters
+    if rows < n_clusters:
+        raise ValueError(
+            "Chunks of {} rows are too small for {} clusters.".format(
+                rows, n_clusters
+            )
+        )
@@ -43,9 +43,22 @@ class TestHierarchyCluster(MyTestCase):
         r2.write(cluster_column="reused")
         self.assertListEqual(d.df["cluster"].tolist(), d.df["reused"].tolist())
 
+    def test_reuse_hierarchy_copy(self):
+        d = self.d.copy()
+        c = HierarchyCluster()
+        c.set_metric("euclidean")
+        c.set_max_d(1.5)
+        r = c.run(d)
+        r.write()
+        e = Data(self.ddir / self.dname)
+        r2 = c.run(e, reuse_hierarchy_from=r)
+        self.assertIs(r2.hierarchy, r.hierarchy)
+        self.assertEqual(r2.data_fingerprint, r.data_fingerprint)
+
     def test_reuse_hierarchy_fail_different_data(self):
         d = self.d.copy()
         e = self.d.copy()
+        e.df["bin0"] += 1
         c = HierarchyCluster()
         c.set_metric("euclidean")
         c.set_max_d(1.5)
@@ -55,6 +68,19 @@ class TestHierarchyCluster(MyTestCase):
             c.run(e, reuse_hierarchy_from=r)
         self.assertTrue("different data object" in str(ex.exception))
 
+    def test_reuse_hierarchy_fail_edited_data(self):
+        d = self.d.copy()
+        c = HierarchyCluster()
+        c.set_metric("euclidean")
+        c.set_max_d(1.5)
+        r = c.run(d)
+        r.write()
+        # Edit the data in place after its fingerprint has been computed
+        d.df.loc[d.df.index[0], "bin0"] += 1
+        with self.assertRaises(ValueError) as ex:
+            c.run(d, reuse_hierarchy_from=r)
+        self.assertTrue("different data object" in str(ex.exception))
+
     def test_reuse_hierarchy_fail_different_cluster(self):
         d = self.d.copy()
         c = HierarchyCluster()
@@ -22,6 +22,37 @@ class TestKmeansCluster(unittest.TestCase):
         r.write()
         self.assertEqual(len(self.d.clusters()), 3)
 
+    def test_chunks(self):
+        c = KmeansCluster()
+        c.set_kmeans_options(n_clusters=3, random_state=0, n_init=3)
+        c.set_chunks(rows=4)
+        d = Data(self.ddir / self.dname, lazy=True)
+        r = c.run(d)
+        self.assertIsNotNone(d._df_loader)
+        r.write()
+        self.assertEqual(len(d.clusters()), 3)
+        self.assertEqual(len(d.df["cluster"]), len(self.d.df))
+
+    def test_chunks_kmeans_options(self):
+        c = KmeansCluster()
+        # Options that only MiniBatchKMeans doesn't support are ignored
+        c.set_kmeans_options(
+            n_clusters=3, random_state=0, algorithm="lloyd", copy_x=False
+        )
+        c.set_chunks(rows=4)
+        r = c.run(self.d)
+        r.write()
+        self.assertEqual(len(self.d.clusters()), 3)
+
+    def test_chunks_too_small(self):
+        c = KmeansCluster()
+        c.set_kmeans_options(n_clusters=3)
+        with self.assertRaises(ValueError):
+            c.set_chunks(rows=2)
+        c.set_chunks(rows=3)
+        with self.assertRaises(ValueError):
+            c.set_kmeans_options(n_clusters=5)
+
 
 if __name__ == "__main__":
     unittest.main()
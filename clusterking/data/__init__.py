@@ -10,8 +10,18 @@ If you do not need to include errors in your analysis, use
 Both classes inherit from a very basic class,
 :py:class:`~clusterking.data.DFMD`, which provides basic input and output
 methods.
+
+:py:class:`~clusterking.data.ArrayData` behaves like
+:py:class:`~clusterking.data.Data`, but keeps the columns in NumPy arrays and
+builds the dataframe only when it is accessed.
+
+Many data objects with the same columns (e.g. the samples of a stability
+test) can be saved in a single file with
+:py:class:`~clusterking.data.DataContainer`.
 """
 
 from clusterking.data.dwe import DataWithErrors
 from clusterking.data.data import Data
 from clusterking.data.dfmd import DFMD
+from clusterking.data.array_data import ArrayData
+from clusterking.data.container import DataContainer
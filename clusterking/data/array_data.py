@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+
+# std
+import copy
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+# 3rd
+import numpy as np
+import pandas as pd
+
+# ours
+from clusterking.data.dfmd import DFMD
+from clusterking.data.data import Data
+
+
+class ArrayData(Data):
+    """ Variant of :py:class:`~clusterking.data.Data` that keeps the columns
+    in NumPy arrays rather than in a dataframe: The parameter values and the
+    bin contents as one two-dimensional array each, all other columns (e.g.
+    cluster numbers and benchmark points) as separate one-dimensional arrays
+    with their own data types.
+
+    Getting the bin contents, selecting rows (:meth:`subset`,
+    :meth:`~clusterking.data.Data.fix_param`, ...), the rows of the
+    clusters, the fingerprint and writing cluster numbers or benchmark points
+    work directly on the arrays without the overhead of pandas. This makes a
+    difference for operations on small to medium sized data that are
+    repeated many times, e.g. in stability tests.
+
+    The dataframe :attr:`df` is only built when it is accessed (e.g. by
+    plots). As it can be modified, from then on it holds the data (and this
+    object behaves like :py:class:`~clusterking.data.Data`) until
+    :meth:`to_arrays` is called:
+
+    .. code-block:: python
+
+        d = ArrayData("/path/to/file.sql")  # Or: ArrayData.from_data(data)
+        d.data()  # No dataframe involved
+        d.df  # Dataframe is built
+        d.to_arrays()  # Back to arrays
+
+    The arrays are read-only and never modified. Selecting rows with
+    slices therefore returns views rather than copies.
+    """
+
+    def __init__(self, *args, **kwargs):
+        #: Columns as arrays (None if the dataframe holds the data)
+        self._arrays = None  # type: Optional[_ColumnArrays]
+        super().__init__(*args, **kwargs)
+        if self._df_loader is None:
+            self.to_arrays()
+
+    @classmethod
+    def from_data(cls, data: Data) -> "ArrayData":
+        """ Array based copy of a data object.
+
+        Args:
+            data: :py:class:`~clusterking.data.Data` object
+
+        Returns:
+            :py:class:`ArrayData` object
+        """
+        new = cls()
+        new.md = copy.deepcopy(data.md)
+        new.log = data.log
+        new.df = data.df
+        new.to_arrays()
+        return new
+
+    def to_arrays(self) -> None:
+        """ Move the data from the dataframe (back) into arrays. Afterwards
+        :attr:`df` is built again when it is accessed.
+
+        Returns:
+            None
+        """
+        if self._arrays is not None:
+            return
+        self._arrays = _ColumnArrays.from_df(
+            DFMD.df.fget(self), self._block_columns()
+        )
+        self._df = None
+
+    def _block_columns(self) -> List[List[str]]:
+        """ Groups of columns that are saved as two-dimensional arrays """
+        # Don't use par_cols, as it would add keys to the metadata if they
+        # don't exist.
+        par_cols = self.md.get("scan", {}).get("spoints", {}).get("coeffs")
+        return [list(par_cols or []), ["bin"]]
+
+    def _array_mode(self) -> bool:
+        """ True if the arrays hold the data """
+        if self._arrays is None and self._df_loader is not None:
+            # Not loaded yet: Load directly into arrays
+            self.to_arrays()
+        return self._arrays is not None
+
+    # **************************************************************************
+    # Dataframe
+    # **************************************************************************
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """ :py:class:`pandas.DataFrame` with all of the data. Built from the
+        arrays on first access. Afterwards, it holds the data (and can be
+        modified) until :meth:`to_arrays` is called.
+        """
+        if self._arrays is not None:
+            self._df = self._arrays.to_df()
+            self._arrays = None
+        return DFMD.df.fget(self)
+
+    @df.setter
+    def df(self, value: pd.DataFrame) -> None:
+        self._arrays = None
+        DFMD.df.fset(self, value)
+
+    def _set_df_loader(self, loader: Callable[[], pd.DataFrame]) -> None:
+        # Documented in DFMD
+        super()._set_df_loader(loader)
+        # The loader replaces the data
+        self._arrays = None
+
+    def write(self, *args, **kwargs) -> None:
+        # Documented in DFMD
+        arrays = self._arrays
+        super().write(*args, **kwargs)
+        if arrays is not None:
+            # Writing doesn't modify the dataframe, so we can go back to the
+            # arrays
+            self._arrays = arrays
+            self._df = None
+
+    write.__doc__ = DFMD.write.__doc__
+
+    def copy(self, deep=True, data=True, memo=None):
+        # Documented in DFMD
+        if not self._array_mode():
+            return super().copy(deep=deep, data=data, memo=memo)
+        new = super().copy(deep=deep, data=False, memo=memo)
+        if data:
+            # The arrays are never modified, so they can be shared
+            new._arrays = self._arrays
+            new._df = None
+        return new
+
+    copy.__doc__ = DFMD.copy.__doc__
+
+    # **************************************************************************
+    # Caching and column access
+    # **************************************************************************
+
+    def _cache_key(self) -> tuple:
+        if self._arrays is not None:
+            # A new object is created whenever a column is changed
+            return (self._arrays,)
+        return super()._cache_key()
+
+    def _cache_snapshot(self) -> Any:
+        if self._arrays is not None:
+            return None
+        return super()._cache_snapshot()
+
+    def _columns(self) -> List[str]:
+        if self._array_mode():
+            return list(self._arrays.columns)
+        return super()._columns()
+
+    def _column(self, column: str) -> np.ndarray:
+        if self._array_mode():
+            return self._arrays.column(column)
+        return super()._column(column)
+
+    def _values(self, columns: List[str]) -> np.ndarray:
+        if self._array_mode():
+            return self._arrays.values(columns)
+        return super()._values(columns)
+
+    def _index_values(self) -> np.ndarray:
+        if self._array_mode():
+            return self._arrays.index
+        return super()._index_values()
+
+    def _fingerprint_data(self) -> str:
+        if self._array_mode():
+            # The arrays are never modified, so the hash can be cached
+            return self._cached("fingerprint", super()._fingerprint_data)
+        return super()._fingerprint_data()
+
+    def _set_column(self, column: str, values: Any) -> None:
+        if self._array_mode():
+            self._arrays = self._arrays.with_column(column, values)
+        else:
+            super()._set_column(column, values)
+
+    def _bin_values(self) -> np.ndarray:
+        if self._array_mode():
+            return self._arrays.values(self.bin_cols)
+        return super()._bin_values()
+
+    @property
+    def n(self) -> int:
+        """ Number of points in parameter space that were sampled. """
+        if self._array_mode():
+            return len(self._arrays.index)
+        return len(self.df)
+
+    # **************************************************************************
+    # Chunks and subsets
+    # **************************************************************************
+
+    def iter_chunks(self, rows: Optional[int] = None, arrays=False) -> Iterator:
+        # Documented in Data
+        if self._arrays is None:
+            # Also covers lazily loaded data, which is read chunk by chunk
+            yield from super().iter_chunks(rows=rows, arrays=arrays)
+            return
+        if rows is None:
+            rows = self.chunk_rows
+        if rows < 1:
+            raise ValueError("Number of rows per chunk has to be positive.")
+        for start in range(0, self.n, rows):
+            if arrays:
+                chunk = self._arrays.take(slice(start, start + rows))
+                yield chunk.values(self.par_cols), chunk.values(self.bin_cols)
+            else:
+                yield self.subset(slice(start, start + rows))
+
+    iter_chunks.__doc__ = Data.iter_chunks.__doc__
+
+    def subset(
+        self, rows: Union[slice, np.ndarray, List[int]], inplace=False
+    ) -> Optional["ArrayData"]:
+        """ Keep only some of the rows (sample points). Slices of the rows
+        are views of the arrays of this object, other selections copy only
+        the selected rows. The metadata is copied.
+
+        Args:
+            rows: Slice, boolean mask or array of row numbers (positions, not
+                index labels) of the rows to keep
+            inplace: If True, the current object is modified, if False,
+                a new object is returned.
+
+        Returns:
+            None or ArrayData
+        """
+        if not self._array_mode():
+            return super().subset(rows, inplace=inplace)
+        if not isinstance(rows, slice):
+            rows = np.asarray(rows)
+        arrays = self._arrays.take(rows)
+        if inplace:
+            self._arrays = arrays
+            return None
+        new = type(self)()
+        new.md = copy.deepcopy(self.md)
+        new.log = self.log
+        new._arrays = arrays
+        new._df = None
+        return new
+
+
+def _read_only(array):
+    """ Mark numpy arrays as read-only (other arrays are returned as they
+    are).
+    """
+    if isinstance(array, np.ndarray) and array.flags.writeable:
+        array.flags.writeable = False
+    return array
+
+
+class _ColumnArrays(object):
+    """ Read-only arrays with the columns and the index of a dataframe. Groups
+    of columns with the same data type (parameters, bin contents) are kept
+    together as C-contiguous two-dimensional arrays. Instances are never
+    modified, changing a column gives a new instance.
+    """
+
+    def __init__(
+        self,
+        columns: List[str],
+        arrays: Dict[str, Any],
+        blocks: Dict[tuple, np.ndarray],
+        index: np.ndarray,
+        index_name: Any,
+    ):
+        #: Names of all columns in order
+        self.columns = columns
+        #: Column name to array of values (views of the blocks for the
+        #: columns of a block; pandas extension arrays for columns with
+        #: extension data types)
+        self.arrays = arrays
+        #: Tuple of column names to two-dimensional array
+        self.blocks = blocks
+        #: Values of the index
+        self.index = index
+        #: Name of the index
+        self.index_name = index_name
+
+    @classmethod
+    def from_df(
+        cls, df: pd.DataFrame, block_columns: List[List[str]]
+    ) -> "_ColumnArrays":
+        """ Arrays of a dataframe.
+
+        Args:
+            df: Dataframe
+            block_columns: Groups of columns to keep together (if they are in
+                the dataframe and have the same numpy data type). The special
+                value ``["bin"]`` stands for all bin columns.
+
+        Returns:
+            :class:`_ColumnArrays`
+        """
+        columns = list(df.columns)
+        blocks = {}
+        arrays = {}
+        for cols in block_columns:
+            if cols == ["bin"]:
+                cols = [col for col in columns if col.startswith("bin")]
+            cols = [col for col in cols if col in columns]
+            dtypes = set(df[col].dtype for col in cols)
+            if not cols or len(dtypes) != 1:
+                continue
+            if not isinstance(dtypes.pop(), np.dtype):
+                continue
+            # With copy-on-write, later changes of the dataframe don't affect
+            # views of its arrays
+            block = np.ascontiguousarray(df[cols].to_numpy())
+            blocks[tuple(cols)] = _read_only(block)
+            for i, col in enumerate(cols):
+                arrays[col] = block[:, i]
+        for col in columns:
+            if col in arrays:
+                continue
+            if isinstance(df[col].dtype, np.dtype):
+                values = df[col].to_numpy()
+            else:
+                values = df[col].array
+            arrays[col] = _read_only(values)
+        return cls(
+            columns=columns,
+            arrays=arrays,
+            blocks=blocks,
+            index=_read_only(df.index.to_numpy()),
+            index_name=df.index.name,
+        )
+
+    @property
+    def n(self) -> int:
+        """ Number of rows """
+        return len(self.index)
+
+    def column(self, column: str) -> np.ndarray:
+        """ Values of one column as numpy array """
+        return np.asarray(self.arrays[column])
+
+    def values(self, columns: List[str]) -> np.ndarray:
+        """ Values of several columns as array of shape
+        ``n x len(columns)``
+        """
+        columns = tuple(columns)
+        if columns in self.blocks:
+            return self.blocks[columns]
+        if not columns:
+            return np.zeros((self.n, 0))
+        return np.column_stack([self.column(col) for col in columns])
+
+    def take(self, rows: Union[slice, np.ndarray]) -> "_ColumnArrays":
+        """ Arrays with only some of the rows.
+
+        Args:
+            rows: Slice, boolean mask or array of row numbers
+
+        Returns:
+            :class:`_ColumnArrays`
+        """
+        blocks = {
+            cols: _read_only(block[rows]) for cols, block in self.blocks.items()
+        }
+        arrays = {}
+        for cols, block in blocks.items():
+            for i, col in enumerate(cols):
+                arrays[col] = block[:, i]
+        for col, values in self.arrays.items():
+            if col not in arrays:
+                arrays[col] = _read_only(values[rows])
+        return _ColumnArrays(
+            columns=list(self.columns),
+            arrays=arrays,
+            blocks=blocks,
+            index=_read_only(self.index[rows]),
+            index_name=self.index_name,
+        )
+
+    def with_column(self, column: str, values: Any) -> "_ColumnArrays":
+        """ Arrays with a new or replaced column.
+
+        Args:
+            column: Name of the column
+            values: Scalar or array-like with one value per row
+
+        Returns:
+            :class:`_ColumnArrays`
+        """
+        if isinstance(values, (pd.Series, pd.Index)):
+            values = values.to_numpy()
+        if np.ndim(values) == 0:
+            values = np.full(self.n, values)
+        else:
+            values = np.array(values)
+        if not values.shape == (self.n,):
+            raise ValueError(
+                "Length of values ({}) does not match the number of rows "
+                "({}).".format(len(values), self.n)
+            )
+        arrays = dict(self.arrays)
+        arrays[column] = _read_only(values)
+        # The other columns of the block stay available as views
+        blocks = {
+            cols: block
+            for cols, block in self.blocks.items()
+            if column not in cols
+        }
+        columns = list(self.columns)
+        if column not in columns:
+            columns.append(column)
+        return _ColumnArrays(
+            columns=columns,
+            arrays=arrays,
+            blocks=blocks,
+            index=self.index,
+            index_name=self.index_name,
+        )
+
+    def to_df(self) -> pd.DataFrame:
+        """ Build a dataframe (with copies of the arrays) """
+        return pd.DataFrame(
+            {col: self.arrays[col] for col in self.columns},
+            index=pd.Index(self.index, name=self.index_name),
+            columns=self.columns,
+        )
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+""" Many :class:`~clusterking.data.Data` objects with the same columns (e.g.
+the samples of :class:`~clusterking.stability.noisysamplestability.NoisySample`)
+in a single file.
+"""
+
+# std
+import copy
+import json
+import logging
+import sqlite3
+from pathlib import PurePath, Path
+from typing import Union, Optional, Iterable, Iterator
+
+# 3rd
+import pandas as pd
+
+# ours
+from clusterking.data.data import Data
+from clusterking.data.storage import (
+    get_storage,
+    restore_dtypes,
+    storage_metadata,
+)
+from clusterking.util.metadata import turn_into_nested_dict, nested_dict
+from clusterking.util.log import get_logger
+from clusterking.util.cli import handle_overwrite
+
+
+class DataContainer(object):
+    """ Container file that holds many data objects that share the same
+    columns. The file is an SQLite database with a table ``df`` with the rows
+    of all data objects (with an additional indexed column ``sample``), a
+    table ``md`` with the metadata that is common to all data objects (saved
+    only once) and a table ``samples`` with the parts of the metadata that
+    differ between the data objects.
+
+    Individual data objects can be loaded without reading the rest of the
+    file:
+
+    .. code-block:: python
+
+        DataContainer.write("samples.sql", [data1, data2, data3])
+        dc = DataContainer("samples.sql")
+        len(dc)  # 3
+        data2 = dc[1]
+        for data in dc:
+            ...
+    """
+
+    def __init__(
+        self,
+        path: Union[str, PurePath],
+        log: Optional[Union[str, logging.Logger]] = None,
+    ):
+        """ Open container file. Only the metadata is read right away.
+
+        Args:
+            path: Path to the container file as written by :meth:`write`
+            log: Optional: instance of :py:class:`logging.Logger` or name of
+                logger to be created
+        """
+        if isinstance(log, logging.Logger):
+            self.log = log
+        else:
+            self.log = get_logger(log or "DataContainer")
+        #: Path to the container file
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise FileNotFoundError(
+                "File '{}' doesn't exist.".format(self.path)
+            )
+        connection = sqlite3.connect(str(self.path))
+        try:
+            md_json = connection.execute("SELECT md FROM md LIMIT 1").fetchone()
+            samples = connection.execute(
+                "SELECT sample, md FROM samples ORDER BY sample"
+            ).fetchall()
+        except sqlite3.DatabaseError:
+            raise ValueError(
+                "'{}' is not a data container file.".format(self.path)
+            )
+        finally:
+            connection.close()
+        self._md = turn_into_nested_dict(json.loads(md_json[0]))
+        storage_md = self._md.pop("storage", {})
+        self._dtypes = storage_md.get("dtypes", {})
+        #: Changed and removed top level metadata keys of every data object
+        self._md_diffs = [json.loads(md) for _, md in samples]
+
+    def __len__(self) -> int:
+        return len(self._md_diffs)
+
+    def __getitem__(self, index: int) -> Data:
+        return self.get(index)
+
+    def __iter__(self) -> Iterator[Data]:
+        for index in range(len(self)):
+            yield self.get(index)
+
+    @property
+    def md(self) -> nested_dict:
+        """ Metadata that is common to all data objects """
+        return copy.deepcopy(self._md)
+
+    # **************************************************************************
+    # Reading
+    # **************************************************************************
+
+    def get(self, index: int, cls=Data, lazy=False, compact=False) -> Data:
+        """ Load one data object.
+
+        Args:
+            index: Number of the data object (negative numbers count from the
+                end)
+            cls: Class of the returned object, e.g.
+                :class:`~clusterking.data.DataWithErrors`
+            lazy: Only read the dataframe on first access (see
+                :class:`~clusterking.data.DFMD`)
+            compact: Load the data with compact data types (see
+                :meth:`~clusterking.data.Data.compact`)
+
+        Returns:
+            Data object
+        """
+        if not -len(self) <= index < len(self):
+            raise IndexError(
+                "Index {} out of range for container with {} data "
+                "objects.".format(index, len(self))
+            )
+        index %= len(self)
+        data = cls()
+        data.md = self.get_metadata(index)
+        # Unlike a closure, this can be pickled
+        loader = _SampleLoader(self.path, index, self._dtypes, compact=compact)
+        if lazy:
+            data._set_df_loader(loader)
+        else:
+            data.df = loader()
+        return data
+
+    def get_metadata(self, index: int) -> nested_dict:
+        """ Metadata of one data object.
+
+        Args:
+            index: Number of the data object
+
+        Returns:
+            Metadata as nested dictionary
+        """
+        md = self.md
+        diff = self._md_diffs[index]
+        md.update(turn_into_nested_dict(diff["changed"]))
+        for key in diff["removed"]:
+            md.pop(key, None)
+        return md
+
+    # **************************************************************************
+    # Writing
+    # **************************************************************************
+
+    @staticmethod
+    def write(
+        path: Union[str, PurePath],
+        datas: Iterable[Data],
+        overwrite="ask",
+        log: Optional[Union[str, logging.Logger]] = None,
+    ) -> None:
+        """ Write data objects to a container file.
+
+        Args:
+            path: Path to output file
+            datas: Data objects. All of them have to have the same columns.
+            overwrite: How to proceed if output file already exists, see
+                :meth:`clusterking.data.DFMD.write`
+            log: Optional: instance of :py:class:`logging.Logger` or name of
+                logger to be created
+
+        Returns:
+            None
+        """
+        if not isinstance(log, logging.Logger):
+            log = get_logger(log or "DataContainer")
+        path = Path(path)
+        datas = list(datas)
+        if not datas:
+            raise ValueError("No data objects to write.")
+        columns = list(datas[0].df.columns)
+        for i, data in enumerate(datas):
+            if not list(data.df.columns) == columns:
+                raise ValueError(
+                    "Data object {} has the columns {}, but {} were "
+                    "expected.".format(i, list(data.df.columns), columns)
+                )
+        handle_overwrite([path], behavior=overwrite, log=log)
+        if not path.parent.is_dir():
+            log.debug("Creating directory '{}'.".format(path.parent))
+            path.parent.mkdir(parents=True)
+
+        storage = get_storage(path, format="sqlite")
+        md = copy.copy(datas[0].md)
+        dtypes = {col: str(dtype) for col, dtype in datas[0].df.dtypes.items()}
+        md["storage"] = storage_metadata(storage, dtypes=dtypes)
+        samples_df = pd.DataFrame(
+            {
+                "sample": range(len(datas)),
+                "md": [_md_diff(datas[0].md, data.md) for data in datas],
+            }
+        )
+        connection = storage._connect(path)
+        try:
+            # Everything is written in a single transaction
+            connection.execute("BEGIN")
+            for i, data in enumerate(datas):
+                df = data.df.rename_axis("index").reset_index()
+                df["sample"] = i
+                if i == 0:
+                    storage._create_table(connection, "df", df)
+                storage._insert(connection, "df", df)
+            md_json = json.dumps(md, sort_keys=True, indent=4)
+            for table, table_df in [
+                ("md", storage._md_df(md_json)),
+                ("samples", samples_df),
+            ]:
+                storage._create_table(connection, table, table_df)
+                storage._insert(connection, table, table_df)
+            storage._create_indices(connection, ["sample"])
+            connection.execute("COMMIT")
+            connection.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            connection.close()
+        log.info("Wrote {} data objects to '{}'.".format(len(datas), path))
+
+
+class _SampleLoader(object):
+    """ Read the dataframe of one data object from a container file. """
+
+    def __init__(self, path: Path, index: int, dtypes: dict, compact=False):
+        self.path = path
+        self.index = index
+        self.dtypes = dtypes
+        self.compact = compact
+
+    def __call__(self) -> pd.DataFrame:
+        return next(self.iter_chunks(None))
+
+    def iter_chunks(self, rows: Optional[int]) -> Iterator[pd.DataFrame]:
+        """ Read the dataframe in chunks of rows (all at once if None) """
+        connection = sqlite3.connect(str(self.path))
+        try:
+            dfs = pd.read_sql_query(
+                "SELECT * FROM df WHERE sample = ?",
+                connection,
+                params=(self.index,),
+                chunksize=rows,
+            )
+            if rows is None:
+                dfs = [dfs]
+            for df in dfs:
+                df = df.drop(columns="sample").set_index("index")
+                yield restore_dtypes(df, self.dtypes, compact=self.compact)
+        finally:
+            connection.close()
+
+
+def _md_diff(md: dict, other: dict) -> str:
+    """ JSON serialized top level keys of ``other`` that differ from ``md``.
+
+    Args:
+        md: Common metadata
+        other: Metadata of one data object
+
+    Returns:
+        JSON string of a dictionary with the keys ``changed`` (dictionary) and
+        ``removed`` (list of keys).
+    """
+
+    def dump(value):
+        return json.dumps(value, sort_keys=True)
+
+    changed = {
+        key: value
+        for key, value in other.items()
+        if key not in md or dump(value) != dump(md[key])
+    }
+    removed = [key for key in md if key not in other]
+    return json.dumps({"changed": changed, "removed": removed}, sort_keys=True)
@@ -2,13 +2,31 @@
 
 # std
 import copy
+import hashlib
+import json
 
 # 3d
 import numpy as np
-from typing import Callable, Union, Iterable, List, Any, Optional, Dict
+import pandas as pd
+import scipy.interpolate
+import scipy.spatial
+from typing import (
+    Callable,
+    Union,
+    Iterable,
+    Iterator,
+    List,
+    Any,
+    Optional,
+    Dict,
+    Tuple,
+)
 
 # ours
 from clusterking.data.dfmd import DFMD
+from clusterking.data.grid import Grid
+from clusterking.data.storage import compact_dtypes
+from clusterking.util.metadata import nested_dict
 
 
 class Data(DFMD):
@@ -21,9 +39,110 @@ class Data(DFMD):
     * The benchmark points after they are selected.
     """
 
+    #: Names of the transformations that are understood by
+    #: :meth:`transformed_data`
+    transformations = ("normalized", "log", "shape", "cumulative")
+
+    #: Default number of rows per chunk for :meth:`iter_chunks`
+    chunk_rows = 10000
+
     def __init__(self, *args, **kwargs):
+        #: Cached derived quantities, see :meth:`_cached`
+        self._cache = {}
+        #: State of the dataframe that the cache belongs to (see
+        #: :meth:`_cache_key`)
+        self._cache_state = None
+        #: Shallow copy of the dataframe that the cache belongs to
+        self._cache_df = None
         super().__init__(*args, **kwargs)
 
+    # **************************************************************************
+    # Caching
+    # **************************************************************************
+
+    def _cache_key(self) -> tuple:
+        """ Objects that describe the state of the dataframe: The dataframe
+        itself, its columns and the arrays that hold the columns. Cached values
+        that were computed for different objects are considered outdated.
+
+        The arrays are replaced when a column is assigned. As the cache holds a
+        shallow copy of the dataframe, pandas' copy-on-write (always enabled
+        since pandas 3.0, which we require) also replaces them when values are
+        modified in place.
+        """
+        df = self.df
+        # There is no public API for the arrays of a dataframe. Getting the
+        # columns one by one would take about as long as many of the cached
+        # computations.
+        return (df, df.columns) + tuple(df._mgr.arrays)
+
+    def _cache_snapshot(self) -> Any:
+        """ Object that the cache holds on to (see :meth:`_cache_key`) """
+        return self.df.copy(deep=False)
+
+    def _cached(self, name: str, func: Callable[[], Any]) -> Any:
+        """ Return the cached value of ``name`` or compute it by calling
+        ``func`` (if the dataframe changed since it was last computed).
+
+        Args:
+            name: Name of the cached quantity
+            func: Function without arguments that computes the quantity
+
+        Returns:
+            Return value of ``func``
+        """
+        key = self._cache_key()
+        state = self._cache_state
+        # Compare by identity (the arrays don't support ==)
+        if (
+            state is None
+            or len(key) != len(state)
+            or not all(new is old for new, old in zip(key, state))
+        ):
+            self._cache = {}
+            self._cache_df = self._cache_snapshot()
+            self._cache_state = key
+        if name not in self._cache:
+            self._cache[name] = func()
+        return self._cache[name]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The cache is rebuilt as needed
+        state["_cache"] = {}
+        state["_cache_state"] = None
+        state["_cache_df"] = None
+        return state
+
+    # **************************************************************************
+    # Column access
+    # **************************************************************************
+    # The methods that are used in performance critical places read and write
+    # the columns through these methods, so that subclasses can store them
+    # differently (see :class:`~clusterking.data.ArrayData`).
+
+    def _columns(self) -> List[str]:
+        """ Names of all columns """
+        return list(self.df.columns)
+
+    def _column(self, column: str) -> np.ndarray:
+        """ Values of one column """
+        return self.df[column].to_numpy()
+
+    def _values(self, columns: List[str]) -> np.ndarray:
+        """ Values of several columns as array of shape
+        ``self.n x len(columns)``
+        """
+        return self.df[columns].to_numpy()
+
+    def _index_values(self) -> np.ndarray:
+        """ Values of the index """
+        return self.df.index.to_numpy()
+
+    def _set_column(self, column: str, values: Any) -> None:
+        """ Set the values of a (new or existing) column """
+        self.df[column] = values
+
     # **************************************************************************
     # Property shortcuts
     # **************************************************************************
@@ -34,9 +153,13 @@ class Data(DFMD):
         distribution. This is automatically read from the
         metadata as set in e.g. :meth:`clusterking.scan.Scanner.run`.
         """
-        columns = list(self.df.columns)
         # todo: more general?
-        return [c for c in columns if c.startswith("bin")]
+        return list(
+            self._cached(
+                "bin_cols",
+                lambda: [c for c in self._columns() if c.startswith("bin")],
+            )
+        )
 
     @property
     def par_cols(self) -> List[str]:
@@ -92,12 +215,56 @@ class Data(DFMD):
             yvar = None
         return xvar, yvar
 
+    @property
+    def grid(self) -> Grid:
+        """ Neighbour relations of the sample points in parameter space, see
+        :class:`~clusterking.data.grid.Grid`. Cached until the dataframe is
+        modified.
+        """
+        return self._cached(
+            "grid_{}".format(self.par_cols),
+            lambda: Grid(
+                {param: self._column(param) for param in self.par_cols},
+                self.par_cols,
+            ),
+        )
+
+    # **************************************************************************
+    # Writing
+    # **************************************************************************
+
+    def _index_columns(self):
+        # Rows are usually selected by their parameter values
+        if "scan" not in self.md:
+            return []
+        return [col for col in self.par_cols if col in self._columns()]
+
     # **************************************************************************
     # Returning things
     # **************************************************************************
 
+    def _bin_values(self) -> np.ndarray:
+        """ Bin contents as stored in the dataframe. If the bin columns are
+        adjacent and share the same data type, this is a view of the
+        dataframe (e.g. of the memory-mapped array when loading files in the
+        ``numpy`` format) rather than a copy.
+        """
+        columns = list(self.df.columns)
+        bin_cols = self.bin_cols
+        if not bin_cols:
+            return self.df[bin_cols].values
+        start = columns.index(bin_cols[0])
+        if columns[start : start + len(bin_cols)] == bin_cols:
+            return self.df.iloc[:, start : start + len(bin_cols)].values
+        return self.df[bin_cols].values
+
     def data(self, normalize=False) -> np.ndarray:
         """ Returns all histograms as a large matrix.
+        Without normalization, this is a cached, read-only and C-contiguous
+        array. It is a view of the dataframe if the bin contents are already
+        stored like this (e.g. the memory-mapped array when loading files in
+        the ``numpy`` format). The cache is updated when the dataframe is
+        changed.
 
         Args:
             normalize: Normalize all histograms
@@ -105,13 +272,126 @@ class Data(DFMD):
         Returns:
             numpy.ndarray of shape self.n x self.nbins
         """
-        data = self.df[self.bin_cols].values
+        data = self._cached("data", self._bin_matrix)
         if normalize:
             # Reshaping here is important!
             return data / np.sum(data, axis=1).reshape((self.n, 1))
         else:
             return data
 
+    def _bin_matrix(self) -> np.ndarray:
+        """ Read-only C-contiguous array of the bin contents """
+        data = np.ascontiguousarray(self._bin_values())
+        # This is a new array object (a copy or a view), so this doesn't affect
+        # the arrays of the dataframe
+        data.flags.writeable = False
+        return data
+
+    def fingerprint(self) -> str:
+        """ Hash of the content of the data: The bin contents, the parameter
+        values, the index and the parts of the metadata that affect results
+        computed from the data (e.g. the errors of
+        :class:`~clusterking.data.DataWithErrors`). Other columns (e.g. cluster
+        numbers) are not included.
+
+        Unlike ``id(data)``, the fingerprint is the same for copies of the
+        data, in other processes and after writing and loading the data, so
+        it can be used to check whether results can be reused.
+        As the dataframe can be modified in place, the data is hashed on every
+        call (this doesn't copy the bin contents if they are stored in one
+        array).
+
+        Returns:
+            Hexadecimal string
+        """
+        data_hash = self._fingerprint_data()
+        md_json = json.dumps(self._fingerprint_md(), sort_keys=True)
+        return hashlib.sha256(
+            (data_hash + md_json).encode("utf-8")
+        ).hexdigest()
+
+    def _fingerprint_md(self) -> dict:
+        """ Part of the metadata that is included in :meth:`fingerprint`. """
+        return {}
+
+    def _fingerprint_data(self) -> str:
+        """ Hash of the index, parameter values and bin contents """
+        columns = self._columns()
+        par_cols = [col for col in self.par_cols if col in columns]
+        # Not the cached self.data(): Read the current values
+        bins = self._bin_values()
+        pars = self._values(par_cols)
+        index = self._index_values()
+        header = {
+            "par_cols": par_cols,
+            "bin_cols": self.bin_cols,
+            "dtypes": [str(bins.dtype), str(pars.dtype), str(index.dtype)],
+            "shape": list(bins.shape),
+        }
+        data_hash = hashlib.sha256(
+            json.dumps(header, sort_keys=True).encode("utf-8")
+        )
+        for array in [index, pars, bins]:
+            data_hash.update(np.ascontiguousarray(array).data)
+        return data_hash.hexdigest()
+
+    def transformed_data(self, transformation: str) -> np.ndarray:
+        """ Returns all histograms after applying a transformation to them.
+        Unless ``normalize=True`` was passed to
+        :meth:`clusterking.scan.Scanner.set_dfunction`, the scanner stores the
+        raw bin contents, so that the normalization can be chosen afterwards
+        without repeating the scan.
+        The result is cached until the dataframe is changed.
+
+        Args:
+            transformation: One of the following:
+
+                * ``normalized``: Divide each histogram by its sum
+                  (same as ``data(normalize=True)``)
+                * ``log``: Natural logarithm of the bin contents
+                * ``shape``: Normalized histogram divided by the bin widths,
+                  i.e. a density that neither depends on the normalization
+                  nor on the binning (same as ``normalized`` if the
+                  distribution was sampled rather than binned)
+                * ``cumulative``: Cumulative sum of the normalized histogram
+
+        Returns:
+            Read-only numpy.ndarray of shape self.n x self.nbins
+        """
+        if transformation not in self.transformations:
+            raise ValueError(
+                "Unknown transformation '{}'. Available: {}.".format(
+                    transformation, ", ".join(self.transformations)
+                )
+            )
+
+        def compute():
+            ret = getattr(self, "_transform_" + transformation)()
+            ret.flags.writeable = False
+            return ret
+
+        return self._cached("transformed_data_" + transformation, compute)
+
+    def _transform_normalized(self) -> np.ndarray:
+        data = self.data()
+        return data / np.sum(data, axis=1).reshape((self.n, 1))
+
+    def _transform_log(self) -> np.ndarray:
+        with np.errstate(divide="ignore"):
+            return np.log(self.data())
+
+    def _transform_shape(self) -> np.ndarray:
+        normalized = self.transformed_data("normalized")
+        binning = self.md["scan"]["dfunction"]["binning"]
+        mode = self.md["scan"]["dfunction"]["binning_mode"]
+        if not binning or mode == "sample":
+            return normalized.copy()
+        widths = np.diff(np.sort(np.array(binning, float)))
+        return normalized / widths.reshape((1, self.nbins))
+
+    def _transform_cumulative(self) -> np.ndarray:
+        return np.cumsum(self.transformed_data("normalized"), axis=1)
+
     def norms(self) -> np.ndarray:
         """ Returns a vector of all normalizations of all histograms (where
         each histogram corresponds to one sampled point in parameter space).
@@ -122,12 +402,53 @@ class Data(DFMD):
         return np.sum(self.data(), axis=1)
 
     def clusters(self, cluster_column="cluster") -> List[Any]:
-        """ Return list of all cluster names (unique)
+        """ Return list of all cluster names (unique and sorted, missing
+        values such as NaN come last)
+
+        Args:
+            cluster_column: Column that contains the cluster names
+        """
+        return list(self._cluster_rows(cluster_column))
+
+    def cluster_rows(self, cluster_column="cluster") -> Dict[Any, np.ndarray]:
+        """ Row numbers (positions in :attr:`df`) of the sample points of
+        every cluster. Cached until the dataframe is modified, so that the
+        rows of all clusters are found in one go rather than by comparing the
+        whole cluster column with every cluster name.
+
+        .. code-block:: python
+
+            for cluster, rows in d.cluster_rows().items():
+                cluster_data = d.data()[rows]
+
+        Args:
+            cluster_column: Column that contains the cluster names
+
+        Returns:
+            Dictionary of cluster name to sorted (read-only) array of row
+            numbers. The clusters are in the order of :meth:`clusters`. Rows
+            with missing cluster names (e.g. NaN) are grouped together, too.
+        """
+        return dict(self._cluster_rows(cluster_column))
+
+    def cluster_sizes(self, cluster_column="cluster") -> Dict[Any, int]:
+        """ Number of sample points in every cluster.
 
         Args:
             cluster_column: Column that contains the cluster names
+
+        Returns:
+            Dictionary of cluster name to number of sample points
         """
-        if cluster_column not in self.df.columns:
+        return {
+            cluster: len(rows)
+            for cluster, rows in self.cluster_rows(cluster_column).items()
+        }
+
+    def _cluster_rows(self, cluster_column: str) -> Dict[Any, np.ndarray]:
+        """ Cached dictionary of cluster name to row numbers (don't modify)
+        """
+        if cluster_column not in self._columns():
             raise ValueError(
                 "The column '{}', which should contain the cluster names"
                 " does not exist in the dataframe. Perhaps your data isn't "
@@ -135,7 +456,23 @@ class Data(DFMD):
                 "(in this case, you can usually specify it with a "
                 "'cluster_column' parameter).".format(cluster_column)
             )
-        return sorted(list(self.df[cluster_column].unique()))
+
+        def build():
+            # Keep missing values as a name (like ``unique``), sorted last
+            codes, names = pd.factorize(
+                self._column(cluster_column), sort=True, use_na_sentinel=False
+            )
+            # Stable sort: The rows of every cluster stay in ascending order
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+            groups = {}
+            for i, name in enumerate(names):
+                rows = order[bounds[i] : bounds[i + 1]]
+                rows.flags.writeable = False
+                groups[name] = rows
+            return groups
+
+        return self._cached("cluster_rows_{}".format(cluster_column), build)
 
     # todo: test me
     def get_param_values(self, param: Optional[Union[None, str]] = None):
@@ -152,12 +489,121 @@ class Data(DFMD):
             return {
                 param: self.get_param_values(param) for param in self.par_cols
             }
-        return self.df[param].unique()
+        return pd.unique(self._column(param))
+
+    # **************************************************************************
+    # Chunks
+    # **************************************************************************
+
+    def iter_chunks(self, rows: Optional[int] = None, arrays=False) -> Iterator:
+        """ Iterate over the sample points in chunks of rows.
+        If the data was loaded with ``lazy=True`` and the dataframe hasn't
+        been accessed yet, the chunks are read from the file one after the
+        other, so that the whole dataframe is never held in memory:
+
+        .. code-block:: python
+
+            d = Data("/path/to/huge/file.parquet", lazy=True)
+            for params, bins in d.iter_chunks(arrays=True):
+                ...
+
+        Args:
+            rows: Maximal number of rows per chunk. Default:
+                :attr:`chunk_rows`
+            arrays: Yield tuples of the parameter values
+                (``rows x self.npars`` array) and the bin contents
+                (``rows x self.nbins`` array) instead of data objects
+
+        Returns:
+            Iterator over data objects of the same class as this object (with
+            a copy of the metadata) or over tuples of arrays
+        """
+        if rows is None:
+            rows = self.chunk_rows
+        for df in self._iter_df(rows):
+            if arrays:
+                bin_cols = [col for col in df.columns if col.startswith("bin")]
+                yield df[self.par_cols].values, df[bin_cols].values
+                continue
+            chunk = type(self)()
+            chunk.df = df
+            chunk.md = copy.deepcopy(self.md)
+            chunk.log = self.log
+            yield chunk
+
+    def _map_chunks(
+        self, func: Callable[["Data"], np.ndarray], rows: Optional[int] = None
+    ) -> np.ndarray:
+        """ Apply a function to all chunks of the data (see
+        :meth:`iter_chunks`) and concatenate the results.
+
+        Args:
+            func: Function that takes a data object and returns an array with
+                one entry per row
+            rows: Maximal number of rows per chunk
+
+        Returns:
+            Array
+        """
+        results = [func(chunk) for chunk in self.iter_chunks(rows)]
+        if not results:
+            # Empty data: Still get the right shape
+            return func(self)
+        if len(results) == 1:
+            return results[0]
+        return np.concatenate(results)
 
     # **************************************************************************
     # Subsample
     # **************************************************************************
 
+    def subset(
+        self, rows: Union[slice, np.ndarray, List[int]], inplace=False
+    ) -> Optional["Data"]:
+        """ Keep only some of the rows (sample points).
+
+        Unlike a deep copy of the whole object, the returned object only
+        refers to the selected rows of this object's dataframe: With pandas'
+        copy-on-write, slices share the memory of the original dataframe until
+        either of them is modified and boolean masks or row numbers only copy
+        the selected rows. The metadata is copied.
+
+        Args:
+            rows: Slice, boolean mask or array of row numbers (positions, not
+                index labels) of the rows to keep
+            inplace: If True, the current Data object is modified, if False,
+                a new Data object is returned.
+
+        Returns:
+            None or Data
+        """
+        if not isinstance(rows, slice):
+            rows = np.asarray(rows)
+        df = self.df.iloc[rows]
+        return self._replace_df(df, inplace=inplace)
+
+    def _replace_df(
+        self, df: pd.DataFrame, inplace=False
+    ) -> Optional["Data"]:
+        """ Replace the dataframe of this object or return a new object with
+        this dataframe and a copy of the metadata.
+
+        Args:
+            df: New dataframe
+            inplace: Modify this object rather than returning a new one
+
+        Returns:
+            None or Data
+        """
+        if inplace:
+            self.df = df
+            return None
+        new = type(self)()
+        new.md = copy.deepcopy(self.md)
+        new.log = self.log
+        new.df = df
+        return new
+
     def only_bpoints(self, bpoint_column="bpoint", inplace=False):
         """ Keep only the benchmark points as sample points.
 
@@ -169,13 +615,9 @@ class Data(DFMD):
         Returns:
             None or Data
         """
-        if inplace:
-            self.df = self.df[self.df[bpoint_column]]
-        else:
-            # todo: this is inefficient
-            new_obj = copy.deepcopy(self)
-            new_obj.only_bpoints(inplace=True, bpoint_column=bpoint_column)
-            return new_obj
+        return self.subset(
+            self._column(bpoint_column).astype(bool), inplace=inplace
+        )
 
     def _bpoint_slices(self, bpoint_column="bpoint"):
         """ See docstring of only_bpoint_slices. """
@@ -254,20 +696,6 @@ class Data(DFMD):
             d.fix_param(CT_bctaunutau=[], bpoint_slice=True)
 
         """
-        if not inplace:
-            # todo: this is inefficient
-            new_obj = copy.deepcopy(self)
-            new_obj.fix_param(
-                inplace=True,
-                bpoints=bpoints,
-                bpoint_slices=bpoint_slices,
-                bpoint_column=bpoint_column,
-                **kwargs
-            )
-            return new_obj
-
-        # From here on, we apply everything in place.
-
         if bpoint_slices:
             bpoint_slices = self._bpoint_slices(bpoint_column=bpoint_column)
         else:
@@ -282,23 +710,76 @@ class Data(DFMD):
                 values_dict[param] = list(values)
             values_dict[param].extend(bpoint_slices[param])
 
-        # Get selector
-        selector = np.full(self.n, True, bool)
+        # Get rows (row numbers sorted in ascending order)
+        rows = None
         for param, values in values_dict.items():
-            param_selector = np.full(self.n, False, bool)
-            for value in values:
-                available_values = self.df[param].values
-                idx = (np.abs(available_values - value)).argmin()
-                nearest_value = available_values[idx]
-                param_selector |= np.isclose(
-                    self.df[param].values, nearest_value
-                )
-            selector &= param_selector
+            param_rows = self._param_rows(param, values)
+            if rows is None:
+                rows = param_rows
+            else:
+                rows = np.intersect1d(rows, param_rows, assume_unique=True)
+        if rows is None:
+            rows = np.arange(self.n)
         if bpoints:
-            selector |= self.df[bpoint_column].astype(bool)
+            is_bpoint = self._column(bpoint_column).astype(bool)
+            rows = np.union1d(rows, np.flatnonzero(is_bpoint))
+
+        return self.subset(rows, inplace=inplace)
 
-        # Apply selector to dataframe
-        self.df = self.df[selector]
+    def _grid_index(self, param: str) -> Tuple[np.ndarray, np.ndarray]:
+        """ Index of the values of one parameter: The sorted unique values
+        and the row numbers of the rows where each of them is attained.
+        Cached until the dataframe is modified.
+
+        Args:
+            param: Name of the parameter
+
+        Returns:
+            Tuple of the sorted unique values and a list of arrays of row
+            numbers (one array per unique value)
+        """
+
+        def build():
+            values = self._column(param)
+            order = np.argsort(values, kind="stable")
+            unique, starts = np.unique(values[order], return_index=True)
+            return unique, np.split(order, starts[1:])
+
+        return self._cached("grid_index_{}".format(param), build)
+
+    def _param_rows(self, param: str, values: Iterable[float]) -> np.ndarray:
+        """ Row numbers of the rows where the parameter is (close to) the
+        attained value that is nearest to any of the given values.
+
+        Args:
+            param: Name of the parameter
+            values: Requested values
+
+        Returns:
+            Sorted array of row numbers
+        """
+        unique, rows = self._grid_index(param)
+        values = np.asarray(list(values), dtype=float)
+        if len(unique) == 0 or len(values) == 0:
+            return np.array([], dtype=int)
+        # Nearest attained value: Either the next smaller or the next larger
+        upper = np.clip(np.searchsorted(unique, values), 0, len(unique) - 1)
+        lower = np.clip(upper - 1, 0, len(unique) - 1)
+        nearest = np.where(
+            np.abs(unique[upper] - values) < np.abs(unique[lower] - values),
+            unique[upper],
+            unique[lower],
+        )
+        # All attained values that are close to it (as in np.isclose)
+        tolerance = 1e-8 + 1e-5 * np.abs(nearest)
+        starts = np.searchsorted(unique, nearest - tolerance, side="left")
+        stops = np.searchsorted(unique, nearest + tolerance, side="right")
+        selected = np.unique(
+            np.concatenate(
+                [np.arange(start, stop) for start, stop in zip(starts, stops)]
+            )
+        )
+        return np.sort(np.concatenate([rows[i] for i in selected]))
 
     # todo: test
     def sample_param(
@@ -368,8 +849,8 @@ class Data(DFMD):
                         "Please specify minimum, maximum and number of points."
                     )
             elif isinstance(value, (int, float)):
-                param_min = self.df[param].min()
-                param_max = self.df[param].max()
+                param_min = np.nanmin(self._column(param))
+                param_max = np.nanmax(self._column(param))
                 param_npoints = value
             else:
                 raise ValueError(
@@ -402,25 +883,20 @@ class Data(DFMD):
             If ``inplace == False``, return new Data with subset of sample
             points.
         """
-        if not inplace:
-            # todo: this is inefficient, why do we have to copy everything
-            #  first?
-            new = self.copy()
-            new.sample_param_random(
-                inplace=True,
-                bpoints=bpoints,
-                bpoint_column=bpoint_column,
-                **kwargs
-            )
-            return new
         if not bpoints:
-            self.df = self.df.sample(**kwargs)
+            df = self.df.sample(**kwargs)
         else:
             bpoint_df = self.df[self.df[bpoint_column]]
-            self.df = self.df[~self.df[bpoint_column]].sample(**kwargs)
-            self.df = self.df.append(bpoint_df)
+            df = self.df[~self.df[bpoint_column]].sample(**kwargs)
+            df = pd.concat([df, bpoint_df], sort=False)
+        return self._replace_df(df, inplace=inplace)
 
-    def find_closest_spoints(self, point: Dict[str, float], n=10) -> "Data":
+    def find_closest_spoints(
+        self,
+        point: Dict[str, float],
+        n=10,
+        scale: Optional[Dict[str, float]] = None,
+    ) -> "Data":
         """ Given a point in parameter space, find the closest sampling
         points to it and return them as a :py:class:`Data` object with the
         corresponding subset of spoints.
@@ -430,56 +906,24 @@ class Data(DFMD):
         Args:
             point: Dictionary of parameter name to value
             n: Maximal number of rows to return
+            scale: Dictionary of parameter name to the length scale that the
+                differences in this parameter are divided by before computing
+                the distance (default 1 for all parameters).
 
         Returns:
             :py:class:`Data` object with subset of rows of dataframe
             corresponding to the closest points in parameter space.
         """
-        if not set(point.keys()) == set(self.par_cols):
-            raise ValueError(
-                "Invalid specification of a point: Please give values"
-                " exactly for the following keys: {}".format(
-                    ", ".join(self.par_cols)
-                )
-            )
-        if n <= 0:
-            raise ValueError("n has to be an integer >= 1.")
-
-        # argpartition will throw if we request more or equal rows than we have,
-        # so we have to be careful
-        n_max = self.n
-        if n_max == 0:
-            raise ValueError("Not enough rows available.")
-        if n_max < n:
-            n_max = n
-
-        distances = np.sqrt(
-            np.sum(
-                np.array(
-                    [
-                        np.square(self.df[param].values - point[param])
-                        for param in self.par_cols
-                    ]
-                ),
-                axis=0,
-            )
-        )
-
-        if n < n_max:
-            closest = np.argpartition(distances, n)[:n]
-        else:
-            # n == n_max
-            closest = np.arange(0, len(distances))
-        # note that argpartition did not sort these yet, so we do this now
-        closest = closest[np.argsort(distances[closest])]
-
-        new = self.copy(data=False)
-        new.df = self.df.iloc[closest]
-        return new
+        _, rows = self.find_closest_rows(point, n=n, scale=scale)
+        return self.subset(rows[0][rows[0] >= 0])
 
     def find_closest_bpoints(
-        self, point: Dict[str, float], n=10, bpoint_column="bpoint"
-    ):
+        self,
+        point: Dict[str, float],
+        n=10,
+        bpoint_column="bpoint",
+        scale: Optional[Dict[str, float]] = None,
+    ) -> "Data":
         """ Given a point in parameter space, find the closest benchmark
         points to it and return them as a :py:class:`Data` object with the
         corresponding subset of benchmark points.
@@ -490,56 +934,403 @@ class Data(DFMD):
             point: Dictionary of parameter name to value
             n: Maximal number of rows to return
             bpoint_column: Column name of the benchmark column
+            scale: See :meth:`find_closest_spoints`
 
         Returns:
             :py:class:`Data` object with subset of rows of dataframe
             corresponding to the closest points in parameter space.
         """
-        if not set(point.keys()) == set(self.par_cols):
-            raise ValueError(
-                "Invalid specification of a point: Please give values"
-                " exactly for the following keys: {}".format(
-                    ", ".join(self.par_cols)
-                )
-            )
+        _, rows = self.find_closest_rows(
+            point, n=n, bpoint_column=bpoint_column, scale=scale
+        )
+        return self.subset(rows[0][rows[0] >= 0])
+
+    def find_closest_rows(
+        self,
+        points: Union[Dict[str, Any], pd.DataFrame, np.ndarray],
+        n=1,
+        bpoint_column: Optional[str] = None,
+        scale: Optional[Dict[str, float]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """ Find the closest sample points to many points in parameter space
+        at once.
+
+        The lookup uses a k-d tree (:class:`scipy.spatial.cKDTree`) of the
+        parameter values that is built on the first query and cached until
+        the dataframe is modified (a separate tree is built for every
+        combination of ``bpoint_column`` and ``scale``).
+
+        Args:
+            points: Points in parameter space: Dictionary of parameter name to
+                value (or to array of values), dataframe with (at least) the
+                parameter columns or array of shape ``(number of points,
+                number of parameters)`` with the parameters in the order of
+                :attr:`par_cols`.
+            n: Number of closest sample points to find for every point
+            bpoint_column: Only consider benchmark points (as marked by this
+                column)
+            scale: Dictionary of parameter name to the length scale that the
+                differences in this parameter are divided by before computing
+                the distance (default 1 for all parameters).
+
+        Returns:
+            Tuple of distances and row numbers (positions in :attr:`df`), both
+            of shape ``(number of points, n)`` and sorted by increasing
+            distance. If there are fewer than ``n`` rows, the remaining
+            distances are ``inf`` and the row numbers ``-1``.
+
+        Example:
+
+        .. code-block:: python
+
+            distances, rows = d.find_closest_rows(fits_df, n=1)
+            clusters = d.df["cluster"].values[rows[:, 0]]
+        """
         if n <= 0:
             raise ValueError("n has to be an integer >= 1.")
-
-        # argpartition will throw if we request more or equal rows than we have,
-        # so we have to be careful
-        n_max = len(self.df[self.df[bpoint_column]])
-        if n_max == 0:
+        values = self._points_array(points)
+        scales = self._par_scales(scale)
+        tree, tree_rows = self._cached(
+            "kdtree_{}_{}_{}".format(
+                self.par_cols, bpoint_column, scales.tolist()
+            ),
+            lambda: self._build_kdtree(bpoint_column, scales),
+        )
+        if len(tree_rows) == 0:
             raise ValueError("Not enough rows available.")
-        if n_max < n:
-            n_max = n
-
-        distances = np.sqrt(
-            np.sum(
-                np.array(
-                    [
-                        np.square(
-                            self.df[self.df[bpoint_column]][param].values
-                            - point[param]
-                        )
-                        for param in self.par_cols
-                    ]
-                ),
-                axis=0,
+        distances, indices = tree.query(
+            values / scales, k=list(range(1, n + 1))
+        )
+        # Missing neighbours are marked by an index equal to the size of the
+        # tree
+        found = indices < len(tree_rows)
+        rows = np.full(indices.shape, -1, dtype=int)
+        rows[found] = tree_rows[indices[found]]
+        return distances, rows
+
+    def _build_kdtree(
+        self, bpoint_column: Optional[str], scales: np.ndarray
+    ) -> Tuple[scipy.spatial.cKDTree, np.ndarray]:
+        """ k-d tree of the scaled parameter values of all rows (or only of
+        the benchmark points) and the row numbers of its points.
+        """
+        if bpoint_column is None:
+            rows = np.arange(self.n)
+        else:
+            rows = np.flatnonzero(self._column(bpoint_column).astype(bool))
+        values = np.asarray(self._values(self.par_cols), dtype=float)[rows]
+        return scipy.spatial.cKDTree(values / scales), rows
+
+    def _points_array(
+        self, points: Union[Dict[str, Any], pd.DataFrame, np.ndarray]
+    ) -> np.ndarray:
+        """ Convert points in parameter space to an array of shape
+        ``(number of points, number of parameters)``.
+        """
+        if isinstance(points, pd.DataFrame):
+            missing = set(self.par_cols) - set(points.columns)
+            if missing:
+                raise ValueError(
+                    "Dataframe of points is missing the parameter columns "
+                    "{}.".format(", ".join(sorted(missing)))
+                )
+            values = points[self.par_cols].to_numpy(dtype=float)
+        elif isinstance(points, dict):
+            if not set(points.keys()) == set(self.par_cols):
+                raise ValueError(
+                    "Invalid specification of a point: Please give values"
+                    " exactly for the following keys: {}".format(
+                        ", ".join(self.par_cols)
+                    )
+                )
+            values = np.column_stack(
+                [
+                    np.atleast_1d(np.asarray(points[param], dtype=float))
+                    for param in self.par_cols
+                ]
             )
+        else:
+            values = np.atleast_2d(np.asarray(points, dtype=float))
+        if not values.ndim == 2 or not values.shape[1] == len(self.par_cols):
+            raise ValueError(
+                "Points have to be given as array of shape (number of points, "
+                "{}).".format(len(self.par_cols))
+            )
+        return values
+
+    def _par_scales(self, scale: Optional[Dict[str, float]]) -> np.ndarray:
+        """ Length scales of all parameters in the order of :attr:`par_cols`
+        """
+        if scale is None:
+            scale = {}
+        unknown = set(scale) - set(self.par_cols)
+        if unknown:
+            raise ValueError(
+                "Scales given for unknown parameters {}.".format(
+                    ", ".join(sorted(unknown))
+                )
+            )
+        scales = np.array(
+            [float(scale.get(param, 1.0)) for param in self.par_cols]
         )
+        if not np.all(scales > 0):
+            raise ValueError("Scales have to be positive.")
+        return scales
 
-        if n < n_max:
-            closest = np.argpartition(distances, n)[:n]
-        else:
-            # n == n_max
-            closest = np.arange(0, len(distances))
-        # note that argpartition did not sort these yet, so we do this now
-        closest = closest[np.argsort(distances[closest])]
+    # **************************************************************************
+    # Combining
+    # **************************************************************************
+
+    @staticmethod
+    def concat(datas: Iterable["Data"], index="renumber") -> "Data":
+        """ Combine the sample points of several data objects (e.g. shards of
+        a scan, refinements or separate runs) into one.
+
+        All data objects must have the same parameters and bins. Columns
+        that only some of them have (e.g. cluster numbers) are filled with
+        ``NaN`` for the others. The dataframe is built in one go rather than
+        by repeatedly appending rows.
+
+        The metadata is taken from the first data object. The metadata of
+        the scans of the other data objects is appended to
+        ``md["scan"]["previous"]`` (as for
+        :meth:`clusterking.scan.Scanner.run` in ``extend`` mode). A warning
+        is logged for other metadata that differs between the data objects.
 
-        new = self.copy(data=False)
-        new.df = self.df[self.df[bpoint_column]].iloc[closest]
+        Args:
+            datas: Data objects
+            index: ``renumber``: Number the rows from 0 to n-1, ``keep``:
+                Keep the index of the data objects (which must not overlap)
+
+        Returns:
+            New data object of the same type as the first data object
+        """
+        datas = list(datas)
+        if not datas:
+            raise ValueError("No data objects to concatenate.")
+        if index not in ["renumber", "keep"]:
+            raise ValueError("Unknown index option '{}'.".format(index))
+        first = datas[0]
+        for i, data in enumerate(datas[1:], 1):
+            first._check_compatible(data, i)
+        df = pd.concat([data.df for data in datas], sort=False)
+        if index == "renumber":
+            df.index = pd.RangeIndex(len(df), name=first.df.index.name)
+        elif not df.index.is_unique:
+            raise ValueError(
+                "The indices of the data objects overlap. Use "
+                "index='renumber' to renumber the rows."
+            )
+        new = type(first)()
+        new.md = first._concat_md(datas)
+        new.log = first.log
+        new.df = df
         return new
 
+    def _check_compatible(self, other: "Data", number: int) -> None:
+        """ Raise a ValueError if the sample points of ``other`` can't be
+        combined with ours (see :meth:`concat`).
+
+        Args:
+            other: Data object
+            number: Number of the data object (for error messages)
+
+        Returns:
+            None
+        """
+        if not set(other.par_cols) == set(self.par_cols):
+            raise ValueError(
+                "Data object {} has the parameters {}, but {} were "
+                "expected.".format(number, other.par_cols, self.par_cols)
+            )
+        if not other.bin_cols == self.bin_cols:
+            raise ValueError(
+                "Data object {} has the bins {}, but {} were expected.".format(
+                    number, other.bin_cols, self.bin_cols
+                )
+            )
+
+        def binning(data):
+            return data.md.get("scan", {}).get("dfunction", {}).get("binning")
+
+        ours, theirs = binning(self), binning(other)
+        if ours is not None and theirs is not None:
+            if not np.array_equal(np.asarray(ours), np.asarray(theirs)):
+                raise ValueError(
+                    "Data object {} has the binning {}, but {} was "
+                    "expected.".format(number, theirs, ours)
+                )
+
+    def _concat_md(self, datas: List["Data"]) -> nested_dict:
+        """ Metadata for the combination of ``datas`` (see :meth:`concat`).
+        """
+        md = copy.deepcopy(self.md)
+        if "scan" in md:
+            previous = list(md["scan"].get("previous", []))
+            for data in datas[1:]:
+                scan_md = copy.deepcopy(data.md.get("scan", {}))
+                previous.extend(scan_md.pop("previous", []))
+                previous.append(scan_md)
+            md["scan"]["previous"] = previous
+
+        def dump(value):
+            return json.dumps(value, sort_keys=True, default=str)
+
+        differing = set()
+        for data in datas[1:]:
+            for key in (set(md) | set(data.md)) - {"scan"}:
+                if dump(md.get(key)) != dump(data.md.get(key)):
+                    differing.add(key)
+        if differing:
+            self.log.warning(
+                "The metadata {} differs between the data objects. Keeping "
+                "the one of the first data object.".format(
+                    ", ".join(sorted(differing))
+                )
+            )
+        return md
+
+    # **************************************************************************
+    # Interpolation
+    # **************************************************************************
+
+    def _grid_values(self) -> Dict[str, np.ndarray]:
+        """ Sorted unique values of all parameters. Raises a ValueError if the
+        sample points do not form a regular grid.
+        """
+        try:
+            grid = self.grid
+        except ValueError:
+            grid = None
+        if grid is None or not grid.complete:
+            raise ValueError(
+                "The sample points do not form a regular grid in parameter "
+                "space."
+            )
+        return grid.values
+
+    def interpolate_grid(self, method="linear", inplace=False, **kwargs):
+        """ Interpolate the bin contents of a regular grid of sample points
+        to a (usually denser) grid. This is much faster than scanning the
+        denser grid and can be useful for plots and stability studies of
+        smooth distributions.
+
+        All columns besides the parameter and bin columns (e.g. clusters or
+        benchmark points) are dropped. The metadata is marked with an
+        ``interpolated`` entry.
+
+        Args:
+            method: Interpolation method, e.g. ``linear`` (multilinear
+                interpolation) or spline methods such as ``cubic`` (see
+                :class:`scipy.interpolate.RegularGridInterpolator` for the
+                methods supported by your scipy version).
+            inplace: Modify this Data object instead of returning a new one
+            **kwargs: Specify the new values of the parameters:
+                ``<coeff name>=(min, max, npoints)`` or
+                ``<coeff name>=npoints`` (between the minimum and maximum of
+                the original values).
+                If a coefficient isn't contained in the dictionary, the
+                original values are kept.
+
+        Returns:
+            If ``inplace == False``, return new Data with interpolated sample
+            points.
+
+        Example:
+
+        .. code-block:: python
+
+            # Use 100 instead of e.g. 10 values of CT_bctaunutau
+            d_dense = d.interpolate_grid(CT_bctaunutau=100)
+        """
+        if not inplace:
+            new = self.copy(data=False)
+            new.df = self.df
+            new.interpolate_grid(method=method, inplace=True, **kwargs)
+            return new
+
+        old_values = self._grid_values()
+        new_values = {}
+        for param, old in old_values.items():
+            if param not in kwargs:
+                new_values[param] = old
+                continue
+            value = kwargs[param]
+            if isinstance(value, Iterable):
+                try:
+                    param_min, param_max, param_npoints = value
+                except ValueError:
+                    raise ValueError(
+                        "Please specify minimum, maximum and number of points."
+                    )
+            elif isinstance(value, (int, np.integer)):
+                param_min, param_max, param_npoints = min(old), max(old), value
+            else:
+                raise ValueError(
+                    "Incompatible type {} of {}".format(type(value), value)
+                )
+            if len(old) < 2:
+                raise ValueError(
+                    "Can't interpolate parameter {}, because it only takes "
+                    "one value.".format(param)
+                )
+            new_values[param] = np.linspace(param_min, param_max, param_npoints)
+        unknown = set(kwargs) - set(old_values)
+        if unknown:
+            raise ValueError(
+                "Unknown parameter(s): {}".format(", ".join(sorted(unknown)))
+            )
+
+        # Parameters that only take one value can't be interpolated, so we
+        # leave them out of the interpolation.
+        interpolated = [p for p in self.par_cols if len(old_values[p]) >= 2]
+
+        # Sort the bin contents into an array of shape
+        # n_values(param_1) x ... x n_values(param_k) x nbins
+        order = self.grid.rows.ravel()
+        shape = [len(old_values[param]) for param in interpolated]
+        grid = self.data()[order].reshape(shape + [self.nbins])
+
+        new_points = np.array(
+            [
+                axis.ravel()
+                for axis in np.meshgrid(
+                    *[new_values[param] for param in self.par_cols],
+                    indexing="ij",
+                )
+            ]
+        ).T
+        if interpolated:
+            interpolator = scipy.interpolate.RegularGridInterpolator(
+                [old_values[param] for param in interpolated],
+                grid,
+                method=method,
+            )
+            bins = interpolator(
+                new_points[:, [self.par_cols.index(p) for p in interpolated]]
+            )
+        else:
+            bins = np.tile(grid, (len(new_points), 1))
+
+        df = pd.DataFrame(
+            np.concatenate([new_points, bins], axis=1),
+            columns=self.par_cols + self.bin_cols,
+        )
+        df.index.name = "index"
+        self.df = df
+
+        self.md["interpolated"] = {
+            "method": method,
+            "n_original": int(np.prod([len(v) for v in old_values.values()])),
+            "values": {
+                param: list(map(float, values))
+                for param, values in new_values.items()
+            },
+        }
+        for key in ["cluster", "bpoint"]:
+            if key in self.md:
+                del self.md[key]
+
     # **************************************************************************
     # Manipulating things
     # **************************************************************************
@@ -556,6 +1347,34 @@ class Data(DFMD):
         if axis_label is not None:
             self.md["variables"][variable]["axis_label"] = axis_label
 
+    def compact(
+        self, bin_dtype: Optional[str] = "float32", inplace=False
+    ) -> Optional["Data"]:
+        """ Convert the columns to data types that take less memory: The bin
+        contents to ``float32`` and integer columns (e.g. cluster numbers) to
+        the smallest integer type that holds their values. Benchmark point
+        columns are booleans (one byte per row) anyways. For distributions
+        with many bins, this roughly halves the memory per row. All methods
+        work with the compact data types, but of course computations with
+        the bin contents are only done with single precision.
+
+        To load data with compact data types right away, use
+        ``Data(path, compact=True)``. Files written from compact data are
+        loaded with the compact data types.
+
+        Args:
+            bin_dtype: Data type of the bin contents (None: unchanged)
+            inplace: If True, the current Data object is modified, if False,
+                a new Data object is returned.
+
+        Returns:
+            None or Data
+        """
+        df, _ = compact_dtypes(self.df, bin_dtype=bin_dtype)
+        if df is self.df and not inplace:
+            df = df.copy(deep=False)
+        return self._replace_df(df, inplace=inplace)
+
     def _get_axis_label(self, variable):
         r = self.md["variables"][variable]["axis_label"]
         if r:
@@ -567,7 +1386,6 @@ class Data(DFMD):
     # Renaming clusters
     # --------------------------------------------------------------------------
 
-    # todo: Test this
     # todo: inplace?
     # fixme: perhaps don't allow new_column but rather give copy method
     def rename_clusters(self, arg=None, column="cluster", new_column=None):
@@ -620,17 +1438,14 @@ class Data(DFMD):
             new_column: Write out as a new column with name `new_columns`,
                 e.g. when merging get_clusters with this method
         """
-        clusters_old_unique = self.df[column].unique()
-        # If a key doesn't appear in old2new, this means we don't change it.
-        for cluster in clusters_old_unique:
-            if cluster not in old2new:
-                old2new[cluster] = cluster
         self._rename_clusters_func(
-            lambda name: old2new[name], column, new_column
+            lambda name: old2new.get(name, name), column, new_column
         )
 
     def _rename_clusters_func(self, funct, column="cluster", new_column=None):
-        """Apply method to cluster names.
+        """Apply method to cluster names. The function is called only once
+        for every distinct cluster name, so it should give the same result
+        for the same name.
 
         Example:  Suppose your get_clusters are numbered from 1 to 10, but you
         want to start counting at 0:
@@ -650,9 +1465,12 @@ class Data(DFMD):
         """
         if not new_column:
             new_column = column
-        self.df[new_column] = [
-            funct(cluster) for cluster in self.df[column].values
-        ]
+        # Map the distinct names and look the rows up by their codes
+        codes, old_names = pd.factorize(
+            self._column(column), use_na_sentinel=False
+        )
+        new_names = pd.Series([funct(name) for name in old_names]).to_numpy()
+        self._set_column(new_column, new_names[codes])
 
     def _rename_clusters_auto(self, column="cluster", new_column=None):
         """Try to name get_clusters in a way that doesn't depend on the
@@ -669,10 +1487,11 @@ class Data(DFMD):
         Returns:
             None
         """
-        old_cluster_names = sorted(list(self.df[column].unique()))
-        new_cluster_names = range(len(old_cluster_names))
-        old2new = dict(zip(old_cluster_names, new_cluster_names))
-        self.rename_clusters(old2new, column, new_column)
+        if not new_column:
+            new_column = column
+        # The codes of the sorted distinct names are the new names
+        codes, _ = pd.factorize(self._column(column), sort=True)
+        self._set_column(new_column, codes)
 
     # **************************************************************************
     # Quick plots
@@ -6,12 +6,15 @@ import json
 import logging
 import pandas as pd
 from pathlib import PurePath, Path
-from typing import Union, Optional
-
-# 3rd
-import sqlalchemy
+from typing import Union, Optional, List, Dict, Iterator, Callable
 
 # ours
+from clusterking.data.storage import (
+    get_storage,
+    compact_dtypes,
+    restore_dtypes,
+    storage_metadata,
+)
 from clusterking.util.metadata import turn_into_nested_dict, nested_dict
 from clusterking.util.log import get_logger
 from clusterking.util.cli import handle_overwrite
@@ -27,6 +30,10 @@ class DFMD(object):
         self,
         path: Optional[Union[str, PurePath]] = None,
         log: Optional[Union[str, logging.Logger]] = None,
+        lazy=False,
+        columns: Optional[List[str]] = None,
+        where: Optional[Dict[str, tuple]] = None,
+        compact=False,
     ):
         """
         Initialize a DFMD object.
@@ -36,12 +43,30 @@ class DFMD(object):
                 :class:`pathlib.PurePath`)
             log: Optional: instance of :py:class:`logging.Logger` or name of
                 logger to be created
+            lazy: Only load the metadata right away and read the dataframe
+                from the file on the first access of :attr:`df`.
+            columns: Only load these columns of the dataframe (the index is
+                always loaded)
+            where: Only load rows where the values of some columns are in
+                a given range, e.g. ``{"a": (-0.5, 0.5), "b": (0, None)}``
+                (limits are inclusive, ``None`` means no limit). The selection
+                is applied when reading the file (e.g. by a ``WHERE`` clause
+                for SQLite or by skipping row groups for Parquet), so this is
+                much faster than loading all data and selecting afterwards.
+            compact: Load the bin contents as ``float32`` and integer columns
+                (e.g. cluster numbers) with the smallest integer type that
+                holds their values, regardless of the data types that they
+                were saved with (see :meth:`clusterking.data.Data.compact`).
         """
+        #: Function without arguments that loads the dataframe if it hasn't
+        #: been loaded yet, else None
+        self._df_loader = None
+        self._df = None  # type: Optional[pd.DataFrame]
+
         # These are the three attributes of this class
         #: This will hold all the configuration that we will write out
         self.md = None
-        #: :py:class:`pandas.DataFrame` to hold all of the results
-        self.df = None  # type: Optional[pd.DataFrame]
+        self.df = None
         #: Instance of :py:class:`logging.Logger`
         self.log = None
 
@@ -52,7 +77,9 @@ class DFMD(object):
             self.df = pd.DataFrame()
             self.log = None
         else:
-            self._load(path)
+            self._load(
+                path, lazy=lazy, columns=columns, where=where, compact=compact
+            )
 
         # Overwrite log if user wants that.
         if isinstance(log, logging.Logger):
@@ -67,34 +94,143 @@ class DFMD(object):
                 "Unsupported type '{}' for 'log' argument.".format(type(log))
             )
 
+    # **************************************************************************
+    # Dataframe
+    # **************************************************************************
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """ :py:class:`pandas.DataFrame` to hold all of the results.
+        If the object was loaded with ``lazy=True``, the dataframe is read from
+        the file on first access.
+        """
+        if self._df_loader is not None:
+            loader = self._df_loader
+            self._df_loader = None
+            self._df = loader()
+        return self._df
+
+    @df.setter
+    def df(self, value: pd.DataFrame) -> None:
+        self._df_loader = None
+        self._df = value
+
+    def _set_df_loader(self, loader: Callable[[], pd.DataFrame]) -> None:
+        """ Read the dataframe with ``loader`` on the first access of
+        :attr:`df` (see ``lazy`` in :meth:`__init__`).
+
+        Args:
+            loader: Function without arguments that returns the dataframe.
+                If it has an ``iter_chunks(rows)`` method,
+                :meth:`_iter_df` streams the dataframe from it.
+
+        Returns:
+            None
+        """
+        self._df_loader = loader
+        self._df = None
+
+    def _iter_df(self, rows: int) -> Iterator[pd.DataFrame]:
+        """ Iterate over the dataframe in chunks of rows. If the dataframe
+        hasn't been loaded yet (``lazy=True``), the chunks are read from the
+        file one after the other without loading the whole dataframe.
+
+        Args:
+            rows: Maximal number of rows per chunk
+
+        Returns:
+            Iterator over dataframes
+        """
+        if rows < 1:
+            raise ValueError("Number of rows per chunk has to be positive.")
+        if self._df_loader is not None:
+            yield from self._df_loader.iter_chunks(rows)
+            return
+        df = self.df
+        for start in range(0, len(df), rows):
+            yield df.iloc[start : start + rows]
+
     # **************************************************************************
     # Loading
     # **************************************************************************
 
-    def _load(self, path: Union[str, PurePath]) -> None:
+    @staticmethod
+    def load_metadata(path: Union[str, PurePath]) -> nested_dict:
+        """ Only load the metadata of a file as created by
+        :py:meth:`~clusterking.data.DFMD.write` without reading the dataframe.
+        This is fast even for large files, e.g. to index a directory of
+        results.
+
+        Args:
+            path: Path to input file
+
+        Returns:
+            Metadata as nested dictionary
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError("File '{}' doesn't exist.".format(path))
+        md_json = get_storage(path).read_metadata(path)
+        md = turn_into_nested_dict(json.loads(md_json))
+        # Information about the file itself (see write)
+        md.pop("storage", None)
+        return md
+
+    def _load(
+        self,
+        path: Union[str, PurePath],
+        lazy=False,
+        columns: Optional[List[str]] = None,
+        where: Optional[Dict[str, tuple]] = None,
+        compact=False,
+    ) -> None:
         """ Load input file as created by
-        :py:meth:`~clusterking.data.DFMD.write`.
+        :py:meth:`~clusterking.data.DFMD.write`. The format of the file is
+        determined automatically.
 
         Args:
             path: Path to input file
+            lazy: Only read the dataframe on first access
+            columns: Only read these columns
+            where: Only read rows with values in these ranges
+            compact: Convert to compact data types
 
         Returns:
             None
         """
         path = Path(path)
-        if not path.is_file():
+        if not path.exists():
             raise FileNotFoundError("File '{}' doesn't exist.".format(path))
-        engine = sqlalchemy.create_engine("sqlite:///" + str(path.resolve()))
-        self.df = pd.read_sql_table("df", engine)
-        self.df.set_index("index", inplace=True)
-        md_json = pd.read_sql_table("md", engine)["md"][0]
-        self.md = turn_into_nested_dict(json.loads(md_json))
+        storage = get_storage(path)
+        md = turn_into_nested_dict(json.loads(storage.read_metadata(path)))
+        # Information about the file itself (see write)
+        storage_md = md.pop("storage", {})
+        load_df = _DataFrameLoader(
+            storage,
+            path,
+            columns=columns,
+            where=where,
+            dtypes=storage_md.get("dtypes", {}),
+            compact=compact,
+        )
+        if lazy:
+            self._set_df_loader(load_df)
+        else:
+            self.df = load_df()
+        self.md = md
 
     # **************************************************************************
     # Writing
     # **************************************************************************
 
-    def write(self, path: Union[str, PurePath], overwrite="ask"):
+    def write(
+        self,
+        path: Union[str, PurePath],
+        overwrite="ask",
+        format=None,
+        bin_dtype: Optional[str] = None,
+        compression: Optional[str] = None,
+    ) -> None:
         """ Write output files.
 
         Args:
@@ -104,22 +240,66 @@ class DFMD(object):
                 'overwrite' (overwrite without asking), 'raise'
                 (raise Exception if file exists).
                 Default is 'ask'.
+            format: File format: 'sqlite', 'parquet' (columnar, much faster
+                for large dataframes), 'arrow' (Arrow IPC/feather file) or
+                'numpy' (directory of ``.npy`` files, the bin contents are
+                memory-mapped when loading).
+                Parquet and Arrow require the ``pyarrow`` package.
+                If not specified, the format is chosen based on the suffix of
+                ``path`` ('.parquet' or '.pq' for parquet, '.arrow' or
+                '.feather' for arrow, '.npyd' for numpy), with SQLite as
+                default.
+                When loading, the format is detected automatically.
+            bin_dtype: Save the bin contents with this data type, e.g.
+                'float32' to halve their size (not supported by SQLite, which
+                always uses double precision). Default: Keep data type.
+            compression: Compression codec (Parquet: 'snappy' (default),
+                'gzip', 'brotli', 'lz4', 'zstd', 'none'; Arrow: 'lz4'
+                (default), 'zstd', 'uncompressed'; not supported by the other
+                formats).
+
+        Integer columns (e.g. cluster numbers) are always saved with the
+        smallest integer type that holds all of their values. The original
+        data types are recorded in the metadata of the file and restored when
+        loading.
 
         Returns:
             None
         """
         path = Path(path)
+        storage = get_storage(path, format=format, sniff=False)
+        storage.check_write_options(
+            bin_dtype=bin_dtype, compression=compression
+        )
         handle_overwrite([path], behavior=overwrite, log=self.log)
         if not path.parent.is_dir():
             self.log.debug("Creating directory '{}'.".format(path.parent))
             path.parent.mkdir(parents=True)
 
-        engine = sqlalchemy.create_engine("sqlite:///" + str(path))
-        self.df.to_sql("df", engine, if_exists="replace")
-        # todo: perhaps it's better to use pickle in the future?
-        md_json = json.dumps(self.md, sort_keys=True, indent=4)
-        md_df = pd.DataFrame({"md": [md_json]})
-        md_df.to_sql("md", engine, if_exists="replace")
+        df, _ = compact_dtypes(self.df, bin_dtype=bin_dtype)
+        md = copy.copy(self.md)
+        md["storage"] = storage_metadata(
+            storage,
+            bin_dtype=bin_dtype,
+            compression=compression,
+            # Not all formats support all data types (e.g. SQLite saves
+            # float32 as float64), so we remember all of them
+            dtypes={col: str(dtype) for col, dtype in self.df.dtypes.items()},
+        )
+        md_json = json.dumps(md, sort_keys=True, indent=4)
+        storage.write(
+            path,
+            df,
+            md_json,
+            index_columns=self._index_columns(),
+            compression=compression,
+        )
+
+    def _index_columns(self) -> List[str]:
+        """ Columns that are frequently used to select rows, so that they
+        should be indexed when writing out (if supported by the file format).
+        """
+        return []
 
     def copy(self, deep=True, data=True, memo=None):
         """ Make a copy of this object.
@@ -160,3 +340,36 @@ class DFMD(object):
 
     def __deepcopy__(self, memo):
         return self.copy(deep=True)
+
+
+class _DataFrameLoader(object):
+    """ Read the dataframe of a file (with the original data types). Unlike a
+    closure, this can be pickled.
+    """
+
+    def __init__(
+        self, storage, path: Path, columns, where, dtypes, compact=False
+    ):
+        self.storage = storage
+        self.path = path
+        self.columns = columns
+        self.where = where
+        self.dtypes = dtypes
+        self.compact = compact
+
+    def __call__(self) -> pd.DataFrame:
+        """ Read the whole dataframe """
+        return restore_dtypes(
+            self.storage.read_df(
+                self.path, columns=self.columns, where=self.where
+            ),
+            self.dtypes,
+            compact=self.compact,
+        )
+
+    def iter_chunks(self, rows: int) -> Iterator[pd.DataFrame]:
+        """ Read the dataframe in chunks of rows """
+        for df in self.storage.iter_df(
+            self.path, rows, columns=self.columns, where=self.where
+        ):
+            yield restore_dtypes(df, self.dtypes, compact=self.compact)
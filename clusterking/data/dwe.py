@@ -57,6 +57,11 @@ class DataWithErrors(Data):
         so you can reload it like any other :class:`~clusterking.data.Data`
         or :class:`~clusterking.data.DFMD` object.
 
+    .. note::
+        :meth:`err` and :meth:`data` with ``decorrelate=True`` only need the
+        covariance matrices of a few rows at a time and are computed in
+        chunks of rows (see :meth:`~clusterking.data.Data.iter_chunks`).
+
     Args:
         data: n x nbins matrix
     """
@@ -158,6 +163,11 @@ class DataWithErrors(Data):
     # Internal helper functions
     # **************************************************************************
 
+    def _fingerprint_md(self) -> dict:
+        md = super()._fingerprint_md()
+        md["errors"] = self.md["errors"]
+        return md
+
     def _interpret_input(self, inpt, what: str) -> np.ndarray:
         """ Interpret user input
 
@@ -205,13 +215,18 @@ class DataWithErrors(Data):
         Returns:
             ``self.n * self.nbins`` array
         """
-        ret = super().data(**kwargs)
-
         if decorrelate:
-            inverses = np.linalg.inv(self.corr())
-            ret = np.einsum("kij,kj->ki", inverses, ret)
+            return self._map_chunks(
+                lambda chunk: chunk._decorrelated_data(**kwargs)
+            )
+        return super().data(**kwargs)
 
-        return ret
+    def _decorrelated_data(self, **kwargs) -> np.ndarray:
+        """ Implementation of :meth:`data` with ``decorrelate=True`` (without
+        splitting the data in chunks).
+        """
+        inverses = np.linalg.inv(self.corr())
+        return np.einsum("kij,kj->ki", inverses, super().data(**kwargs))
 
     def cov(self, relative=False) -> np.ndarray:
         """ Return covariance matrix :math:`\\mathrm{Cov}(d^{(n)}_i, d^{(n)}_j)`
@@ -270,6 +285,12 @@ class DataWithErrors(Data):
         Returns:
             ``self.n x self.nbins`` array
         """
+        return self._map_chunks(lambda chunk: chunk._err(relative=relative))
+
+    def _err(self, relative=False) -> np.ndarray:
+        """ Implementation of :meth:`err` (without splitting the data in
+        chunks).
+        """
         if not relative:
             return cov2err(self.cov())
         else:
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+""" Neighbour relations of sample points that lie on a grid in parameter
+space.
+"""
+
+# std
+from typing import List, Dict, Optional, Tuple, Union
+
+# 3rd
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+
+class Grid(object):
+    """ Topology of sample points on a (regular) grid in parameter space.
+
+    Every row of the dataframe is mapped to its integer grid coordinates (the
+    position of its parameter values among the sorted values that the
+    parameters take) and back, so that neighbours along each axis can be
+    looked up without sorting the dataframe or comparing floats.
+
+    The grid doesn't have to be complete (e.g. after
+    :meth:`clusterking.data.Data.sample_param_random`). Grid points without
+    a sample point are marked by the row number -1.
+
+    Parameter values that agree within the tolerance of :func:`numpy.isclose`
+    (as in :meth:`clusterking.data.Data.fix_param`) are considered the same
+    value, so that rounding errors don't add axis values.
+
+    Usually this is not initialized directly, but via
+    :attr:`clusterking.data.Data.grid`:
+
+    .. code-block:: python
+
+        grid = d.grid
+        grid.shape  # Number of values of every parameter
+        # Row numbers of the next sample points in the direction of the
+        # second parameter (-1 if there is none)
+        grid.neighbours(axis=1)
+        # Pairs of row numbers of adjacent sample points
+        grid.neighbour_pairs()
+    """
+
+    #: Maximal ratio of the number of grid points to the number of sample
+    #: points. Sample points that need a larger grid (e.g. points that were
+    #: sampled randomly rather than on a grid) are not considered a grid.
+    max_size_factor = 100
+
+    def __init__(
+        self,
+        df: Union[pd.DataFrame, Dict[str, np.ndarray]],
+        par_cols: List[str],
+    ):
+        """ Build the grid.
+
+        Args:
+            df: Dataframe with the sample points (or dictionary of column name
+                to array of values, containing at least the parameters)
+            par_cols: Parameter columns (the axes of the grid)
+        """
+        #: Parameters (one per axis of the grid)
+        self.par_cols = list(par_cols)
+        #: Dictionary of parameter name to the sorted values it takes
+        self.values = {}  # type: Dict[str, np.ndarray]
+        coordinates = []
+        n = len(df)
+        for param in self.par_cols:
+            column = np.asarray(df[param])
+            n = len(column)
+            self.values[param], inverse = _group_values(column)
+            coordinates.append(inverse)
+        #: Grid coordinates of all rows: Integer array of shape
+        #: ``(number of rows, number of parameters)``
+        self.coordinates = np.array(coordinates, dtype=int).T.reshape(
+            n, len(self.par_cols)
+        )
+        #: Number of values of every parameter
+        self.shape = tuple(len(self.values[param]) for param in self.par_cols)
+        size = 1
+        for length in self.shape:
+            # Python integers, so that this can't overflow
+            size *= length
+        if size > self.max_size_factor * max(n, 1):
+            raise ValueError(
+                "The sample points do not form a regular grid in parameter "
+                "space: {} sample points, but {} grid points.".format(n, size)
+            )
+        flat = np.ravel_multi_index(self.coordinates.T, self.shape)
+        if len(np.unique(flat)) < len(flat):
+            raise ValueError(
+                "Several sample points have the same parameter values."
+            )
+        #: Row number of every grid point (-1 if the grid point has no sample
+        #: point): Array of shape :attr:`shape`
+        self.rows = np.full(self.shape, -1, dtype=int)
+        self.rows.ravel()[flat] = np.arange(n)
+
+    @property
+    def complete(self) -> bool:
+        """ True if every grid point has a sample point """
+        return bool(np.all(self.rows >= 0))
+
+    def _axis(self, axis: Union[int, str]) -> int:
+        """ Number of the axis given by number or parameter name """
+        if isinstance(axis, str):
+            if axis not in self.par_cols:
+                raise ValueError("Unknown parameter '{}'.".format(axis))
+            return self.par_cols.index(axis)
+        if not -len(self.shape) <= axis < len(self.shape):
+            raise ValueError(
+                "Axis {} out of range for grid with {} axes.".format(
+                    axis, len(self.shape)
+                )
+            )
+        return axis % len(self.shape)
+
+    def row(self, coordinates: np.ndarray) -> np.ndarray:
+        """ Row numbers of grid points.
+
+        Args:
+            coordinates: Integer grid coordinates, array of shape
+                ``(..., number of parameters)``
+
+        Returns:
+            Row numbers (-1 if the grid point has no sample point or lies
+            outside of the grid), array of shape ``(...)``
+        """
+        coordinates = np.asarray(coordinates, dtype=int)
+        inside = np.all(
+            (coordinates >= 0) & (coordinates < np.array(self.shape)), axis=-1
+        )
+        clipped = np.clip(coordinates, 0, np.array(self.shape) - 1)
+        rows = self.rows[tuple(np.moveaxis(clipped, -1, 0))]
+        return np.where(inside, rows, -1)
+
+    def neighbours(
+        self,
+        axis: Union[int, str],
+        offset=1,
+        rows: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """ Neighbours of sample points along one axis.
+
+        Args:
+            axis: Number or parameter name of the axis
+            offset: Number of grid steps (negative: towards smaller parameter
+                values)
+            rows: Row numbers of the sample points (default: all)
+
+        Returns:
+            Row numbers of the neighbours (-1 if there is none)
+        """
+        axis = self._axis(axis)
+        if rows is None:
+            coordinates = self.coordinates.copy()
+        else:
+            coordinates = self.coordinates[np.asarray(rows, dtype=int)]
+        coordinates[:, axis] += offset
+        return self.row(coordinates)
+
+    def neighbour_pairs(self) -> np.ndarray:
+        """ All pairs of sample points that are next to each other along one
+        of the axes.
+
+        Returns:
+            Integer array of shape ``(number of pairs, 2)`` with the row
+            numbers of the sample points. Every pair appears once, with the
+            sample point with the smaller parameter value first.
+        """
+        pairs = []
+        for axis in range(len(self.shape)):
+            neighbours = self.neighbours(axis)
+            found = neighbours >= 0
+            pairs.append(
+                np.column_stack([np.flatnonzero(found), neighbours[found]])
+            )
+        if not pairs:
+            return np.zeros((0, 2), dtype=int)
+        return np.concatenate(pairs)
+
+    def connectivity(self) -> scipy.sparse.csr_matrix:
+        """ Symmetric adjacency matrix of the sample points (e.g. for
+        connectivity constrained clustering with
+        :class:`sklearn.cluster.AgglomerativeClustering`).
+
+        Returns:
+            Sparse matrix of shape ``(number of rows, number of rows)``
+        """
+        n = len(self.coordinates)
+        pairs = self.neighbour_pairs()
+        matrix = scipy.sparse.coo_matrix(
+            (np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n)
+        )
+        return (matrix + matrix.T).tocsr()
+
+
+def _group_values(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Like ``np.unique(column, return_inverse=True)``, but values that are
+    close to the smallest value of a group (within the tolerance of
+    :func:`numpy.isclose`, as in :meth:`clusterking.data.Data.fix_param`) are
+    put into this group. Comparing with the smallest value rather than with
+    the next smaller value keeps closely spaced values from being chained
+    into one large group.
+
+    Args:
+        column: One-dimensional array of values
+
+    Returns:
+        Tuple of the smallest value of every group and the group number
+        of every entry of ``column``
+    """
+    order = np.argsort(column, kind="stable")
+    ordered = column[order]
+    n = len(ordered)
+    if n == 0:
+        return ordered, np.zeros(0, dtype=int)
+    # End of the group that starts with the value at that position
+    stops = np.searchsorted(
+        ordered, ordered + (1e-8 + 1e-5 * np.abs(ordered)), side="right"
+    )
+    # NaN (sorted to the end) is not close to anything
+    nan = np.flatnonzero(np.isnan(ordered))
+    stops[nan] = nan + 1
+    # Only loops over the groups, which are few for a grid
+    starts = []
+    start = 0
+    while start < n:
+        starts.append(start)
+        start = stops[start]
+    new_group = np.zeros(n, dtype=int)
+    new_group[starts[1:]] = 1
+    inverse = np.empty(n, dtype=int)
+    inverse[order] = np.cumsum(new_group)
+    return ordered[starts], inverse
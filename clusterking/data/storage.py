@@ -0,0 +1,988 @@
+#!/usr/bin/env python3
+
+""" File formats in which :class:`~clusterking.data.DFMD` objects can be
+saved.
+
+Every format is implemented by a subclass of :class:`Storage` that reads and
+writes a dataframe together with the JSON serialized metadata. Use
+:func:`get_storage` to get the format of a file.
+
+When reading the dataframe, all formats support selecting columns
+(``columns``) and rows with values of some columns in given ranges
+(``where``, see :func:`check_where`). These selections are applied while
+reading the file rather than afterwards. Large files can also be read in
+chunks of rows with :meth:`Storage.iter_df`.
+"""
+
+# std
+from abc import ABC, abstractmethod
+import json
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple, Dict, List, Callable, Iterator, Union
+
+# 3rd
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def check_where(where: Optional[Dict[str, tuple]]) -> Dict[str, tuple]:
+    """ Validate the row selection for reading dataframes.
+
+    Args:
+        where: Dictionary of the form ``{<column>: (<min>, <max>)}``. Only rows
+            with ``min <= value <= max`` for all of the columns are selected.
+            ``None`` for the minimum or maximum means that there is no lower
+            or upper limit.
+
+    Returns:
+        Dictionary of the same form
+    """
+    if not where:
+        return {}
+    checked = {}
+    for column, value_range in where.items():
+        try:
+            minimum, maximum = value_range
+        except (TypeError, ValueError):
+            raise ValueError(
+                "The selection for column '{}' has to be a tuple "
+                "(min, max), not {}.".format(column, value_range)
+            )
+        checked[column] = (minimum, maximum)
+    return checked
+
+
+def where_mask(
+    get_column: Callable[[str], np.ndarray], n: int, where: Dict[str, tuple]
+) -> np.ndarray:
+    """ Boolean mask of the rows selected by ``where``.
+
+    Args:
+        get_column: Function that returns the values of a column
+        n: Number of rows
+        where: See :func:`check_where`
+
+    Returns:
+        Boolean array of length ``n``
+    """
+    mask = np.full(n, True)
+    for column, (minimum, maximum) in where.items():
+        values = get_column(column)
+        if minimum is not None:
+            mask &= values >= minimum
+        if maximum is not None:
+            mask &= values <= maximum
+    return mask
+
+
+def compact_dtypes(
+    df: pd.DataFrame, bin_dtype: Optional[str] = None
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """ Convert the columns of a dataframe to smaller data types for writing:
+    Integer columns (e.g. cluster numbers) are converted to the smallest
+    integer type that holds all values, the bin contents optionally to
+    ``bin_dtype``.
+
+    Args:
+        df: Dataframe (not modified)
+        bin_dtype: Data type of the bin contents, e.g. ``float32``. If None,
+            the bin contents are left unchanged.
+
+    Returns:
+        Dataframe with converted columns and dictionary of the original
+        data types of the converted columns (see :func:`restore_dtypes`)
+    """
+    converted = {}
+    original_dtypes = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if col.startswith("bin") and pd.api.types.is_float_dtype(dtype):
+            if bin_dtype is None:
+                continue
+            values = df[col].astype(bin_dtype)
+        elif pd.api.types.is_integer_dtype(dtype):
+            values = pd.to_numeric(df[col], downcast="integer")
+        else:
+            continue
+        if values.dtype != dtype:
+            converted[col] = values
+            original_dtypes[col] = str(dtype)
+    if converted:
+        df = pd.DataFrame(
+            {col: converted.get(col, df[col]) for col in df.columns},
+            index=df.index,
+        )
+    return df, original_dtypes
+
+
+def restore_dtypes(
+    df: pd.DataFrame, dtypes: Dict[str, str], compact=False
+) -> pd.DataFrame:
+    """ Convert columns back to their original data types after reading a
+    file that was written with :func:`compact_dtypes`.
+
+    Args:
+        df: Dataframe (modified in place)
+        dtypes: Dictionary of column name to data type. Columns that are not
+            in the dataframe are ignored.
+        compact: Only restore data types that are neither integer nor float
+            types (e.g. booleans) and convert the bin contents to ``float32``
+            and integer columns to the smallest integer type instead (see
+            :func:`compact_dtypes`).
+
+    Returns:
+        Dataframe
+    """
+    for col, dtype in dtypes.items():
+        if compact and (
+            pd.api.types.is_integer_dtype(dtype)
+            or pd.api.types.is_float_dtype(dtype)
+        ):
+            continue
+        if col in df.columns and str(df[col].dtype) != dtype:
+            df[col] = df[col].astype(dtype)
+    if compact:
+        df, _ = compact_dtypes(df, bin_dtype="float32")
+    return df
+
+
+def storage_metadata(
+    storage: "Storage",
+    bin_dtype: Optional[str] = None,
+    compression: Optional[str] = None,
+    dtypes: Optional[Dict[str, str]] = None,
+) -> dict:
+    """ Information about a file that is saved in its metadata (with the key
+    ``storage``) and removed again when loading it.
+
+    Args:
+        storage: :class:`Storage`
+        bin_dtype: Data type of the bin contents (None: unchanged)
+        compression: Compression codec (None: default)
+        dtypes: Original data types of the columns (in particular of those
+            that were converted with :func:`compact_dtypes`)
+
+    Returns:
+        Dictionary
+    """
+    return {
+        "format": storage.name,
+        "bin_dtype": bin_dtype,
+        "compression": compression,
+        "dtypes": dtypes or {},
+    }
+
+
+class Storage(ABC):
+    """ Base class for a file format that holds a dataframe together with its
+    metadata.
+    """
+
+    #: Name of the format as used for the ``format`` arguments
+    name = None  # type: str
+    #: File suffixes that select this format when writing
+    suffixes = ()
+    #: First bytes of files of this format
+    magic = b""
+    #: Supported compression codecs
+    compressions = ()
+    #: Can floats be saved with single precision?
+    single_precision = True
+    #: Is :meth:`writer` implemented?
+    chunked_writing = False
+
+    def check_write_options(
+        self, bin_dtype: Optional[str] = None, compression: Optional[str] = None
+    ) -> None:
+        """ Raise ``ValueError`` if the options for writing are not supported
+        by this format.
+
+        Args:
+            bin_dtype: Data type of the bin contents
+            compression: Compression codec
+
+        Returns:
+            None
+        """
+        if bin_dtype is not None and np.dtype(bin_dtype) == np.float32:
+            if not self.single_precision:
+                raise ValueError(
+                    "The format '{}' always saves floats with double "
+                    "precision.".format(self.name)
+                )
+        if compression is not None and compression not in self.compressions:
+            if not self.compressions:
+                raise ValueError(
+                    "The format '{}' doesn't support compression.".format(
+                        self.name
+                    )
+                )
+            raise ValueError(
+                "Unsupported compression '{}' for format '{}'. Supported: "
+                "{}.".format(
+                    compression, self.name, ", ".join(self.compressions)
+                )
+            )
+
+    def detect(self, path: Path) -> bool:
+        """ Check if an existing file has this format.
+
+        Args:
+            path: Path to the file
+
+        Returns:
+            bool
+        """
+        if not self.magic or not path.is_file():
+            return False
+        with path.open("rb") as inf:
+            return inf.read(len(self.magic)) == self.magic
+
+    def read(self, path: Path) -> Tuple[pd.DataFrame, str]:
+        """ Read file.
+
+        Args:
+            path: Path to input file
+
+        Returns:
+            Dataframe and JSON serialized metadata
+        """
+        return self.read_df(path), self.read_metadata(path)
+
+    @abstractmethod
+    def read_df(
+        self,
+        path: Path,
+        columns: Optional[List[str]] = None,
+        where: Optional[Dict[str, tuple]] = None,
+    ) -> pd.DataFrame:
+        """ Read only the dataframe from a file.
+
+        Args:
+            path: Path to input file
+            columns: Only read these columns (and the index)
+            where: Only read rows with values in these ranges, see
+                :func:`check_where`
+
+        Returns:
+            Dataframe
+        """
+        pass
+
+    def iter_df(
+        self,
+        path: Path,
+        rows: int,
+        columns: Optional[List[str]] = None,
+        where: Optional[Dict[str, tuple]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """ Read the dataframe from a file in chunks of rows, so that the whole
+        dataframe never has to be held in memory.
+        This implementation reads the whole dataframe and should be
+        overwritten by formats that can read parts of a file.
+
+        Args:
+            path: Path to input file
+            rows: Maximal number of rows per chunk
+            columns: Only read these columns (and the index)
+            where: Only read rows with values in these ranges, see
+                :func:`check_where`
+
+        Returns:
+            Iterator over dataframes
+        """
+        df = self.read_df(path, columns=columns, where=where)
+        for start in range(0, len(df), rows):
+            yield df.iloc[start : start + rows]
+
+    @abstractmethod
+    def read_metadata(self, path: Path) -> str:
+        """ Read only the metadata from a file. This should be fast even for
+        large files.
+
+        Args:
+            path: Path to input file
+
+        Returns:
+            JSON serialized metadata
+        """
+        pass
+
+    @abstractmethod
+    def write(
+        self,
+        path: Path,
+        df: pd.DataFrame,
+        md_json: str,
+        index_columns=(),
+        compression: Optional[str] = None,
+    ) -> None:
+        """ Write file.
+
+        Args:
+            path: Path to output file
+            df: Dataframe
+            md_json: JSON serialized metadata
+            index_columns: Columns that are frequently used to select rows
+                when reading (only used by formats that support indices)
+            compression: Compression codec (see :attr:`compressions`). If None,
+                the default of the format is used.
+
+        Returns:
+            None
+        """
+        pass
+
+    def writer(self, path: Path, index_columns=()):
+        """ Return an object to write a dataframe to a file in chunks of rows,
+        e.g. to write results while they are being calculated. It has the
+        methods ``append(df)`` (append rows), ``write_metadata(md_json)``
+        (set or replace the metadata) and ``close()``.
+
+        Args:
+            path: Path to output file
+            index_columns: See :meth:`write`
+
+        Returns:
+            Writer object
+        """
+        raise ValueError(
+            "The format '{}' doesn't support writing in chunks.".format(
+                self.name
+            )
+        )
+
+
+class SQLiteStorage(Storage):
+    """ SQLite database with a table ``df`` for the dataframe and a table
+    ``md`` for the metadata. This is the default format.
+    """
+
+    name = "sqlite"
+    suffixes = (".sql", ".sqlite", ".db")
+    magic = b"SQLite format 3\x00"
+    single_precision = False
+    chunked_writing = True
+
+    #: Number of rows that are converted and inserted at once when writing
+    chunksize = 10000
+
+    #: Pragmas that are set while writing. The journal mode is reset to
+    #: ``DELETE`` afterwards, so that the output is a single self-contained
+    #: file.
+    write_pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "cache_size": -64000,
+    }
+
+    @staticmethod
+    def _engine(path: Path):
+        return sqlalchemy.create_engine("sqlite:///" + str(path.resolve()))
+
+    @staticmethod
+    def _quote(name: str) -> str:
+        return '"{}"'.format(str(name).replace('"', '""'))
+
+    def _insert(self, connection, table: str, df: pd.DataFrame) -> None:
+        """ Insert all rows of a dataframe into an existing table. The rows
+        are converted to python objects and inserted in chunks to limit the
+        memory usage.
+        """
+        statement = "INSERT INTO {} VALUES ({})".format(
+            self._quote(table), ", ".join(["?"] * len(df.columns))
+        )
+        for start in range(0, len(df), self.chunksize):
+            chunk = df.iloc[start : start + self.chunksize]
+            # Series.tolist converts numpy scalars to python scalars, which
+            # are understood by sqlite3.
+            columns = [chunk[col].tolist() for col in chunk.columns]
+            connection.executemany(statement, zip(*columns))
+
+    def _connect(self, path: Path):
+        """ Open connection for writing with the :attr:`write_pragmas`. """
+        # We control the transactions ourselves
+        connection = sqlite3.connect(str(path), isolation_level=None)
+        for pragma, value in self.write_pragmas.items():
+            connection.execute("PRAGMA {} = {}".format(pragma, value))
+        return connection
+
+    def _create_indices(self, connection, columns: List[str]) -> None:
+        for column in columns:
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS {} ON df ({})".format(
+                    self._quote("ix_df_" + column), self._quote(column)
+                )
+            )
+
+    def _create_table(self, connection, table: str, df: pd.DataFrame):
+        """ (Re)create a table with the same schema that
+        :meth:`pandas.DataFrame.to_sql` would use.
+        """
+        connection.execute("DROP TABLE IF EXISTS {}".format(self._quote(table)))
+        # Uses the SQLAlchemy types, so that the dtypes are restored by
+        # pandas.read_sql_table
+        engine = sqlalchemy.create_engine("sqlite://")
+        connection.execute(pd.io.sql.get_schema(df, table, con=engine))
+
+    @staticmethod
+    def _select(engine, columns=None, where=None):
+        """ Query for the selected columns (and the index) and rows
+
+        Returns:
+            Query and table
+        """
+        table = sqlalchemy.Table(
+            "df", sqlalchemy.MetaData(), autoload_with=engine
+        )
+        if columns is None:
+            columns = [col.name for col in table.columns]
+        elif "index" not in columns:
+            columns = ["index"] + list(columns)
+        query = sqlalchemy.select(*[table.c[col] for col in columns])
+        for column, (minimum, maximum) in (where or {}).items():
+            if minimum is not None:
+                query = query.where(table.c[column] >= minimum)
+            if maximum is not None:
+                query = query.where(table.c[column] <= maximum)
+        return query, table
+
+    def read_df(self, path, columns=None, where=None):
+        where = check_where(where)
+        engine = self._engine(path)
+        if columns is None and not where:
+            df = pd.read_sql_table("df", engine)
+        else:
+            query, table = self._select(engine, columns=columns, where=where)
+            df = pd.read_sql_query(query, engine)
+            if df.empty:
+                # Without any values, pandas can't infer the types
+                df = df.astype(
+                    {col: table.c[col].type.python_type for col in df.columns}
+                )
+        df.set_index("index", inplace=True)
+        return df
+
+    def iter_df(self, path, rows, columns=None, where=None):
+        where = check_where(where)
+        engine = self._engine(path)
+        query, _ = self._select(engine, columns=columns, where=where)
+        # The rows are fetched from the database cursor as needed
+        for df in pd.read_sql_query(query, engine, chunksize=rows):
+            yield df.set_index("index")
+
+    def read_metadata(self, path):
+        connection = sqlite3.connect(str(path))
+        try:
+            return connection.execute("SELECT md FROM md LIMIT 1").fetchone()[0]
+        finally:
+            connection.close()
+
+    def write(self, path, df, md_json, index_columns=(), compression=None):
+        self.check_write_options(compression=compression)
+        # The index is saved as a column called "index"
+        df = df.rename_axis("index").reset_index()
+        md_df = self._md_df(md_json)
+
+        connection = self._connect(path)
+        try:
+            # Everything is written in a single transaction. If anything fails,
+            # closing the connection rolls back all changes.
+            connection.execute("BEGIN")
+            for table, table_df in [("df", df), ("md", md_df)]:
+                self._create_table(connection, table, table_df)
+                self._insert(connection, table, table_df)
+            # Creating the indices after inserting all rows is faster
+            self._create_indices(connection, index_columns)
+            connection.execute("COMMIT")
+            connection.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _md_df(md_json: str) -> pd.DataFrame:
+        # todo: perhaps it's better to use pickle in the future?
+        return pd.DataFrame({"md": [md_json]}).reset_index()
+
+    def writer(self, path, index_columns=()):
+        return SQLiteWriter(self, path, index_columns=index_columns)
+
+
+class SQLiteWriter(object):
+    """ Write a dataframe to a SQLite file in chunks of rows, see
+    :meth:`Storage.writer`. Every call of :meth:`append` and
+    :meth:`write_metadata` is committed separately and the file stays in
+    WAL mode until :meth:`close` is called, so other processes can read
+    the rows that have been written so far.
+    """
+
+    def __init__(
+        self, storage: SQLiteStorage, path: Path, index_columns=()
+    ) -> None:
+        self._storage = storage
+        self._index_columns = list(index_columns)
+        #: Columns of the table (set by the first call of :meth:`append`)
+        self._columns = None  # type: Optional[List[str]]
+        self._connection = storage._connect(path)
+
+    def append(self, df: pd.DataFrame) -> None:
+        """ Append rows. The first call creates the table, all later
+        dataframes are brought into the same form (missing columns are
+        filled with ``NULL``).
+
+        Args:
+            df: Dataframe
+
+        Returns:
+            None
+        """
+        df = df.rename_axis("index").reset_index()
+        self._connection.execute("BEGIN")
+        if self._columns is None:
+            self._storage._create_table(self._connection, "df", df)
+            self._columns = list(df.columns)
+        else:
+            df = df.reindex(columns=self._columns)
+        self._storage._insert(self._connection, "df", df)
+        self._connection.execute("COMMIT")
+
+    def write_metadata(self, md_json: str) -> None:
+        """ Set or replace the metadata.
+
+        Args:
+            md_json: JSON serialized metadata
+
+        Returns:
+            None
+        """
+        md_df = self._storage._md_df(md_json)
+        self._connection.execute("BEGIN")
+        self._storage._create_table(self._connection, "md", md_df)
+        self._storage._insert(self._connection, "md", md_df)
+        self._connection.execute("COMMIT")
+
+    def close(self) -> None:
+        """ Create indices and close the file. """
+        try:
+            if self._connection.in_transaction:
+                # Something went wrong
+                self._connection.execute("ROLLBACK")
+            if self._columns is not None:
+                self._storage._create_indices(
+                    self._connection, self._index_columns
+                )
+            self._connection.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            self._connection.close()
+
+
+class ArrowTableStorage(Storage, ABC):
+    """ Base class for columnar formats based on ``pyarrow`` tables. The
+    metadata is saved in the key-value metadata of the schema of the table.
+    """
+
+    #: Key of the metadata in the key-value metadata of the schema
+    md_key = b"clusterking_md"
+
+    def _check_pyarrow(self):
+        if pyarrow is None:
+            raise ImportError(
+                "The '{}' format requires the pyarrow package. Please install "
+                "it, e.g. with 'pip install pyarrow'.".format(self.name)
+            )
+
+    @staticmethod
+    def _index_columns(schema) -> List[str]:
+        """ Names of the columns that hold the index of the dataframe """
+        return [
+            col
+            for col in schema.pandas_metadata["index_columns"]
+            if isinstance(col, str)
+        ]
+
+    def _to_table(self, df: pd.DataFrame, md_json: str):
+        self._check_pyarrow()
+        table = pyarrow.Table.from_pandas(df, preserve_index=True)
+        metadata = dict(table.schema.metadata or {})
+        metadata[self.md_key] = md_json.encode("utf-8")
+        return table.replace_schema_metadata(metadata)
+
+    def _metadata_from_schema(self, schema) -> str:
+        metadata = schema.metadata or {}
+        if self.md_key not in metadata:
+            raise ValueError("File doesn't contain clusterking metadata.")
+        return metadata[self.md_key].decode("utf-8")
+
+    @abstractmethod
+    def _read_table(self, path: Path, columns=None, where=None):
+        """ Read ``pyarrow.Table`` with the selected columns (and the index
+        columns) and rows.
+        """
+        pass
+
+    @abstractmethod
+    def _read_schema(self, path: Path):
+        """ Read the ``pyarrow.Schema`` (including the metadata) of the file
+        without reading the data.
+        """
+        pass
+
+    def read(self, path):
+        table = self._read_table(path)
+        return table.to_pandas(), self._metadata_from_schema(table.schema)
+
+    def read_df(self, path, columns=None, where=None):
+        return self._read_table(
+            path, columns=columns, where=check_where(where)
+        ).to_pandas()
+
+    def read_metadata(self, path):
+        return self._metadata_from_schema(self._read_schema(path))
+
+    @abstractmethod
+    def _iter_batches(self, path: Path, rows: int, columns=None):
+        """ Iterate over the file in record batches with the given columns
+        (all if None).
+
+        Returns:
+            Schema (including the metadata) and iterator over the batches
+        """
+        pass
+
+    def iter_df(self, path, rows, columns=None, where=None):
+        self._check_pyarrow()
+        where = check_where(where)
+        schema = self._read_schema(path)
+        read_columns = None
+        if columns is not None:
+            columns = [
+                col for col in self._index_columns(schema) if col not in columns
+            ] + list(columns)
+            read_columns = columns + [
+                col for col in where if col not in columns
+            ]
+        pending = []
+        n_pending = 0
+        for batch in self._iter_batches(path, rows, columns=read_columns):
+            table = pyarrow.Table.from_batches([batch])
+            # The pandas metadata is needed to restore the index
+            table = table.replace_schema_metadata(schema.metadata)
+            if where:
+                mask = where_mask(
+                    lambda col: table.column(col).to_numpy(),
+                    table.num_rows,
+                    where,
+                )
+                table = table.filter(mask)
+            if columns is not None:
+                table = table.select(columns)
+            pending.append(table)
+            n_pending += table.num_rows
+            # The batches of the file don't need to have the requested size
+            while n_pending >= rows:
+                table = pyarrow.concat_tables(pending)
+                yield table.slice(0, rows).to_pandas()
+                pending = [table.slice(rows)]
+                n_pending -= rows
+        if n_pending:
+            yield pyarrow.concat_tables(pending).to_pandas()
+
+
+class ParquetStorage(ArrowTableStorage):
+    """ Parquet file (requires ``pyarrow``). """
+
+    name = "parquet"
+    suffixes = (".parquet", ".pq")
+    magic = b"PAR1"
+    compressions = ("snappy", "gzip", "brotli", "lz4", "zstd", "none")
+
+    def _read_table(self, path, columns=None, where=None):
+        self._check_pyarrow()
+        filters = []
+        for column, (minimum, maximum) in (where or {}).items():
+            if minimum is not None:
+                filters.append((column, ">=", minimum))
+            if maximum is not None:
+                filters.append((column, "<=", maximum))
+        # Row groups are skipped based on their statistics, before the
+        # remaining rows are filtered
+        return pyarrow.parquet.read_table(
+            str(path),
+            columns=columns,
+            filters=filters or None,
+            use_pandas_metadata=True,
+        )
+
+    def _read_schema(self, path):
+        self._check_pyarrow()
+        return pyarrow.parquet.read_schema(str(path))
+
+    def _iter_batches(self, path, rows, columns=None):
+        return pyarrow.parquet.ParquetFile(str(path)).iter_batches(
+            batch_size=rows, columns=columns, use_pandas_metadata=True
+        )
+
+    #: Maximal number of rows per row group. Smaller row groups allow to skip
+    #: more rows when selecting rows by their values.
+    row_group_size = 100000
+
+    def write(self, path, df, md_json, index_columns=(), compression=None):
+        self.check_write_options(compression=compression)
+        kwargs = {}
+        if compression is not None:
+            kwargs["compression"] = compression
+        pyarrow.parquet.write_table(
+            self._to_table(df, md_json),
+            str(path),
+            row_group_size=self.row_group_size,
+            **kwargs
+        )
+
+
+class ArrowStorage(ArrowTableStorage):
+    """ Arrow IPC file, also known as feather (version 2) file (requires
+    ``pyarrow``).
+    """
+
+    name = "arrow"
+    suffixes = (".arrow", ".feather")
+    magic = b"ARROW1"
+    #: Note that compressed files can't be memory-mapped without copying.
+    compressions = ("lz4", "zstd", "uncompressed")
+
+    def _read_table(self, path, columns=None, where=None):
+        self._check_pyarrow()
+        if columns is not None:
+            index_columns = self._index_columns(self._read_schema(path))
+            columns = [
+                col for col in index_columns if col not in columns
+            ] + list(columns)
+        # The file is memory-mapped, so the only columns that are read from
+        # disk are the selected ones
+        table = pyarrow.feather.read_table(str(path), columns=columns)
+        if where:
+            where_table = pyarrow.feather.read_table(
+                str(path), columns=list(where)
+            )
+            table = table.filter(
+                where_mask(
+                    lambda col: where_table.column(col).to_numpy(),
+                    where_table.num_rows,
+                    where,
+                )
+            )
+        return table
+
+    def _read_schema(self, path):
+        self._check_pyarrow()
+        with pyarrow.memory_map(str(path)) as source:
+            return pyarrow.ipc.open_file(source).schema
+
+    def _iter_batches(self, path, rows, columns=None):
+        # Compressed batches are only decompressed when they are accessed
+        with pyarrow.memory_map(str(path)) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for ibatch in range(reader.num_record_batches):
+                batch = reader.get_batch(ibatch)
+                if columns is not None:
+                    batch = batch.select(columns)
+                yield batch
+
+    def write(self, path, df, md_json, index_columns=(), compression=None):
+        self.check_write_options(compression=compression)
+        kwargs = {}
+        if compression is not None:
+            kwargs["compression"] = compression
+        pyarrow.feather.write_feather(
+            self._to_table(df, md_json), str(path), **kwargs
+        )
+
+
+class NumpyStorage(Storage):
+    """ Directory with the bin contents saved as a single contiguous
+    ``bins.npy`` array. The array is memory-mapped when loading, so it is only
+    read from disk as needed, and several processes that load the same file
+    share the same memory.
+    The remaining columns and the index are saved as separate ``.npy`` files,
+    the metadata as ``md.json``.
+    """
+
+    name = "numpy"
+    suffixes = (".npyd",)
+
+    #: Mode of :func:`numpy.load` for the bin contents. The default
+    #: (copy-on-write) means that modifications to the dataframe are possible,
+    #: but are never written back to disk.
+    mmap_mode = "c"
+
+    def detect(self, path):
+        return path.is_dir() and (path / "layout.json").is_file()
+
+    def read_df(self, path, columns=None, where=None):
+        where = check_where(where)
+        layout = json.loads((path / "layout.json").read_text())
+        all_columns = layout["columns"]
+        if columns is None:
+            columns = all_columns
+        missing = set(columns) - set(all_columns)
+        if missing:
+            raise KeyError("Unknown column(s) {}.".format(sorted(missing)))
+
+        def load_column(col):
+            return np.load(
+                str(path / "column{}.npy".format(all_columns.index(col))),
+                mmap_mode=self.mmap_mode,
+            )
+
+        bins = np.load(str(path / "bins.npy"), mmap_mode=self.mmap_mode)
+        index = np.load(str(path / "index.npy"))
+        rows = slice(None)
+        if where:
+
+            def get_column(col):
+                if col in layout["bin_columns"]:
+                    return bins[:, layout["bin_columns"].index(col)]
+                return load_column(col)
+
+            rows = np.flatnonzero(where_mask(get_column, len(index), where))
+
+        # Without a selection of rows (and bins), the dataframe references
+        # the memory-mapped array as long as the bin columns are not modified.
+        bins = bins[rows]
+        bin_columns = [col for col in columns if col in layout["bin_columns"]]
+        if bin_columns != layout["bin_columns"]:
+            bins = bins[
+                :, [layout["bin_columns"].index(col) for col in bin_columns]
+            ]
+        df = pd.DataFrame(bins, columns=bin_columns, copy=False)
+        # Inserting the other columns at increasing positions gives the
+        # requested order of the columns
+        for icol, col in enumerate(columns):
+            if col not in bin_columns:
+                df.insert(icol, col, np.asarray(load_column(col)[rows]))
+        df.index = pd.Index(index[rows], name=layout["index_name"])
+        return df
+
+    def read_metadata(self, path):
+        return (path / "md.json").read_text()
+
+    def write(self, path, df, md_json, index_columns=(), compression=None):
+        self.check_write_options(compression=compression)
+        if path.is_dir() and not self.detect(path) and any(path.iterdir()):
+            raise ValueError(
+                "'{}' is a directory that doesn't contain data in the numpy "
+                "format. Refusing to overwrite it.".format(path)
+            )
+        columns = list(df.columns)
+        bin_columns = [col for col in columns if col.startswith("bin")]
+        # Convert everything before touching the files, so that unsupported
+        # columns don't leave a half written directory.
+        arrays = {"bins": np.ascontiguousarray(df[bin_columns].to_numpy())}
+        for icol, col in enumerate(columns):
+            if col not in bin_columns:
+                arrays["column{}".format(icol)] = _npy_array(df[col], col)
+        arrays["index"] = _npy_array(df.index, "index")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write into a new directory and replace the old data only when
+        # everything has been written.
+        tmp_path = Path(
+            tempfile.mkdtemp(prefix=".{}.".format(path.name), dir=path.parent)
+        )
+        try:
+            for name, array in arrays.items():
+                np.save(
+                    str(tmp_path / "{}.npy".format(name)),
+                    array,
+                    allow_pickle=False,
+                )
+            (tmp_path / "md.json").write_text(md_json)
+            layout = {
+                "columns": columns,
+                "bin_columns": bin_columns,
+                "index_name": df.index.name,
+            }
+            (tmp_path / "layout.json").write_text(json.dumps(layout, indent=4))
+            if path.is_dir():
+                shutil.rmtree(str(path))
+            elif path.exists():
+                path.unlink()
+            tmp_path.rename(path)
+        finally:
+            if tmp_path.exists():
+                shutil.rmtree(str(tmp_path))
+
+
+def _npy_array(values: Union[pd.Series, pd.Index], name: str) -> np.ndarray:
+    """ Values of a column as array that can be saved in ``.npy`` files
+    (without pickling): Strings are converted to fixed width unicode strings.
+
+    Args:
+        values: Column or index
+        name: Name of the column (for error messages)
+
+    Returns:
+        numpy array
+    """
+    array = np.asarray(values)
+    if array.dtype != object:
+        return array
+    if pd.api.types.infer_dtype(array, skipna=False) == "string":
+        return array.astype(str)
+    raise ValueError(
+        "The column '{}' has values of type object (other than strings "
+        "without missing values), which can't be saved in the numpy "
+        "format.".format(name)
+    )
+
+
+#: All supported formats
+storages = [SQLiteStorage(), ParquetStorage(), ArrowStorage(), NumpyStorage()]
+
+
+def get_storage(
+    path: Path, format: Optional[str] = None, sniff=True
+) -> Storage:
+    """ Get the format of a file.
+
+    Args:
+        path: Path to the file
+        format: Name of the format (see :attr:`Storage.name`). If not given,
+            the format is guessed from the content of the file (if it
+            exists and ``sniff`` is set) or else from its suffix. SQLite is
+            used as a fallback.
+        sniff: Look at the content of existing files to determine their format
+
+    Returns:
+        :class:`Storage` instance
+    """
+    if format is not None:
+        for storage in storages:
+            if storage.name == format:
+                return storage
+        raise ValueError(
+            "Unknown format '{}'. Supported formats: {}.".format(
+                format, ", ".join(storage.name for storage in storages)
+            )
+        )
+    path = Path(path)
+    if sniff and path.exists():
+        for storage in storages:
+            if storage.detect(path):
+                return storage
+    for storage in storages:
+        if path.suffix.lower() in storage.suffixes:
+            return storage
+    return storages[0]
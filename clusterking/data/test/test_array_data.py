@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# std
+import copy
+from pathlib import Path
+import pickle
+import tempfile
+import unittest
+
+# 3rd
+import numpy as np
+import pandas as pd
+
+# ours
+from clusterking.util.testing import MyTestCase
+from clusterking.data.data import Data
+from clusterking.data.array_data import ArrayData
+
+
+class TestArrayData(MyTestCase):
+    def setUp(self):
+        self.path = Path(__file__).parent / "data" / "test_longer.sql"
+        self.d = Data(self.path)
+        self.ad = ArrayData(self.path)
+
+    def test_init(self):
+        self.assertIsNotNone(self.ad._arrays)
+        self.assertIsNone(self.ad._df)
+        ad = ArrayData.from_data(self.d)
+        self.assertIsNotNone(ad._arrays)
+        self.assertEqual(ad.md, self.d.md)
+        self.assertEqual(ArrayData().n, 0)
+
+    def test_same_as_data(self):
+        ad, d = self.ad, self.d
+        self.assertEqual(ad.n, d.n)
+        self.assertEqual(ad.bin_cols, d.bin_cols)
+        self.assertEqual(ad.par_cols, d.par_cols)
+        self.assertAllClose(ad.data(), d.data())
+        self.assertAllClose(ad.norms(), d.norms())
+        self.assertEqual(ad.fingerprint(), d.fingerprint())
+        self.assertEqual(ad.clusters(), d.clusters())
+        for cluster, rows in d.cluster_rows().items():
+            self.assertAllClose(ad.cluster_rows()[cluster], rows)
+        for param, values in d.get_param_values().items():
+            self.assertAllClose(ad.get_param_values(param), values)
+        self.assertAllClose(ad.grid.rows, d.grid.rows)
+        # Nothing of the above needed the dataframe
+        self.assertIsNotNone(ad._arrays)
+        self.assertIsNone(ad._df)
+
+    def test_arrays_read_only(self):
+        with self.assertRaises(ValueError):
+            self.ad.data()[0, 0] = 1
+
+    def test_subset(self):
+        for rows in [slice(3, 20, 2), [5, 1, 2], self.d.df["bpoint"].values]:
+            ad = self.ad.subset(rows)
+            self.assertIsInstance(ad, ArrayData)
+            self.assertIsNotNone(ad._arrays)
+            self.assertAllClose(ad.data(), self.d.subset(rows).data())
+            self.assertEqual(
+                list(ad.df.index), list(self.d.subset(rows).df.index)
+            )
+        self.assertEqual(self.ad.n, self.d.n)
+        # Slices are views
+        ad = self.ad.subset(slice(0, 10))
+        self.assertTrue(np.shares_memory(ad.data(), self.ad.data()))
+        ad = self.ad.copy()
+        ad.subset([0, 1], inplace=True)
+        self.assertEqual(ad.n, 2)
+
+    def test_fix_param(self):
+        param = self.d.par_cols[0]
+        value = self.d.get_param_values(param)[0]
+        ad = self.ad.fix_param(**{param: value})
+        d = self.d.fix_param(**{param: value})
+        self.assertAllClose(ad.data(), d.data())
+        self.assertIsNotNone(ad._arrays)
+
+    def test_set_column(self):
+        ad = self.ad.copy()
+        fingerprint = ad.fingerprint()
+        ad.rename_clusters(lambda c: c + 10, new_column="new")
+        self.assertIsNotNone(ad._arrays)
+        self.assertAllClose(ad._column("new"), self.d.df["cluster"].values + 10)
+        self.assertEqual(ad.clusters("new")[0], min(self.d.clusters()) + 10)
+        self.assertEqual(ad.fingerprint(), fingerprint)
+        with self.assertRaises(ValueError):
+            ad._set_column("new", [1, 2])
+        # The original is unchanged
+        self.assertNotIn("new", self.ad._columns())
+
+    def test_df(self):
+        ad = self.ad.copy()
+        df = ad.df
+        self.assertIsNone(ad._arrays)
+        pd.testing.assert_frame_equal(df, self.d.df)
+        # Changes to the dataframe are seen
+        ad.df["bin0"] = 0.0
+        self.assertAllClose(ad.data()[:, 0], 0)
+        ad.to_arrays()
+        self.assertIsNotNone(ad._arrays)
+        self.assertAllClose(ad.data()[:, 0], 0)
+
+    def test_copy_pickle(self):
+        for ad in [
+            copy.copy(self.ad),
+            copy.deepcopy(self.ad),
+            pickle.loads(pickle.dumps(self.ad)),
+        ]:
+            self.assertIsNotNone(ad._arrays)
+            self.assertEqual(ad.md, self.ad.md)
+            self.assertAllClose(ad.data(), self.d.data())
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "test.sql"
+            self.ad.write(path)
+            self.assertIsNotNone(self.ad._arrays)
+            self.assertEqual(Data(path).fingerprint(), self.d.fingerprint())
+
+    def test_lazy(self):
+        ad = ArrayData(self.path, lazy=True)
+        self.assertIsNotNone(ad._df_loader)
+        self.assertEqual(ad.n, self.d.n)
+        self.assertIsNotNone(ad._arrays)
+        # Loading into an existing object replaces the data
+        ad = ArrayData()
+        ad._load(self.path, lazy=True)
+        self.assertEqual(ad.n, self.d.n)
+        self.assertAllClose(ad.data(), self.d.data())
+
+    def test_iter_chunks(self):
+        for lazy in [False, True]:
+            ad = ArrayData(self.path, lazy=lazy)
+            chunks = list(ad.iter_chunks(rows=10))
+            self.assertEqual([chunk.n for chunk in chunks], [10] * 6 + [4])
+            self.assertAllClose(
+                np.concatenate([chunk.data() for chunk in chunks]),
+                self.d.data(),
+            )
+            arrays = list(ad.iter_chunks(20, arrays=True))
+            self.assertAllClose(
+                np.concatenate([params for params, _ in arrays]),
+                self.d.df[self.d.par_cols].values,
+            )
+            self.assertAllClose(
+                np.concatenate([bins for _, bins in arrays]), self.d.data()
+            )
+        with self.assertRaises(ValueError):
+            list(self.ad.iter_chunks(rows=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# std
+from pathlib import Path
+import pickle
+import tempfile
+import unittest
+
+# ours
+from clusterking.util.testing import MyTestCase
+from clusterking.data.data import Data
+from clusterking.data.dwe import DataWithErrors
+from clusterking.data.array_data import ArrayData
+from clusterking.data.container import DataContainer
+
+
+class TestDataContainer(MyTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "container.sql"
+        path = Path(__file__).parent / "data" / "test.sql"
+        self.datas = []
+        for i in range(3):
+            d = Data(path)
+            d.df["bin0"] += i
+            d.md["sample"] = i
+            self.datas.append(d)
+        del self.datas[2].md["scan"]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _assert_data_equal(self, d1, d2):
+        self.assertEqual(list(d1.df.columns), list(d2.df.columns))
+        self.assertEqual(list(d1.df.index), list(d2.df.index))
+        self.assertEqual(dict(d1.df.dtypes), dict(d2.df.dtypes))
+        self.assertAllClose(d1.data(), d2.data())
+        self.assertEqual(d1.df["cluster"].tolist(), d2.df["cluster"].tolist())
+        self.assertDictEqual(d1.md, d2.md)
+
+    def test_write_read(self):
+        DataContainer.write(self.path, self.datas, overwrite="raise")
+        dc = DataContainer(self.path)
+        self.assertEqual(len(dc), 3)
+        for i in [2, 0, 1]:
+            self._assert_data_equal(dc[i], self.datas[i])
+        self._assert_data_equal(dc[-1], self.datas[2])
+        self.assertEqual(len(list(dc)), 3)
+        self.assertNotIn("scan", dc.get_metadata(2))
+        with self.assertRaises(IndexError):
+            dc.get(3)
+        d = dc.get(1, compact=True)
+        self.assertEqual(str(d.df["bin0"].dtype), "float32")
+        self.assertAllClose(d.data(), self.datas[1].data())
+
+    def test_get_lazy(self):
+        DataContainer.write(self.path, self.datas, overwrite="raise")
+        d = DataContainer(self.path).get(1, cls=DataWithErrors, lazy=True)
+        self.assertIsInstance(d, DataWithErrors)
+        self.assertIsNotNone(d._df_loader)
+        d = pickle.loads(pickle.dumps(d))
+        self._assert_data_equal(d, self.datas[1])
+
+    def test_get_lazy_array_data(self):
+        DataContainer.write(self.path, self.datas, overwrite="raise")
+        d = DataContainer(self.path).get(1, cls=ArrayData, lazy=True)
+        self.assertIsNotNone(d._df_loader)
+        self.assertEqual(d.n, self.datas[1].n)
+        self.assertAllClose(d.data(), self.datas[1].data())
+        self.assertIsNotNone(d._arrays)
+        d = DataContainer(self.path).get(1, cls=ArrayData, lazy=True)
+        chunks = list(d.iter_chunks(rows=1))
+        self.assertEqual(len(chunks), self.datas[1].n)
+        self._assert_data_equal(d, self.datas[1])
+
+    def test_write_incompatible(self):
+        self.datas[1].df["new"] = 1
+        with self.assertRaises(ValueError):
+            DataContainer.write(self.path, self.datas, overwrite="raise")
+        with self.assertRaises(ValueError):
+            DataContainer.write(self.path, [], overwrite="raise")
+
+    def test_not_a_container(self):
+        self.datas[0].write(self.path)
+        with self.assertRaises(ValueError):
+            DataContainer(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
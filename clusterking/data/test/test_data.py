@@ -2,14 +2,18 @@
 
 # std
 from pathlib import Path
+import pickle
+import tempfile
 import unittest
 
 # 3rd
 import numpy as np
+import pandas as pd
 
 # ours
 from clusterking.util.testing import MyTestCase
 from clusterking.data.data import Data
+from clusterking.data.storage import pyarrow
 
 
 class TestData(MyTestCase):
@@ -62,6 +66,37 @@ class TestData(MyTestCase):
             self.d.clusters(cluster_column="other_cluster"), [0, 1]
         )
 
+    def test_cluster_rows(self):
+        d = self.nd()
+        rows = d.cluster_rows("other_cluster")
+        self.assertEqual(sorted(rows), [0, 1])
+        self.assertEqual(
+            [rows[0].tolist(), rows[1].tolist()],
+            [
+                np.flatnonzero(d.df["other_cluster"] == 0).tolist(),
+                np.flatnonzero(d.df["other_cluster"] == 1).tolist(),
+            ],
+        )
+        self.assertFalse(rows[0].flags.writeable)
+        self.assertEqual(d.cluster_sizes(), {0: 2})
+        # Cached, but updated when the clusters change
+        self.assertIs(d.cluster_rows()[0], d.cluster_rows()[0])
+        d.df.loc[d.df.index[1], "cluster"] = 5
+        self.assertEqual(d.cluster_sizes(), {0: 1, 5: 1})
+        self.assertEqual(d.cluster_rows()[5].tolist(), [1])
+        with self.assertRaises(ValueError):
+            d.cluster_rows("unknown")
+
+    def test_cluster_rows_nan(self):
+        d = self.nd()
+        d.df["cluster"] = [2.0, np.nan]
+        clusters = d.clusters()
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(clusters[0], 2.0)
+        self.assertTrue(np.isnan(clusters[1]))
+        self.assertEqual(d.cluster_rows()[clusters[1]].tolist(), [1])
+        self.assertEqual(list(d.cluster_sizes().values()), [1, 1])
+
     def test_get_param_values(self):
         self.assertEqual(
             sorted(list(self.d.get_param_values().keys())),
@@ -72,17 +107,233 @@ class TestData(MyTestCase):
         )
         self.assertAlmostEqual(self.d.get_param_values("CT_bctaunutau")[1], 0.0)
 
+    def test_data_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "test.npyd"
+            self.d.write(path)
+            d = Data(path)
+            self.assertAllClose(d.data(), self.data)
+            base = d.data()
+            while base is not None and not isinstance(base, np.memmap):
+                base = base.base
+            self.assertIsInstance(base, np.memmap)
+            # Changes are not written back to the file
+            d.df["bin0"] = 0.0
+            self.assertAllClose(d.data(), [[0, 200], [0, 500]])
+            self.assertAllClose(Data(path).data(), self.data)
+
+    def test_data_cached(self):
+        d = self.nd()
+        data = d.data()
+        self.assertIs(d.data(), data)
+        self.assertFalse(data.flags.writeable)
+        self.assertTrue(data.flags.c_contiguous)
+        bin_cols = d.bin_cols
+        bin_cols.append("modified")
+        self.assertEqual(d.bin_cols, ["bin0", "bin1"])
+        # Changes of the dataframe are picked up
+        d.df["bin0"] = d.df["bin0"] + 1
+        self.assertAllClose(d.data(), [[101, 200], [401, 500]])
+        d.df.loc[d.df.index[0], "bin1"] = 0.0
+        self.assertAllClose(d.data(), [[101, 0], [401, 500]])
+        d.df.iloc[1, d.df.columns.get_loc("bin1")] = 1.0
+        self.assertAllClose(d.data(), [[101, 0], [401, 1]])
+        d.df = d.df.rename(columns={"bin1": "other"})
+        self.assertEqual(d.bin_cols, ["bin0"])
+        self.assertAllClose(d.data(), [[101], [401]])
+        # The cache is not pickled
+        d2 = pickle.loads(pickle.dumps(d))
+        self.assertEqual(d2._cache, {})
+        self.assertAllClose(d2.data(), [[101], [401]])
+
+    def test_compact(self):
+        d = self.nd()
+        e = d.compact()
+        self.assertEqual(str(d.df["bin0"].dtype), "float64")
+        self.assertEqual(str(e.df["bin0"].dtype), "float32")
+        self.assertEqual(str(e.df["cluster"].dtype), "int8")
+        self.assertEqual(str(e.df["bpoint"].dtype), "bool")
+        self.assertEqual(e.data().dtype, np.float32)
+        self.assertAllClose(e.data(), self.data)
+        self.assertEqual(e.clusters(), d.clusters())
+        self.assertIsNone(d.compact(inplace=True))
+        self.assertEqual(str(d.df["bin1"].dtype), "float32")
+        # Compact data is loaded as such
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "test.sql"
+            d.write(path)
+            self.assertEqual(str(Data(path).df["bin0"].dtype), "float32")
+
+    def test_load_compact(self):
+        path = Path(__file__).parent / "data" / "test.sql"
+        for lazy in [False, True]:
+            with self.subTest(lazy=lazy):
+                d = Data(path, compact=True, lazy=lazy)
+                self.assertEqual(str(d.df["bin0"].dtype), "float32")
+                self.assertEqual(str(d.df["cluster"].dtype), "int8")
+                self.assertEqual(str(d.df["bpoint"].dtype), "bool")
+                self.assertAllClose(d.data(), self.data)
+
     def test_data_normed(self):
         self.assertAllClose(
             self.d.data(normalize=True), [[1 / 3, 2 / 3], [4 / 9, 5 / 9]]
         )
 
+    def test_transformed_data(self):
+        self.assertAllClose(
+            self.d.transformed_data("normalized"),
+            [[1 / 3, 2 / 3], [4 / 9, 5 / 9]],
+        )
+        self.assertAllClose(self.d.transformed_data("log"), np.log(self.data))
+        self.assertAllClose(
+            self.d.transformed_data("shape"),
+            [[1 / 30, 2 / 30], [4 / 90, 5 / 90]],
+        )
+        self.assertAllClose(
+            self.d.transformed_data("cumulative"), [[1 / 3, 1], [4 / 9, 1]]
+        )
+        with self.assertRaises(ValueError):
+            self.d.transformed_data("unknown")
+
+    def test_transformed_data_cached(self):
+        d = self.nd()
+        normalized = d.transformed_data("normalized")
+        self.assertIs(d.transformed_data("normalized"), normalized)
+        self.assertFalse(normalized.flags.writeable)
+        d.df = d.df.iloc[:1]
+        self.assertAllClose(d.transformed_data("normalized"), [[1 / 3, 2 / 3]])
+
+    def test_fingerprint(self):
+        d = self.nd()
+        fingerprint = d.fingerprint()
+        self.assertEqual(len(fingerprint), 64)
+        self.assertEqual(self.nd().fingerprint(), fingerprint)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "test.sql"
+            d.write(path)
+            self.assertEqual(Data(path).fingerprint(), fingerprint)
+        # Other columns don't matter
+        d.df["cluster"] = 5
+        self.assertEqual(d.fingerprint(), fingerprint)
+        d.df = d.df.iloc[::-1]
+        self.assertNotEqual(d.fingerprint(), fingerprint)
+        d = self.nd()
+        d.df["bin1"] = d.df["bin1"] + 1
+        self.assertNotEqual(d.fingerprint(), fingerprint)
+        # In-place edits after the fingerprint was computed
+        d = self.nd()
+        self.assertEqual(d.fingerprint(), fingerprint)
+        d.df.loc[d.df.index[0], "bin0"] = 10.0
+        self.assertNotEqual(d.fingerprint(), fingerprint)
+        d = self.nd()
+        self.assertEqual(d.fingerprint(), fingerprint)
+        d.df.iloc[1, d.df.columns.get_loc(d.par_cols[0])] = 10.0
+        self.assertNotEqual(d.fingerprint(), fingerprint)
+
+    # **************************************************************************
+    # Chunks
+    # **************************************************************************
+
+    def test_iter_chunks(self):
+        path = Path(__file__).parent / "data" / "test_longer.sql"
+        d = Data(path)
+        for lazy in [False, True]:
+            chunks = list(Data(path, lazy=lazy).iter_chunks(rows=10))
+            self.assertEqual([chunk.n for chunk in chunks], [10] * 6 + [4])
+            self.assertEqual(chunks[0].par_cols, d.par_cols)
+            self.assertAllClose(
+                np.concatenate([chunk.data() for chunk in chunks]), d.data()
+            )
+            arrays = list(Data(path, lazy=lazy).iter_chunks(20, arrays=True))
+            self.assertEqual(len(arrays), 4)
+            self.assertAllClose(
+                np.concatenate([params for params, _ in arrays]),
+                d.df[d.par_cols].values,
+            )
+            self.assertAllClose(
+                np.concatenate([bins for _, bins in arrays]), d.data()
+            )
+        # Chunks are read from the file
+        d_lazy = Data(path, lazy=True)
+        list(d_lazy.iter_chunks(rows=10))
+        self.assertIsNotNone(d_lazy._df_loader)
+        with self.assertRaises(ValueError):
+            list(d_lazy.iter_chunks(rows=0))
+
+    def test_map_chunks(self):
+        d = self.nd()
+        self.assertAllClose(
+            d._map_chunks(lambda chunk: chunk.norms(), rows=1), d.norms()
+        )
+        d.df = d.df.iloc[:0]
+        self.assertEqual(
+            d._map_chunks(lambda chunk: chunk.data()).shape, (0, 2)
+        )
+
+    # **************************************************************************
+    # Combining
+    # **************************************************************************
+
+    def test_concat(self):
+        d1 = self.nd()
+        d2 = self.nd()
+        d2.df["bin0"] += 1
+        d2.md["scan"]["time"] = "later"
+        d3 = self.nd()
+        del d3.df["cluster"]
+        e = Data.concat([d1, d2, d3])
+        self.assertIsInstance(e, Data)
+        self.assertEqual(e.n, 6)
+        self.assertEqual(list(e.df.index), list(range(6)))
+        self.assertEqual(e.df.index.name, d1.df.index.name)
+        data = np.array(self.data)
+        self.assertAllClose(
+            e.data(), np.concatenate([data, data + [1, 0], data])
+        )
+        self.assertTrue(e.df["cluster"].iloc[4:].isna().all())
+        self.assertEqual(len(e.md["scan"]["previous"]), 2)
+        self.assertEqual(e.md["scan"]["previous"][0]["time"], "later")
+        self.assertNotIn("previous", d1.md["scan"])
+        with self.assertRaises(ValueError):
+            Data.concat([d1, d2], index="keep")
+        e = Data.concat([d1.subset([0]), d2.subset([1])], index="keep")
+        self.assertEqual(list(e.df.index), list(d1.df.index))
+
+    def test_concat_incompatible(self):
+        d2 = self.nd()
+        d2.df["bin2"] = 0.0
+        with self.assertRaises(ValueError):
+            Data.concat([self.d, d2])
+        d2 = self.nd()
+        d2.md["scan"]["dfunction"]["binning"] = [0, 5, 20]
+        with self.assertRaises(ValueError):
+            Data.concat([self.d, d2])
+        with self.assertRaises(ValueError):
+            Data.concat([])
+
     # **************************************************************************
     # Subsample
     # **************************************************************************
 
     # see next class
 
+    # **************************************************************************
+    # Renaming clusters
+    # **************************************************************************
+
+    def test_rename_clusters(self):
+        d = self.nd()
+        d.df["cluster"] = [7, 3]
+        d.rename_clusters()
+        self.assertEqual(d.df["cluster"].tolist(), [1, 0])
+        d.rename_clusters({0: "a"}, new_column="named")
+        self.assertEqual(d.df["named"].tolist(), [1, "a"])
+        self.assertEqual(d.df["cluster"].tolist(), [1, 0])
+        d.rename_clusters(lambda name: name + 10)
+        self.assertEqual(d.df["cluster"].tolist(), [11, 10])
+        with self.assertRaises(ValueError):
+            d.rename_clusters(3)
+
     # **************************************************************************
     # Quick plots
     # **************************************************************************
@@ -117,6 +368,29 @@ class TestSubSample(MyTestCase):
     def nd(self):
         return self.d.copy(deep=True)
 
+    def test_subset(self):
+        bins = self.d.data().copy()
+        e = self.d.subset(slice(2, 5))
+        self.assertEqual(e.n, 3)
+        self.assertEqual(list(e.df.index), list(self.d.df.index[2:5]))
+        self.assertDictEqual(e.md, self.d.md)
+        self.assertIsNot(e.md, self.d.md)
+        # Slices are views (pandas >= 3 always uses copy-on-write, so this
+        # is safe) ...
+        self.assertTrue(
+            np.shares_memory(e.df["bin0"].values, self.d.df["bin0"].values)
+        )
+        # ... and the original stays untouched when they are modified
+        e.df.loc[e.df.index[0], "bin0"] = 100.0
+        e.md["new"] = 1
+        self.assertAllClose(self.d.data(), bins)
+        self.assertNotIn("new", self.d.md)
+        self.assertEqual(self.d.subset([0, 3]).n, 2)
+        self.assertEqual(self.d.subset(np.arange(self.d.n) < 4).n, 4)
+        d = self.nd()
+        self.assertIsNone(d.subset([1], inplace=True))
+        self.assertEqual(d.n, 1)
+
     def test_only_bpoints(self):
         self.assertEqual(self.d.only_bpoints().n, 1)
         self.assertEqual(self.d.only_bpoints(bpoint_column="bpoint1").n, 2)
@@ -180,6 +454,27 @@ class TestSubSample(MyTestCase):
         )
         self.assertEqual(e.n, 3)
 
+    def test_fix_param_grid_index(self):
+        d = self.nd()
+        rng = np.random.RandomState(0)
+        d.df["a"] = rng.choice([0.0, 0.5, 0.5 + 1e-9, 1.0], size=d.n)
+        d.df["b"] = rng.choice([-1.0, 2.0, 3.0], size=d.n)
+        kwargs = dict(a=[0.3, 0.9, -5], b=2.6)
+        # Reference: Nearest value and np.isclose as before the index
+        selector = np.full(d.n, True)
+        for param, values in kwargs.items():
+            column = d.df[param].values
+            param_selector = np.full(d.n, False)
+            for value in np.atleast_1d(values):
+                nearest = column[np.abs(column - value).argmin()]
+                param_selector |= np.isclose(column, nearest)
+            selector &= param_selector
+        e = d.fix_param(**kwargs)
+        self.assertEqual(list(e.df.index), list(d.df.index[selector]))
+        # The cached index is rebuilt after changes
+        d.df["b"] = 3.0
+        self.assertEqual(d.fix_param(b=0).n, d.n)
+
     def test_sample_param(self):
         e = self.d.sample_param(a=0)
         self.assertEqual(e.n, 0)
@@ -224,9 +519,71 @@ class TestSubSample(MyTestCase):
         )
         self.assertEqual(e.n, 16)
 
+    def test_load_columns_where(self):
+        formats = ["sqlite", "numpy"]
+        if pyarrow is not None:
+            formats.extend(["parquet", "arrow"])
+        df = self.d.df
+        expected = df[(df.a >= 1) & (df.a <= 2) & (df.b <= 1)]
+        expected = expected[["bin0", "a", "cluster"]]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for format in formats:
+                with self.subTest(format=format):
+                    path = Path(tmpdir) / format
+                    self.d.write(path, format=format)
+                    e = Data(
+                        path,
+                        columns=["bin0", "a", "cluster"],
+                        where={"a": (1, 2), "b": (None, 1)},
+                    )
+                    self.assertTrue(e.df.equals(expected))
+                    e = Data(path, where={"a": (10, 20)})
+                    self.assertEqual(e.n, 0)
+                    self.assertEqual(list(e.df.dtypes), list(df.dtypes))
+                    with self.assertRaises(ValueError):
+                        Data(path, where={"a": 1})
+
     def test_sample_param_random(self):
         e = self.d.sample_param_random(n=5)
         self.assertEqual(e.n, 5)
+        e = self.d.sample_param_random(
+            n=5, bpoints=True, bpoint_column="bpoint2"
+        )
+        self.assertEqual(e.n, 5 + 3)
+        self.assertEqual(e.df["bpoint2"].sum(), 3)
+
+    def test_interpolate_grid(self):
+        e = self.d.interpolate_grid(a=7)
+        self.assertEqual(e.n, 7 * 4 * 4)
+        self.assertAllClose(
+            e.get_param_values("a"), [0, 0.5, 1, 1.5, 2, 2.5, 3]
+        )
+        # The bin contents of the test data are linear in the parameters
+        params = e.df[["a", "b", "c"]].values
+        self.assertAllClose(e.data()[:, 0], params @ [16, 4, 1] - 1)
+        self.assertEqual(list(e.df.columns), ["a", "b", "c", "bin0", "bin1"])
+        self.assertEqual(e.md["interpolated"]["method"], "linear")
+        self.assertFalse("cluster" in e.md)
+        # Original object is untouched
+        self.assertEqual(self.d.n, 4 * 4 * 4)
+
+    def test_interpolate_grid_range(self):
+        e = self.d.interpolate_grid(a=(0, 1, 3), b=2)
+        self.assertEqual(e.n, 3 * 2 * 4)
+        self.assertAllClose(e.get_param_values("a"), [0, 0.5, 1])
+        self.assertAllClose(e.get_param_values("b"), [0, 3])
+
+    def test_interpolate_grid_irregular(self):
+        with self.assertRaises(ValueError):
+            self.d.sample_param_random(n=5).interpolate_grid(a=3)
+        # Scattered sample points
+        d = self.d.copy()
+        d.df = pd.concat([d.df] * 500, ignore_index=True)
+        rng = np.random.default_rng(0)
+        for param in d.par_cols:
+            d.df[param] = rng.uniform(size=d.n)
+        with self.assertRaises(ValueError):
+            d.interpolate_grid(a=3)
 
     def test_find_closest_spoints(self):
         self.assertAllClose(
@@ -252,6 +609,52 @@ class TestSubSample(MyTestCase):
             [[0, 0, 0], [0, 1, 0], [0, 1, 1], [0, 2, 0], [1, 1, 0]],
         )
 
+    def test_find_closest_spoints_scale(self):
+        e = self.d.find_closest_spoints(
+            point=dict(a=0, b=0, c=0), n=3, scale=dict(a=10, b=10)
+        )
+        self.assertAllClose(
+            e.df[["a", "b", "c"]].values[0], np.array([0, 0, 0])
+        )
+        self.assertAllClose(
+            sorted(e.df[["a", "b", "c"]].values.tolist()[1:]),
+            [[0, 1, 0], [1, 0, 0]],
+        )
+        with self.assertRaises(ValueError):
+            self.d.find_closest_spoints(dict(a=0, b=0, c=0), scale=dict(x=1))
+
+    def test_find_closest_rows(self):
+        points = np.array([[0, 0, 0], [1.1, 2.1, 0.9], [100, 100, 100]])
+        distances, rows = self.d.find_closest_rows(points, n=2)
+        self.assertEqual(rows.shape, (3, 2))
+        values = self.d.df[["a", "b", "c"]].values
+        for point, dists, point_rows in zip(points, distances, rows):
+            expected = np.sort(np.linalg.norm(values - point, axis=1))[:2]
+            self.assertAllClose(dists, expected)
+            self.assertAllClose(
+                np.linalg.norm(values[point_rows] - point, axis=1), expected
+            )
+        # Same result for dictionaries and dataframes of points
+        df = pd.DataFrame(points, columns=["a", "b", "c"])
+        self.assertAllClose(self.d.find_closest_rows(df, n=2)[1], rows)
+        self.assertAllClose(self.d.find_closest_rows(dict(df), n=2)[1], rows)
+        with self.assertRaises(ValueError):
+            self.d.find_closest_rows(points[:, :2])
+
+    def test_find_closest_bpoints(self):
+        bpoints = np.flatnonzero(self.d.df["bpoint2"].values)
+        distances, rows = self.d.find_closest_rows(
+            dict(a=0, b=0, c=0), n=5, bpoint_column="bpoint2"
+        )
+        self.assertEqual(sorted(rows[0][:3]), sorted(bpoints))
+        self.assertAllClose(rows[0][3:], [-1, -1])
+        self.assertTrue(np.all(np.isinf(distances[0][3:])))
+        e = self.d.find_closest_bpoints(
+            dict(a=0, b=0, c=0), n=5, bpoint_column="bpoint2"
+        )
+        self.assertEqual(e.n, 3)
+        self.assertTrue(e.df["bpoint2"].all())
+
 
 if __name__ == "__main__":
     unittest.main()
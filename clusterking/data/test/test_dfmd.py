@@ -5,9 +5,14 @@ from pathlib import Path
 import tempfile
 import unittest
 
+# 3rd
+import numpy as np
+import pandas as pd
+
 # ours
 from clusterking.util.testing import MyTestCase
 from clusterking.data.dfmd import DFMD
+from clusterking.data.storage import get_storage, pyarrow, SQLiteStorage
 
 
 class TestDFMD(MyTestCase):
@@ -69,6 +74,184 @@ class TestDFMD(MyTestCase):
             dfmd_loaded = DFMD(Path(tmpdir) / "tmp_test.sql")
             self._compare_dfs(dfmd, dfmd_loaded)
 
+    def _test_write_read_format(self, name, format, expected_format):
+        dfmd = self.ndfmd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / name
+            dfmd.write(path, format=format)
+            self.assertEqual(get_storage(path).name, expected_format)
+            dfmd_loaded = DFMD(path)
+            self._compare_dfs(dfmd, dfmd_loaded)
+            self.assertTrue(dfmd.df.equals(dfmd_loaded.df))
+            self.assertEqual(list(dfmd_loaded.df.index.names), ["index"])
+            self.assertDictEqual(dfmd.md, dfmd_loaded.md)
+            self.assertDictEqual(dfmd.md, DFMD.load_metadata(path))
+            self.assertTrue(dfmd.df.equals(DFMD(path, lazy=True).df))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_write_read_parquet(self):
+        self._test_write_read_format("tmp_test.parquet", None, "parquet")
+        self._test_write_read_format("tmp_test.sql", "parquet", "parquet")
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_write_read_arrow(self):
+        self._test_write_read_format("tmp_test.arrow", None, "arrow")
+        self._test_write_read_format("tmp_test", "arrow", "arrow")
+
+    def test_write_read_numpy(self):
+        self._test_write_read_format("tmp_test.npyd", None, "numpy")
+        self._test_write_read_format("tmp_test.sql", "numpy", "numpy")
+
+    def test_write_numpy_strings(self):
+        dfmd = self.ndfmd()
+        dfmd.df["label"] = ["x", "yz"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "tmp_test.npyd"
+            dfmd.write(path)
+            self.assertEqual(DFMD(path).df["label"].tolist(), ["x", "yz"])
+            # Unsupported columns don't destroy the old data
+            dfmd.df["label"] = [object(), None]
+            with self.assertRaises(ValueError):
+                dfmd.write(path, overwrite="overwrite")
+            self.assertEqual(DFMD(path).df["label"].tolist(), ["x", "yz"])
+            self.assertEqual(list(Path(tmpdir).iterdir()), [path])
+
+    def test_load_metadata(self):
+        md = DFMD.load_metadata(Path(__file__).parent / "data" / "test.sql")
+        self.assertDictEqual(md, self.dfmd.md)
+        with self.assertRaises(FileNotFoundError):
+            DFMD.load_metadata(Path(__file__).parent / "data" / "missing.sql")
+
+    def test_lazy(self):
+        path = Path(__file__).parent / "data" / "test.sql"
+        dfmd = DFMD(path, lazy=True)
+        self.assertDictEqual(dfmd.md, self.dfmd.md)
+        self.assertIsNotNone(dfmd._df_loader)
+        self.assertTrue(dfmd.df.equals(self.dfmd.df))
+        self.assertIsNone(dfmd._df_loader)
+        # Setting the dataframe before it was loaded
+        dfmd = DFMD(path, lazy=True)
+        dfmd.df = dfmd.df.iloc[:0]
+        self.assertEqual(len(dfmd.df), 0)
+
+    def test_write_read_sqlite_chunked(self):
+        dfmd = self.ndfmd()
+        storage = SQLiteStorage()
+        storage.chunksize = 1
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "tmp_test.sql"
+            # Overwrite existing file
+            dfmd.write(path)
+            storage.write(path, dfmd.df, "{}")
+            df, md_json = storage.read(path)
+            self.assertTrue(df.equals(dfmd.df))
+            self.assertEqual(md_json, "{}")
+            # No journal files are left behind
+            self.assertEqual(
+                [p.name for p in Path(tmpdir).iterdir()], [path.name]
+            )
+
+    def _test_write_compact(self, format, compression):
+        dfmd = self.ndfmd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "test"
+            dfmd.write(
+                path,
+                format=format,
+                bin_dtype="float32",
+                compression=compression,
+            )
+            storage = get_storage(path)
+            df = storage.read_df(path)
+            self.assertEqual(str(df["bin0"].dtype), "float32")
+            self.assertEqual(str(df["cluster"].dtype), "int8")
+            self.assertEqual(str(df["bpoint"].dtype), "bool")
+            # Loading is transparent
+            dfmd_loaded = DFMD(path)
+            df_loaded = dfmd_loaded.df
+            self.assertEqual(list(df_loaded.dtypes), list(dfmd.df.dtypes))
+            bin_cols = ["bin0", "bin1"]
+            self.assertAllClose(df_loaded[bin_cols], dfmd.df[bin_cols])
+            self.assertTrue(
+                df_loaded.drop(bin_cols, axis=1).equals(
+                    dfmd.df.drop(bin_cols, axis=1)
+                )
+            )
+            self.assertDictEqual(dfmd_loaded.md, dfmd.md)
+
+    def test_write_compact_numpy(self):
+        self._test_write_compact("numpy", None)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_write_compact_parquet(self):
+        self._test_write_compact("parquet", "zstd")
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_write_compact_arrow(self):
+        self._test_write_compact("arrow", "zstd")
+
+    def _test_iter_df(self, format):
+        dfmd = DFMD()
+        dfmd.df = pd.DataFrame(
+            {
+                "a": np.linspace(0, 1, 25),
+                "bin0": np.arange(25.0),
+                "bin1": np.ones(25),
+                "cluster": np.arange(25) % 3,
+                "bpoint": np.arange(25) % 5 == 0,
+            },
+            index=pd.Index(np.arange(25) + 10, name="index"),
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "test"
+            dfmd.write(path, format=format)
+            storage = get_storage(path)
+            for kwargs in [
+                {},
+                {"columns": ["bin0", "cluster"], "where": {"a": (0.3, None)}},
+            ]:
+                chunks = list(storage.iter_df(path, 4, **kwargs))
+                self.assertTrue(all(len(chunk) <= 4 for chunk in chunks))
+                self.assertTrue(
+                    pd.concat(chunks).equals(storage.read_df(path, **kwargs))
+                )
+            # The data types are restored
+            chunks = list(DFMD(path, lazy=True)._iter_df(7))
+            self.assertEqual([len(chunk) for chunk in chunks], [7, 7, 7, 4])
+            self.assertTrue(pd.concat(chunks).equals(dfmd.df))
+
+    def test_iter_df_sqlite(self):
+        self._test_iter_df("sqlite")
+
+    def test_iter_df_numpy(self):
+        self._test_iter_df("numpy")
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_iter_df_parquet(self):
+        self._test_iter_df("parquet")
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_iter_df_arrow(self):
+        self._test_iter_df("arrow")
+
+    def test_write_unsupported_options(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "test.sql"
+            with self.assertRaises(ValueError):
+                self.dfmd.write(path, bin_dtype="float32")
+            with self.assertRaises(ValueError):
+                self.dfmd.write(path, compression="zstd")
+            with self.assertRaises(ValueError):
+                self.dfmd.write(path, format="numpy", compression="zstd")
+            with self.assertRaises(ValueError):
+                self.dfmd.write(path, format="parquet", compression="unknown")
+            self.assertFalse(path.exists())
+
+    def test_write_unknown_format(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.assertRaises(ValueError):
+                self.dfmd.write(Path(tmpdir) / "test.sql", format="unknown")
+
     def test_handle_overwrite(self):
         dfmd = DFMD()
         dfmd2 = self.ndfmd()
@@ -10,6 +10,7 @@ import numpy as np
 # ours
 from clusterking.util.testing import MyTestCase
 from clusterking.data.dwe import DataWithErrors
+from clusterking.maths.statistics import cov2err
 
 
 class TestDataWithErrors(MyTestCase):
@@ -136,6 +137,25 @@ class TestDataWithErrors(MyTestCase):
         self.assertAllClose(rel_err1, rel_err2 * 2)
 
     # --------------------------------------------------------------------------
+    def test_chunks(self):
+        dwe = DataWithErrors(Path(__file__).parent / "data" / "test_longer.sql")
+        dwe.add_rel_err_maxcorr(0.1)
+        dwe.add_err_uncorr(0.3)
+        err = cov2err(dwe.cov())
+        decorrelated = np.einsum(
+            "kij,kj->ki", np.linalg.inv(dwe.corr()), dwe.data()
+        )
+        dwe.chunk_rows = 5
+        self.assertAllClose(dwe.err(), err)
+        self.assertAllClose(dwe.data(decorrelate=True), decorrelated)
+
+    def test_fingerprint(self):
+        dwe = self.ndwe()
+        fingerprint = dwe.fingerprint()
+        dwe.add_err_uncorr(0.1)
+        self.assertNotEqual(dwe.fingerprint(), fingerprint)
+        self.assertEqual(dwe.copy().fingerprint(), dwe.fingerprint())
+
     def test_plot_dist_err(self):
         self.dwe.plot_dist_err()
 
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# std
+from pathlib import Path
+import unittest
+
+# 3rd
+import numpy as np
+import pandas as pd
+
+# ours
+from clusterking.util.testing import MyTestCase
+from clusterking.data.data import Data
+from clusterking.data.grid import Grid, _group_values
+
+
+class TestGrid(MyTestCase):
+    def setUp(self):
+        # 3 x 2 grid in random order with the point (a=0.5, b=1) missing
+        self.df = pd.DataFrame(
+            {
+                "a": [0.5, 0.0, 1.0, 0.0, 1.0],
+                "b": [-1.0, 1.0, -1.0, -1.0, 1.0],
+            }
+        )
+        self.grid = Grid(self.df, ["a", "b"])
+
+    def test_coordinates(self):
+        self.assertEqual(self.grid.shape, (3, 2))
+        self.assertAllClose(self.grid.values["a"], [0, 0.5, 1])
+        self.assertAllClose(
+            self.grid.coordinates, [[1, 0], [0, 1], [2, 0], [0, 0], [2, 1]]
+        )
+        self.assertAllClose(self.grid.rows, [[3, 1], [0, -1], [2, 4]])
+        self.assertFalse(self.grid.complete)
+        self.assertAllClose(self.grid.row(self.grid.coordinates), np.arange(5))
+        self.assertAllClose(self.grid.row([[1, 1], [3, 0], [-1, 0]]), [-1] * 3)
+
+    def test_neighbours(self):
+        self.assertAllClose(self.grid.neighbours(0), [2, -1, -1, 0, -1])
+        self.assertAllClose(self.grid.neighbours("a", -1), [3, -1, 0, -1, -1])
+        self.assertAllClose(self.grid.neighbours(1, rows=[3, 0]), [1, -1])
+        with self.assertRaises(ValueError):
+            self.grid.neighbours("c")
+        with self.assertRaises(ValueError):
+            self.grid.neighbours(2)
+
+    def test_neighbour_pairs(self):
+        self.assertEqual(
+            sorted(map(tuple, self.grid.neighbour_pairs().tolist())),
+            [(0, 2), (2, 4), (3, 0), (3, 1)],
+        )
+        connectivity = self.grid.connectivity().toarray()
+        self.assertAllClose(connectivity, connectivity.T)
+        self.assertEqual(connectivity.sum(), 8)
+        self.assertEqual(connectivity[0, 3], 1)
+
+    def test_duplicates(self):
+        with self.assertRaises(ValueError):
+            Grid(pd.concat([self.df, self.df.iloc[:1]]), ["a", "b"])
+
+    def test_scattered(self):
+        # Would need a grid with 2000^3 points
+        df = pd.DataFrame(
+            np.random.default_rng(0).uniform(size=(2000, 3)),
+            columns=["a", "b", "c"],
+        )
+        with self.assertRaises(ValueError):
+            Grid(df, ["a", "b", "c"])
+
+    def test_rounding_errors(self):
+        df = self.df.copy()
+        df["a"] = df["a"] + np.array([0, 1e-12, 0, -1e-12, 0])
+        grid = Grid(df, ["a", "b"])
+        self.assertEqual(grid.shape, (3, 2))
+        self.assertAllClose(grid.rows, self.grid.rows)
+
+    def test_group_values_fine(self):
+        # Consecutive values are close, but the groups must not be chained
+        column = np.arange(200000) * 5e-6
+        values, inverse = _group_values(column)
+        self.assertTrue(np.all(np.isclose(column, values[inverse])))
+        self.assertFalse(np.any(np.isclose(values[1:], values[:-1])))
+        # Values below 0.5 are further apart than the tolerance
+        self.assertEqual(np.sum(values < 0.499), np.sum(column < 0.499))
+        self.assertGreater(len(values), 140000)
+
+    def test_data_grid(self):
+        path = Path(__file__).parent / "data" / "test_longer.sql"
+        d = Data(path)
+        grid = d.grid
+        self.assertIs(d.grid, grid)
+        self.assertTrue(grid.complete)
+        self.assertEqual(grid.shape, (4, 4, 4))
+        # Every inner point has two neighbours per axis
+        self.assertEqual(len(grid.neighbour_pairs()), 3 * 3 * 4 * 4)
+        values = d.df[d.par_cols].values
+        for axis in range(3):
+            neighbours = grid.neighbours(axis)
+            found = neighbours >= 0
+            steps = values[neighbours[found]] - values[found]
+            self.assertAllClose(steps[:, axis], 1)
+            self.assertAllClose(np.delete(steps, axis, axis=1), 0)
+        d.df = d.df.iloc[:10]
+        self.assertIsNot(d.grid, grid)
+        self.assertFalse(d.grid.complete)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,12 @@ from typing import Callable
 from clusterking.data.dwe import DataWithErrors
 
 
+#: Maximal number of elements of the intermediate arrays of
+#: :func:`chi2_metric`. The distances are computed in blocks of rows to stay
+#: below this limit.
+chi2_max_block_size = 10 ** 7
+
+
 def condense_distance_matrix(matrix):
     """ Convert a square-form distance matrix  to a vector-form distance vector
 
@@ -110,28 +116,36 @@ def chi2_metric(dwe: DataWithErrors, output="condensed"):
 
     # https://root.cern.ch/doc/master/classTH1.html#a6c281eebc0c0a848e7a0d620425090a5
 
+    # The per-row quantities are computed in chunks of rows, so that the
+    # covariance matrices of all rows are never held in memory at once
+    # (and the data can be read from the file chunk by chunk)
     # n vector
-    n = dwe.norms()  # todo: this stays untouched by decorrelation, right?
+    # todo: this stays untouched by decorrelation, right?
+    n = dwe._map_chunks(lambda chunk: chunk.norms())
     # n x nbins
-    d = dwe.data(decorrelate=True)
+    d = dwe._map_chunks(lambda chunk: chunk.data(decorrelate=True))
     # n x nbins
-    e = dwe.err()
-
-    # n x n x nbins
-    nom1 = np.einsum("k,li->kli", n, d)
-    nom2 = np.transpose(nom1, (1, 0, 2))
-    nominator = np.square(nom1 - nom2)
-
-    # n x n x nbins
-    den1 = np.einsum("k,li->kli", n, e)
-    den2 = np.transpose(den1, (1, 0, 2))
-    denominator = np.square(den1) + np.square(den2)
-
-    # n x n x nbins
-    summand = nominator / denominator
+    e = dwe._map_chunks(lambda chunk: chunk.err())
 
+    nrows, nbins = d.shape
     # n x n
-    chi2ndf = np.einsum("kli->kl", summand) / dwe.nbins
+    chi2ndf = np.empty((nrows, nrows))
+    block = max(1, chi2_max_block_size // max(1, nrows * nbins))
+    for start in range(0, nrows, block):
+        rows = slice(start, start + block)
+
+        # block x n x nbins
+        nom1 = np.einsum("k,li->kli", n[rows], d)
+        nom2 = np.einsum("l,ki->kli", n, d[rows])
+        nominator = np.square(nom1 - nom2)
+
+        # block x n x nbins
+        den1 = np.einsum("k,li->kli", n[rows], e)
+        den2 = np.einsum("l,ki->kli", n, e[rows])
+        denominator = np.square(den1) + np.square(den2)
+
+        # block x n
+        chi2ndf[rows] = np.einsum("kli->kl", nominator / denominator) / nbins
 
     if output == "condensed":
         return condense_distance_matrix(chi2ndf)
@@ -2,6 +2,7 @@
 
 # std
 import unittest
+from pathlib import Path
 
 # ours
 from clusterking.maths.metric import *
@@ -27,6 +28,34 @@ class TestMetric(MyTestCase):
             uncondense_distance_matrix(self.d_matrix_condensed), self.d_matrix
         )
 
+    def test_chi2_metric_blocks(self):
+        import clusterking.maths.metric
+
+        path = (
+            Path(__file__).parent.parent.parent
+            / "data"
+            / "test"
+            / "data"
+            / "test_longer.sql"
+        )
+        dwe = DataWithErrors(path)
+        # The first distribution vanishes
+        dwe.df = dwe.df.iloc[1:]
+        dwe.add_rel_err_uncorr(0.1)
+        dwe.add_err_uncorr(0.3)
+        full = chi2_metric(dwe, output="full")
+        self.assertEqual(full.shape, (dwe.n, dwe.n))
+        default_block_size = clusterking.maths.metric.chi2_max_block_size
+        try:
+            clusterking.maths.metric.chi2_max_block_size = 1
+            dwe.chunk_rows = 7
+            self.assertAllClose(chi2_metric(dwe, output="full"), full)
+            self.assertAllClose(
+                chi2_metric(dwe), condense_distance_matrix(full)
+            )
+        finally:
+            clusterking.maths.metric.chi2_max_block_size = default_block_size
+
 
 if __name__ == "__main__":
     unittest.main()
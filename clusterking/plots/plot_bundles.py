@@ -65,6 +65,10 @@ class BundlePlot(object):
 
         self.bpoint_column = "bpoint"
 
+        #: Row numbers of all clusters, looked up once per plot (see
+        #: :meth:`_get_df_cluster`)
+        self._cluster_rows = None  # type: Optional[Dict[Any, np.ndarray]]
+
         #: Color scheme
         # fixme: this will be problematic if I reinitialize this
         if self._has_clusters:
@@ -132,8 +136,9 @@ class BundlePlot(object):
     def _filter_clusters(self, clusters: Iterable[int]) -> List[int]:
         """ Return list of existing clusters only. """
         clusters = list(set(clusters))
-        selection = [c for c in clusters if c in self._clusters]
-        removed = [c for c in clusters if c not in self._clusters]
+        existing = self._clusters
+        selection = [c for c in clusters if c in existing]
+        removed = [c for c in clusters if c not in existing]
         if removed:
             self.log.warning(
                 "The cluster(s) {} does not exist in data, "
@@ -166,12 +171,21 @@ class BundlePlot(object):
                     "No cluster information available, but individual clusters"
                     " were requested."
                 )
+        # Every plot method starts here, so this is the place to look up the
+        # rows of all clusters before they are plotted one by one
+        self._update_cluster_rows()
         if isinstance(clusters, int):
             clusters = [clusters]
         if not clusters:
             clusters = self._clusters
         return self._filter_clusters(clusters)
 
+    def _update_cluster_rows(self) -> None:
+        """ Look up the row numbers of all clusters (used by
+        :meth:`_get_df_cluster`).
+        """
+        self._cluster_rows = self.data.cluster_rows(self.cluster_column)
+
     # todo: getting the bpoint should be a different function
     def _get_df_cluster(
         self, cluster: Union[None, int], bpoint=None, bpoint_return_index=False
@@ -192,7 +206,9 @@ class BundlePlot(object):
         cc = self.cluster_column
         bc = self.data.bin_cols
         if cluster is not None:
-            df = self.data.df[self.data.df[cc] == cluster]
+            if self._cluster_rows is None:
+                self._update_cluster_rows()
+            df = self.data.df.iloc[self._cluster_rows.get(cluster, [])]
         else:
             df = self.data.df
         if bpoint is None:
@@ -423,6 +439,7 @@ class BundlePlot(object):
         ax = fig.gca()
         self.ax = ax
         linestyle = "-"
+        self._update_cluster_rows()
         if benchmark:
             self._plot_bundles(cluster, 0, benchmark=True)
             linestyle = "--"
@@ -513,11 +513,10 @@ class ClusterPlot(object):
         """
         self._setup_all(cols, clusters)
 
+        cluster_rows = self.data.cluster_rows(self.cluster_column)
         for isubplot in range(self._nsubplots - int(self.draw_legend)):
             for cluster in self._clusters:
-                df_cluster = self.data.df[
-                    self.data.df[self.cluster_column] == cluster
-                ]
+                df_cluster = self.data.df.iloc[cluster_rows.get(cluster, [])]
                 for col in self._dofs:
                     df_cluster = df_cluster[
                         df_cluster[col] == self._df_dofs.iloc[isubplot][col]
@@ -17,5 +17,9 @@ Two classes are defined:
   of a :class:`wilson.Wilson` object as first argument.
 """
 
-from clusterking.scan.scanner import Scanner, ScannerResult
+from clusterking.scan.scanner import (
+    Scanner,
+    ScannerResult,
+    ScannerEstimate,
+)
 from clusterking.scan.wilsonscanner import WilsonScanner, WilsonScannerResult
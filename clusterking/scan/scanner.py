@@ -4,21 +4,28 @@
 normalized q2 distribution. """
 
 # std
+import copy
 import functools
+import itertools
+import json
 import multiprocessing
 import os
+import sys
+import tempfile
 import time
-from typing import Callable, Sized, Dict, Iterable, Optional, List
-import itertools
+from pathlib import Path
+from typing import Callable, Sized, Dict, Iterable, Optional, List, Tuple
 
 # 3rd party
 import numpy as np
 import pandas as pd
+import scipy.spatial
 import tqdm.auto
 
 # ours
 from clusterking.worker import DataWorker
 from clusterking.data.data import Data
+from clusterking.data.storage import get_storage, storage_metadata
 import clusterking.maths.binning
 from clusterking.util.metadata import (
     version_info,
@@ -26,9 +33,67 @@ from clusterking.util.metadata import (
     nested_dict,
 )
 from clusterking.util.log import get_logger
+from clusterking.util.cli import handle_overwrite
 from clusterking.result import DataResult
 
 
+def _imaginary_indices(columns: List[str], coeffs: List[str], prefix: str):
+    """ Locate the real and imaginary parts of the coefficients in the columns
+    of the spoints.
+
+    Args:
+        columns: Names of the columns of the spoints
+        coeffs: Names of the coefficients
+        prefix: Prefix of the imaginary parts
+
+    Returns:
+        Two integer arrays with the column index of the real and imaginary
+        part of each coefficient (-1 if there is no imaginary part).
+    """
+    real_indices = np.array([columns.index(c) for c in coeffs], int)
+    imag_indices = np.array(
+        [
+            columns.index(prefix + c) if prefix + c in columns else -1
+            for c in coeffs
+        ],
+        int,
+    )
+    return real_indices, imag_indices
+
+
+def _combine_imaginary_parts(spoints, real_indices, imag_indices):
+    """ Combine the separate real and imaginary parts of one or more spoints
+    into complex numbers (only if there are imaginary parts).
+
+    Args:
+        spoints: spoint or array of spoints with separate real and imaginary
+            parts
+        real_indices: See :func:`_imaginary_indices`
+        imag_indices: See :func:`_imaginary_indices`
+
+    Returns:
+        Array of the values of the coefficients
+    """
+    spoints = np.asarray(spoints)
+    values = spoints[..., real_indices]
+    has_imag = imag_indices >= 0
+    if not np.any(has_imag):
+        return values
+    values = values.astype(complex)
+    values[..., has_imag] += 1j * spoints[..., imag_indices[has_imag]]
+    return values
+
+
+def _chunks(iterable: Iterable, size: int):
+    """ Split iterable into lists of (at most) ``size`` elements. """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 class SpointCalculator(object):
     """ A class that holds the function with which we calculate each
     point in sample space. Note that this has to be a separate class from
@@ -50,6 +115,11 @@ class SpointCalculator(object):
         #: Normalize distribution if binning is specified
         self.normalize = False
         self.kwargs = {}
+        #: Column indices of the real and imaginary parts of the coefficients
+        #: in the spoints, see :func:`_imaginary_indices`. If ``None``, the
+        #: spoints are passed on unchanged.
+        self.real_indices = None
+        self.imag_indices = None
 
     # todo: doc
     # todo: ignore static warning
@@ -66,6 +136,10 @@ class SpointCalculator(object):
             np.array of the integration results
         """
 
+        if self.real_indices is not None:
+            spoint = _combine_imaginary_parts(
+                spoint, self.real_indices, self.imag_indices
+            )
         spoint = self._prepare_spoint(spoint)
         if self.binning is not None:
             if self.binning_mode == "integrate":
@@ -79,7 +153,6 @@ class SpointCalculator(object):
                 res = np.array(list(map(func, self.binning)))
                 if self.normalize:
                     res /= sum(res)
-                print("results", res)
                 return res
         else:
             return self.func(spoint, **self.kwargs)
@@ -137,9 +210,11 @@ class Scanner(DataWorker):
         # todo: move
         self.log = get_logger("Scanner")
 
-        #: Points in wilson space
-        #:  Use self.spoints to access this
+        #: Points in wilson space with separate columns for real and imaginary
+        #: parts. Use self.spoints to access this
         self._spoints = None  # type: Optional[np.ndarray]
+        #: Names of the columns of self._spoints
+        self._spoint_columns = []  # type: List[str]
 
         #: Instance of SpointCalculator to perform the claculations of
         #:  the wilson space points.
@@ -159,6 +234,10 @@ class Scanner(DataWorker):
         self._progress_bar = True
         self._tqdm_kwargs = {}
 
+        #: Settings to write the results to a file while scanning, see
+        #: :meth:`set_streaming`
+        self._stream = None  # type: Optional[dict]
+
         self.set_imaginary_prefix("im_")
 
     # **************************************************************************
@@ -174,8 +253,14 @@ class Scanner(DataWorker):
 
     @property
     def spoints(self):
-        """ Points in parameter space that are sampled (read-only)."""
-        return self._spoints
+        """ Points in parameter space that are sampled (read-only).
+        Coefficients with imaginary parts are given as complex numbers.
+        """
+        if self._spoints is None:
+            return None
+        return _combine_imaginary_parts(
+            self._spoints, *self._imaginary_indices()
+        )
 
     @property
     def coeffs(self):
@@ -186,6 +271,12 @@ class Scanner(DataWorker):
         """
         return self._coeffs.copy()
 
+    def _imaginary_indices(self):
+        """ See :func:`_imaginary_indices`. """
+        return _imaginary_indices(
+            self._spoint_columns, self._coeffs, self.imaginary_prefix
+        )
+
     # **************************************************************************
     # Settings
     # **************************************************************************
@@ -230,7 +321,10 @@ class Scanner(DataWorker):
                 apply the function to these points for every point in parameter
                 space.
             normalize: If a binning is specified, normalize the resulting
-                distribution.
+                distribution. Usually it is better to keep the raw bin contents
+                and normalize afterwards using
+                :meth:`clusterking.data.Data.transformed_data`, so that the
+                normalization can be changed without repeating the scan.
             xvar: Name of variable on x-axis
             yvar: Name of variable on y-axis
             **kwargs: All other keyword arguments are passed to the function.
@@ -285,6 +379,7 @@ class Scanner(DataWorker):
 
         md["xvar"] = xvar
         md["yvar"] = yvar
+        md["normalize"] = normalize
 
         self._spoint_calculator.normalize = normalize
         self._spoint_calculator.kwargs = kwargs
@@ -310,16 +405,65 @@ class Scanner(DataWorker):
         """
 
         # IMPORTANT to keep this order!
-        self._coeffs = sorted(list(values.keys()))
+        coeffs = sorted(list(values.keys()))
+        axes = []
+        for coeff in coeffs:
+            coeff_values = np.array(values[coeff])
+            if np.iscomplexobj(coeff_values) and np.any(coeff_values.imag):
+                axes.append(
+                    (
+                        [coeff, self.imaginary_prefix + coeff],
+                        np.stack([coeff_values.real, coeff_values.imag], 1),
+                    )
+                )
+            else:
+                axes.append(([coeff], np.real(coeff_values).reshape(-1, 1)))
+        self._set_spoints_product(coeffs, axes)
+
+        self.md["spoints"]["grid"] = failsafe_serialize(values)
+
+    def _set_spoints_product(
+        self, coeffs: List[str], axes: List[Tuple[List[str], np.ndarray]]
+    ) -> None:
+        """ Set the spoints to the cartesian product of the values of several
+        axes.
+
+        Args:
+            coeffs: Names of the coefficients
+            axes: List of tuples of the names of the spoint columns of each
+                axis and a ``len(values) x len(columns)`` float array of their
+                values. The order of the axes determines the order of the
+                columns, i.e. imaginary parts have to follow directly after
+                the real parts.
+        """
+        columns = [col for axis_columns, _ in axes for col in axis_columns]
+        shape = [len(axis_values) for _, axis_values in axes]
+        n = int(np.prod(shape))
 
-        # Nowe we collect all lists of values.
-        values_lists = [values[coeff] for coeff in self._coeffs]
         # Now we build the cartesian product, i.e.
         # [a1, a2, ...] x [b1, b2, ...] x ... x [z1, z2, ...] =
         # [(a1, b1, ..., z1), ..., (a2, b2, ..., z2)]
-        self._spoints = np.array(list(itertools.product(*values_lists)))
+        # The values of axis i are repeated once for every combination of the
+        # values of the following axes, and this block is tiled for every
+        # combination of the values of the previous axes.
+        spoints = np.empty((n, len(columns)), float)
+        icol = 0
+        for iaxis, (axis_columns, axis_values) in enumerate(axes):
+            inner = int(np.prod(shape[iaxis + 1 :]))
+            outer = int(np.prod(shape[:iaxis]))
+            ncols = len(axis_columns)
+            spoints[:, icol : icol + ncols] = np.tile(
+                np.repeat(axis_values, inner, axis=0), (outer, 1)
+            )
+            icol += ncols
 
-        self.md["spoints"]["grid"] = failsafe_serialize(values)
+        self._coeffs = coeffs
+        self._spoint_columns = columns
+        self._spoints = spoints
+        calculator = self._spoint_calculator
+        calculator.real_indices, calculator.imag_indices = (
+            self._imaginary_indices()
+        )
 
     def set_spoints_equidist(self, ranges: Dict[str, tuple]) -> None:
         """ Set a list of 'equidistant' points in sampling space.
@@ -374,37 +518,25 @@ class Scanner(DataWorker):
             else:
                 return name
 
-        def imaginary_part(name: str) -> str:
-            if not is_imaginary(name):
-                return self.imaginary_prefix + name
-            else:
-                return name
-
-        coeffs = list(set(map(real_part, ranges.keys())))
-
-        grid_config = {}
-        for coeff in coeffs:
-            # Now let's always collect the values of the real part and of the
-            # imaginary part
-            res = [0.0]
-            ims = [0.0]
-            is_complex = False
-            if real_part(coeff) in ranges:
-                res = list(np.linspace(*ranges[real_part(coeff)]))
-            if imaginary_part(coeff) in ranges:
-                ims = list(np.linspace(*ranges[imaginary_part(coeff)]))
-                is_complex = True
-            # And basically take their cartesian product, alias initialize
-            # the complex number.
-            if is_complex:
-                grid_config[coeff] = [complex(x, y) for x in res for y in ims]
-            else:
-                grid_config[coeff] = res
+        # The real and imaginary parts are sampled independently, so we can
+        # treat them as separate axes of the grid.
+        axes = {}
+        for name, value_range in ranges.items():
+            values = np.linspace(*value_range).reshape(-1, 1)
+            if is_imaginary(name) and real_part(name) not in ranges:
+                axes[real_part(name)] = ([real_part(name)], np.zeros((1, 1)))
+            if is_imaginary(name) and not np.any(values):
+                continue
+            axes[name] = ([name], values)
+        # Imaginary parts follow directly after the real parts
+        names = sorted(
+            axes, key=lambda name: (real_part(name), is_imaginary(name))
+        )
+        coeffs = sorted(set(map(real_part, ranges.keys())))
+        self._set_spoints_product(coeffs, [axes[name] for name in names])
 
-        self.set_spoints_grid(grid_config)
-        # Make sure to do this after set_spoints_grid, so we overwrite
-        # the relevant parts.
         md = self.md["spoints"]
+        md["grid"] = {name: axes[name][1][:, 0].tolist() for name in names}
         md["sampling"] = "equidistant"
         md["ranges"] = ranges
 
@@ -420,25 +552,31 @@ class Scanner(DataWorker):
                 keywords are as follows (value assignments are the default
                 values): ``gauss``: ``mean = 0``, ``sigma = 1``
         """
-        if self.spoints is None:
+        if self._spoints is None:
             raise ValueError(
                 "This method can only be applied after spoints"
                 " have been set."
             )
+        real_indices, _ = self._imaginary_indices()
         if generator == "gauss":
             gauss_kwargs = {"mean": 0.0, "sigma": 1.0}
             gauss_kwargs.update(kwargs)
             rand = np.random.normal(
                 loc=gauss_kwargs["mean"],
                 scale=gauss_kwargs["sigma"],
-                size=self.spoints.shape,
+                size=(len(self._spoints), len(real_indices)),
             )
         else:
             raise ValueError("Unknown generator {}.".format(generator))
         if "noise" not in self.md:
             self.md["noise"] = []
         self.md["noise"].append({"generator": generator, "kwargs": kwargs})
-        self._spoints += rand
+        # Noise is only added to the real parts. Note that we do not modify
+        # the array in place, because it might be shared with copies of this
+        # object.
+        spoints = self._spoints.copy()
+        spoints[:, real_indices] += rand
+        self._spoints = spoints
 
     def set_no_workers(self, no_workers: int) -> None:
         """ Set the number of worker processes to be used. This will usually
@@ -452,6 +590,44 @@ class Scanner(DataWorker):
         """
         self._no_workers = no_workers
 
+    def set_streaming(
+        self, path=None, chunksize=1000, overwrite="ask"
+    ) -> None:
+        """ Write the results of :meth:`run` to a file in chunks of rows while
+        they are calculated, rather than keeping all rows in memory.
+        The file can already be loaded (with the rows that have been
+        calculated so far) while the scan is still running. The metadata is
+        finalized at the end of the scan. :meth:`ScannerResult.write` then
+        lazily loads the data from this file (see
+        :class:`~clusterking.data.DFMD`).
+        Currently, only the SQLite format supports this.
+
+        Args:
+            path: Path to the output file. If ``None``, streaming is disabled
+                (default).
+            chunksize: Number of rows that are written at once
+            overwrite: How to proceed if output file already exists, see
+                :meth:`clusterking.data.DFMD.write`
+
+        Returns:
+            ``None``
+        """
+        if path is None:
+            self._stream = None
+            return
+        storage = get_storage(Path(path), sniff=False)
+        if not storage.chunked_writing:
+            raise ValueError(
+                "The format '{}' doesn't support writing in chunks.".format(
+                    storage.name
+                )
+            )
+        self._stream = {
+            "path": Path(path),
+            "chunksize": chunksize,
+            "overwrite": overwrite,
+        }
+
     def set_imaginary_prefix(self, value: str) -> None:
         """ Set prefix to be used for imaginary parameters in
         :meth:`set_spoints_grid` and :meth:`set_spoints_equidist`.
@@ -464,19 +640,149 @@ class Scanner(DataWorker):
         """
         self.md["imaginary_prefix"] = value
 
+    def _get_no_workers(self) -> int:
+        """ Number of worker processes that will be used. """
+        no_workers = self._no_workers
+        if not self._no_workers:
+            no_workers = os.cpu_count()
+        if not no_workers:
+            # os.cpu_count() didn't work
+            self.log.warn(
+                "os.cpu_count() not determine number of cores. Fallling "
+                "back to single core mode."
+            )
+            no_workers = 1
+        return no_workers
+
+    # **************************************************************************
+    # Estimate
+    # **************************************************************************
+
+    def estimate(self, sample=5, format=None) -> "ScannerEstimate":
+        """ Estimate the resources needed by :meth:`run` (without
+        performing the full scan) by calculating a few randomly chosen sample
+        points. This is useful to request appropriate resources from a batch
+        system.
+
+        Args:
+            sample: Number of sample points to calculate
+            format: File format for the estimate of the size of the output
+                file (see :meth:`clusterking.data.DFMD.write`). Default: The
+                format of the file set with :meth:`set_streaming` or else
+                SQLite. The default settings of the format (e.g. compression)
+                are assumed.
+
+        Returns:
+            :class:`ScannerEstimate`
+        """
+        if self._spoints is None or len(self._spoints) == 0:
+            raise ValueError("No sample points specified.")
+        if self._spoint_calculator.func is None:
+            raise ValueError(
+                "No function specified. Please set it using "
+                "``Scanner.set_dfunction``."
+            )
+        n = len(self._spoints)
+        sample = max(1, min(sample, n))
+        # Own generator, so that the global random state of the user isn't
+        # changed
+        rng = np.random.default_rng()
+        indices = rng.choice(n, size=sample, replace=False)
+
+        rows = []
+        times = []
+        for spoint in self._spoints[indices]:
+            start_time = time.time()
+            result = self._spoint_calculator.calc(spoint)
+            times.append(time.time() - start_time)
+            if not isinstance(result, Iterable):
+                result = [result]
+            rows.append([*spoint, *result])
+
+        md = copy.deepcopy(self.md)
+        if "nbins" not in md["dfunction"]:
+            md["dfunction"]["nbins"] = len(rows[0]) - len(
+                self._spoint_columns
+            )
+
+        # Rows are collected as lists of python floats before they are
+        # converted to a dataframe, so both exist at the same time.
+        rows_bytes = np.mean(
+            [
+                sys.getsizeof(row) + sum(sys.getsizeof(x) for x in row)
+                for row in rows
+            ]
+        )
+        data = Data()
+        ScannerResult(
+            data=data,
+            rows=rows,
+            spoints=self._spoints[indices],
+            md=md,
+            coeffs=self._coeffs,
+            columns=self._spoint_columns,
+        ).write()
+        df_bytes = data.df.memory_usage(index=True, deep=True).sum() / sample
+
+        if format is None and self._stream is not None:
+            format = get_storage(self._stream["path"], sniff=False).name
+        elif format is None:
+            format = "sqlite"
+        # Write out enough rows so that the file size isn't dominated by
+        # overhead (e.g. the metadata or SQLite's page size).
+        n_file = min(n, 1000)
+        file_sizes = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for n_rows in [0, n_file]:
+                path = Path(tmpdir) / "estimate_{}".format(n_rows)
+                data_file = data.copy(deep=False)
+                df = data.df.iloc[np.arange(n_rows) % sample]
+                # Vary the repeated rows slightly, so that compressed formats
+                # can't just compress the repetitions away
+                for column in df.columns:
+                    if pd.api.types.is_float_dtype(df[column]):
+                        df[column] = df[column] * (
+                            1 + 1e-6 * rng.normal(size=n_rows)
+                        )
+                data_file.df = df
+                data_file.write(path, overwrite="overwrite", format=format)
+                file_sizes.append(_path_size(path))
+        file_size = file_sizes[0] + (file_sizes[1] - file_sizes[0]) * n / n_file
+
+        no_workers = self._get_no_workers()
+        return ScannerEstimate(
+            n_spoints=n,
+            no_workers=no_workers,
+            times=times,
+            wall_time=n * np.mean(times) / min(no_workers, n),
+            memory=n * (rows_bytes + df_bytes),
+            file_size=file_size,
+            file_format=format,
+        )
+
     # **************************************************************************
     # Run
     # **************************************************************************
 
-    def run(self, data: Data) -> Optional["ScannerResult"]:
+    def run(
+        self, data: Data, mode="replace", atol=1e-8
+    ) -> Optional["ScannerResult"]:
         """Calculate all sample points and writes the result to a dataframe.
 
         Args:
             data: Data object.
+            mode: ``replace`` (default): Replace all sample points in ``data``,
+                ``extend``: Only calculate the sample points that are not yet
+                contained in ``data`` and append them.
+            atol: Absolute tolerance used to decide if a sample point is
+                already contained in ``data`` (in ``extend`` mode only).
 
         Returns:
             :class:`ScannerResult` or None
 
+        If streaming is enabled (see :meth:`set_streaming`), the rows are
+        written to the output file while they are calculated.
+
         .. warning::
 
             The function set in :meth:`set_dfunction` has to be a globally
@@ -490,7 +796,7 @@ class Scanner(DataWorker):
         """
 
         # todo: rather raise exceptions?
-        if not self._spoints.any():
+        if self._spoints is None or len(self._spoints) == 0:
             self.log.error(
                 "No sample points specified. Returning without doing "
                 "anything."
@@ -504,23 +810,40 @@ class Scanner(DataWorker):
             )
             return
 
-        no_workers = self._no_workers
-        if not self._no_workers:
-            no_workers = os.cpu_count()
-        if not no_workers:
-            # os.cpu_count() didn't work
-            self.log.warn(
-                "os.cpu_count() not determine number of cores. Fallling "
-                "back to single core mode."
-            )
-            no_workers = 1
+        if mode == "replace":
+            spoints = self._spoints
+        elif mode == "extend":
+            spoints = self._missing_spoints(data, atol=atol)
+        else:
+            raise ValueError("Unknown mode '{}'.".format(mode))
+
+        no_workers = self._get_no_workers()
 
         start_time = time.time()
 
-        if no_workers >= 2:
-            rows = self._run_multicore(no_workers)
+        if len(spoints) == 0:
+            self.log.info("All sample points have already been calculated.")
+            rows = iter([])
+        elif no_workers >= 2:
+            rows = self._run_multicore(spoints, no_workers)
         else:
-            rows = self._run_singlecore()
+            rows = self._run_singlecore(spoints)
+
+        if self._stream is not None:
+            result = ScannerResult(
+                data=data,
+                rows=None,
+                spoints=spoints,
+                md=self.md,
+                coeffs=self._coeffs,
+                columns=self._spoint_columns,
+                mode=mode,
+                path=self._stream["path"],
+            )
+            self._run_streaming(result, rows, start_time)
+            return result
+
+        rows = list(rows)
 
         end_time = time.time()
         run_time = end_time - start_time
@@ -529,20 +852,113 @@ class Scanner(DataWorker):
         return ScannerResult(
             data=data,
             rows=rows,
-            spoints=self._spoints,
+            spoints=spoints,
             md=self.md,
             coeffs=self._coeffs,
+            columns=self._spoint_columns,
+            mode=mode,
+        )
+
+    def _run_streaming(
+        self, result: "ScannerResult", rows: Iterable, start_time: float
+    ) -> None:
+        """ Write rows to the output file in chunks while they are calculated.
+
+        Args:
+            result: :class:`ScannerResult` with the path of the output file
+            rows: Iterable of the calculated rows
+            start_time: Start time of the scan
+
+        Returns:
+            None
+        """
+        writer = result._open_stream(overwrite=self._stream["overwrite"])
+        try:
+            for chunk in _chunks(rows, self._stream["chunksize"]):
+                result._append_stream(writer, chunk)
+            self.md["run_time"] = time.time() - start_time
+            # Finalize metadata
+            writer.write_metadata(result._stream_md_json())
+        finally:
+            writer.close()
+            # Stop the calculation (e.g. the worker processes) right away if
+            # writing failed
+            if hasattr(rows, "close"):
+                rows.close()
+
+    def _missing_spoints(self, data: Data, atol: float) -> np.ndarray:
+        """ Return the spoints that are not yet contained in ``data``.
+
+        Args:
+            data: Data object
+            atol: Absolute tolerance in each parameter
+
+        Returns:
+            Subset of :attr:`spoints`
+        """
+        if data.df.empty:
+            return self._spoints
+        binning = self.md["dfunction"]["binning"]
+        data_binning = data.md["scan"]["dfunction"]["binning"]
+        if binning and data_binning and list(binning) != list(data_binning):
+            raise ValueError(
+                "The binning of the data doesn't match the binning of the "
+                "scanner."
+            )
+        prefix = self.imaginary_prefix
+        missing_coeffs = set(self._coeffs) - set(data.par_cols)
+        if missing_coeffs:
+            raise ValueError(
+                "The data doesn't contain the parameter(s) {}.".format(
+                    ", ".join(sorted(missing_coeffs))
+                )
+            )
+        for col in self._spoint_columns:
+            if col not in data.par_cols:
+                raise ValueError(
+                    "Coefficient '{}' has imaginary parts, but the data "
+                    "doesn't.".format(col[len(prefix) :])
+                )
+        # Bring spoints in the same form as the parameter columns of the data.
+        # Imaginary parts that we don't scan are zero.
+        columns = np.zeros((len(self._spoints), len(data.par_cols)))
+        for icol, col in enumerate(data.par_cols):
+            if col in self._spoint_columns:
+                columns[:, icol] = self._spoints[
+                    :, self._spoint_columns.index(col)
+                ]
+            elif not (
+                col.startswith(prefix) and col[len(prefix) :] in self._coeffs
+            ):
+                raise ValueError(
+                    "Parameter '{}' of the data is not scanned.".format(col)
+                )
+        tree = scipy.spatial.cKDTree(data.df[data.par_cols].values)
+        distances, _ = tree.query(
+            columns,
+            p=np.inf,
+            distance_upper_bound=np.nextafter(atol, np.inf),
+        )
+        missing = ~np.isfinite(distances)
+        self.log.debug(
+            "{} of {} sample points are already contained in the "
+            "data.".format(np.sum(~missing), len(missing))
         )
+        return self._spoints[missing]
 
     # todo: shouldn't this rather return numpy arrays than List2
-    def _run_multicore(self, no_workers: int) -> List[List[float]]:
+    def _run_multicore(
+        self, spoints: np.ndarray, no_workers: int
+    ) -> Iterable[List[float]]:
         """ Calculate spoints in parallel processing mode.
 
         Args:
+            spoints: Sample points to calculate
             no_workers: Number of workers.
 
         Returns:
-            Rows of the dataframe.
+            Iterator over the rows of the dataframe (in the order of the
+            spoints).
         """
         # pool of worker nodes
         pool = multiprocessing.Pool(processes=no_workers)
@@ -550,88 +966,174 @@ class Scanner(DataWorker):
         # this is the worker function.
         worker = self._spoint_calculator.calc
 
-        results = pool.imap(worker, self._spoints)
+        results = pool.imap(worker, spoints)
 
         # close the queue for new jobs
         pool.close()
 
         self.log.info(
             "Started queue with {} job(s) distributed over up to {} "
-            "core(s)/worker(s).".format(len(self._spoints), no_workers)
+            "core(s)/worker(s).".format(len(spoints), no_workers)
         )
 
-        rows = []
-
+        progress = None
         if self._progress_bar:
             tqdm_kwargs = dict(
-                desc="Scanning: ", unit=" spoint", total=len(self._spoints)
+                desc="Scanning: ", unit=" spoint", total=len(spoints)
             )
             tqdm_kwargs.update(self._tqdm_kwargs)
-            iterator = tqdm.auto.tqdm(enumerate(results), **tqdm_kwargs)
+            progress = tqdm.auto.tqdm(enumerate(results), **tqdm_kwargs)
+            iterator = progress
         else:
             iterator = enumerate(results)
 
-        for index, result in iterator:
-            md = self.md["dfunction"]
-
-            if not isinstance(result, Iterable):
-                result = [result]
-
-            if "nbins" not in md:
-                md["nbins"] = len(result)
-
-            rows.append([*self._spoints[index], *result])
-
-        # Wait for completion of all jobs here
-        pool.join()
-
-        return rows
+        completed = False
+        try:
+            for index, result in iterator:
+                md = self.md["dfunction"]
+
+                if not isinstance(result, Iterable):
+                    result = [result]
+
+                if "nbins" not in md:
+                    md["nbins"] = len(result)
+
+                yield [*spoints[index], *result]
+            completed = True
+        finally:
+            # Also runs if the caller stops iterating early (or on errors), in
+            # which case the remaining jobs are cancelled.
+            if progress is not None:
+                progress.close()
+            if not completed:
+                pool.terminate()
+            # Wait for completion of all jobs here
+            pool.join()
 
     # todo: shouldn't this rather return numpy arrays than List2
-    def _run_singlecore(self) -> List[List[float]]:
+    def _run_singlecore(self, spoints: np.ndarray) -> Iterable[List[float]]:
         """ Calculate spoints in single core processing mode. This is sometimes
         useful because multiprocessing has its quirks.
 
+        Args:
+            spoints: Sample points to calculate
+
         Returns:
-            Rows of the dataframe.
+            Iterator over the rows of the dataframe.
         """
         self.log.info(
             "Started queue with {} job(s) in single core mode.".format(
-                len(self._spoints)
+                len(spoints)
             )
         )
 
-        rows = []
-        for index, spoint in tqdm.auto.tqdm(
-            enumerate(self._spoints),
+        # The context manager closes the progress bar even if the caller stops
+        # iterating early
+        with tqdm.auto.tqdm(
+            enumerate(spoints),
             desc="Scanning: ",
             unit=" spoint",
-            total=len(self._spoints),
-        ):
-            result = self._spoint_calculator.calc(spoint)
+            total=len(spoints),
+        ) as progress:
+            for index, spoint in progress:
+                result = self._spoint_calculator.calc(spoint)
 
-            md = self.md["dfunction"]
+                md = self.md["dfunction"]
 
-            if not isinstance(result, Iterable):
-                result = [result]
+                if not isinstance(result, Iterable):
+                    result = [result]
+
+                if "nbins" not in md:
+                    md["nbins"] = len(result)
+
+                yield [*spoints[index], *result]
 
-            if "nbins" not in md:
-                md["nbins"] = len(result)
 
-            rows.append([*self._spoints[index], *result])
+def _path_size(path: Path) -> int:
+    """ Size of a file or of all files in a directory (in bytes) """
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
 
-        return rows
+
+class ScannerEstimate(object):
+    """ Estimated resources of a scan as returned by
+    :meth:`Scanner.estimate`.
+    """
+
+    def __init__(
+        self,
+        n_spoints,
+        no_workers,
+        times,
+        wall_time,
+        memory,
+        file_size,
+        file_format="sqlite",
+    ):
+        #: Number of sample points
+        self.n_spoints = n_spoints
+        #: Number of worker processes
+        self.no_workers = no_workers
+        #: Measured times (in seconds) to calculate the sampled spoints
+        self.times = times
+        #: Projected wall time in seconds
+        self.wall_time = wall_time
+        #: Projected peak memory of the results in bytes
+        self.memory = memory
+        #: Projected size of the output file in bytes
+        self.file_size = file_size
+        #: File format that :attr:`file_size` refers to
+        self.file_format = file_format
+
+    @property
+    def time_per_spoint(self) -> float:
+        """ Mean time (in seconds) to calculate one sample point. """
+        return float(np.mean(self.times))
+
+    def __str__(self):
+        return (
+            "{n} spoints, {t:.3g} s per spoint, {w} worker(s): "
+            "wall time {wall:.3g} s, memory {mem:.3g} MB, "
+            "file size {size:.3g} MB ({format})".format(
+                n=self.n_spoints,
+                t=self.time_per_spoint,
+                w=self.no_workers,
+                wall=self.wall_time,
+                mem=self.memory / 1e6,
+                size=self.file_size / 1e6,
+                format=self.file_format,
+            )
+        )
 
 
 class ScannerResult(DataResult):
     def __init__(
-        self, data: Data, rows: List[List[float]], spoints, md, coeffs
+        self,
+        data: Data,
+        rows: List[List[float]],
+        spoints,
+        md,
+        coeffs,
+        columns=None,
+        mode="replace",
+        path=None,
     ):
         super().__init__(data=data)
         self._rows = rows
         self._spoints = spoints
         self.md = md  # type: nested_dict
         self._coeffs = coeffs
+        if columns is None:
+            columns = coeffs
+        #: Names of the columns of the spoints (including imaginary parts)
+        self._columns = columns
+        self._mode = mode
+        #: Output file if the rows were written to a file while scanning
+        #: (see :meth:`Scanner.set_streaming`)
+        self._path = path
+        #: Number of rows that were written to the output file
+        self._n_streamed = 0
 
     # **************************************************************************
     # Convenience properties
@@ -646,8 +1148,15 @@ class ScannerResult(DataResult):
 
     @property
     def spoints(self):
-        """ Points in parameter space that are sampled (read-only)."""
-        return self._spoints
+        """ Points in parameter space that are sampled (read-only).
+        Coefficients with imaginary parts are given as complex numbers.
+        """
+        return _combine_imaginary_parts(
+            np.reshape(self._spoints, (-1, len(self._columns))),
+            *_imaginary_indices(
+                list(self._columns), self._coeffs, self.imaginary_prefix
+            )
+        )
 
     @property
     def coeffs(self):
@@ -663,42 +1172,156 @@ class ScannerResult(DataResult):
     # **************************************************************************
 
     def write(self) -> None:
+        """ Write the results back to the :class:`~clusterking.data.Data`
+        object. In ``extend`` mode (see :meth:`Scanner.run`), the new sample
+        points are appended to the existing ones.
+        If the results were written to a file while scanning (see
+        :meth:`Scanner.set_streaming`), the data is (lazily) loaded from this
+        file.
+        """
+        if self._path is not None:
+            self._data._load(self._path, lazy=True)
+        elif self._extends_data():
+            self._write_extend()
+        else:
+            self._data.df = self._build_df(self._rows)
+            self._data.md["scan"] = self._scan_md()
+        self.log.info("Integration done.")
+
+    def _extends_data(self) -> bool:
+        """ Are the new rows appended to existing rows? """
+        return self._mode == "extend" and not self._data.df.empty
+
+    def _build_df(self, rows: List[List[float]], start=0) -> pd.DataFrame:
+        """ Convert calculated rows to a dataframe.
+
+        Args:
+            rows: Rows
+            start: Index of the first row
+
+        Returns:
+            Dataframe
+        """
         self.log.debug("Converting data to pandas dataframe.")
-        cols = self.coeffs
-        cols.extend(
-            [
-                "bin{}".format(no_bin)
-                for no_bin in range(self.md["dfunction"]["nbins"])
-            ]
+        # The real and imaginary parts of the coefficients already have
+        # separate columns.
+        cols = list(self._columns) + [
+            "bin{}".format(no_bin)
+            for no_bin in range(self.md["dfunction"]["nbins"])
+        ]
+        df = pd.DataFrame(data=rows, columns=cols)
+        df.index = pd.RangeIndex(start, start + len(df), name="index")
+        return df
+
+    def _align_extension(self, df: pd.DataFrame, warn=True) -> pd.DataFrame:
+        """ Bring new rows in the same form as the existing rows of the data,
+        so that they can be appended.
+
+        Args:
+            df: Dataframe of the new rows as returned by :meth:`_build_df`
+            warn: Warn about columns of the data that are not set for the new
+                rows
+
+        Returns:
+            Dataframe
+        """
+        old_df = self._data.df
+        bin_cols = [col for col in df.columns if col.startswith("bin")]
+        if not bin_cols == self._data.bin_cols:
+            raise ValueError(
+                "Number of bins of the data ({}) and of the scan ({}) "
+                "don't match.".format(self._data.nbins, len(bin_cols))
+            )
+        # Imaginary parts that vanish for all new spoints don't have their
+        # own column yet
+        for col in self._data.par_cols:
+            if col not in df.columns:
+                df[col] = 0.0
+        unset = [col for col in old_df.columns if col not in df.columns]
+        if unset and warn:
+            self.log.warning(
+                "The column(s) {} are not set for the new sample points. "
+                "Please rerun the corresponding workers (e.g. clustering "
+                "and benchmarking).".format(", ".join(unset))
+            )
+        df = df[[col for col in old_df.columns if col in df.columns]]
+        df.index = pd.Index(
+            old_df.index.max() + 1 + df.index, name=old_df.index.name
         )
+        return df
+
+    def _scan_md(self) -> nested_dict:
+        """ Metadata of the scan that is written to the data. """
+        if not self._extends_data():
+            # fixme: Should already be set in worker class
+            self.md["spoints"]["coeffs"] = list(self._columns)
+            return self.md
+        md = copy.deepcopy(self.md)
+        old_md = copy.deepcopy(self._data.md["scan"])
+        previous = old_md.pop("previous", [])
+        md["previous"] = list(previous) + [old_md]
+        md["spoints"]["coeffs"] = list(self._data.par_cols)
+        return md
+
+    def _write_extend(self) -> None:
+        """ Append the new sample points to the existing ones. """
+        if not self._rows:
+            return
+        df = self._align_extension(self._build_df(self._rows))
+        self._data.df = pd.concat([self._data.df, df], sort=False)
+        self._data.md["scan"] = self._scan_md()
 
-        # Now we finally write everything to data
-        self._data.df = pd.DataFrame(data=self._rows, columns=cols)
-
-        # todo: Shouldn't we do that above already? This sounds not so
-        #   great performance wise...
-        # Special handling for complex numbers
-        coeffs_with_im = []
-        for coeff in self.coeffs:
-            coeffs_with_im.append(coeff)
-            if not list(self._data.df[coeff].apply(np.imag).unique()) == [0.0]:
-                values = self._data.df[coeff]
-                self._data.df[coeff] = values.apply(np.real)
-                loc = list(self._data.df.columns).index(coeff)
-                self._data.df.insert(
-                    loc + 1,
-                    self.imaginary_prefix + coeff,
-                    values.apply(np.imag),
-                )
-                coeffs_with_im.append(self.imaginary_prefix + coeff)
-            else:
-                self._data.df[coeff] = self._data.df[coeff].apply(np.real)
+    # **************************************************************************
+    # Streaming
+    # **************************************************************************
 
-        self._data.df.index.name = "index"
+    def _open_stream(self, overwrite="ask"):
+        """ Open the output file for writing in chunks. In ``extend`` mode, the
+        existing rows of the data are written first.
 
-        # fixme: Should already be set in worker class
-        self.md["spoints"]["coeffs"] = coeffs_with_im
+        Args:
+            overwrite: See :meth:`clusterking.data.DFMD.write`
+
+        Returns:
+            Writer object, see :meth:`clusterking.data.storage.Storage.writer`
+        """
+        path = Path(self._path)
+        # Make sure that the data is loaded before we overwrite any file
+        old_df = self._data.df
+        handle_overwrite([path], behavior=overwrite, log=self.log)
+        if not path.parent.is_dir():
+            self.log.debug("Creating directory '{}'.".format(path.parent))
+            path.parent.mkdir(parents=True)
+        writer = get_storage(path, sniff=False).writer(
+            path, index_columns=list(self._columns)
+        )
+        if self._extends_data():
+            writer.append(old_df)
+        self._n_streamed = 0
+        return writer
 
-        self._data.md["scan"] = self.md
+    def _append_stream(self, writer, rows: List[List[float]]) -> None:
+        """ Write a chunk of rows to the output file.
 
-        self.log.info("Integration done.")
+        Args:
+            writer: Writer object as returned by :meth:`_open_stream`
+            rows: Rows
+
+        Returns:
+            None
+        """
+        df = self._build_df(rows, start=self._n_streamed)
+        if self._extends_data():
+            df = self._align_extension(df, warn=self._n_streamed == 0)
+        writer.append(df)
+        if self._n_streamed == 0:
+            # Preliminary metadata, so that the file can already be loaded
+            writer.write_metadata(self._stream_md_json())
+        self._n_streamed += len(rows)
+
+    def _stream_md_json(self) -> str:
+        """ Serialized metadata of the output file """
+        md = copy.copy(self._data.md)
+        md["scan"] = self._scan_md()
+        md["storage"] = storage_metadata(get_storage(self._path, sniff=False))
+        return json.dumps(md, sort_keys=True, indent=4)
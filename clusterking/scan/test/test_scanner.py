@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 # std
+import multiprocessing.pool
 import unittest
+from unittest import mock
 from pathlib import Path
 import tempfile
 import copy
@@ -66,6 +68,13 @@ class TestScanner(MyTestCase):
             np.array([[1 + 3j, 1], [1 + 4j, 1], [2 + 3j, 1], [2 + 4j, 1]]),
         )
 
+    def test_set_spoints_equidist_zero_imaginary(self):
+        s = Scanner()
+        s.set_spoints_equidist({"im_a": (0, 0, 1), "b": (0, 1, 2)})
+        self.assertEqual(s.coeffs, ["a", "b"])
+        self.assertAllClose(s.spoints, [[0, 0], [0, 1]])
+        self.assertFalse(np.iscomplexobj(s.spoints))
+
     def test_run_zero(self):
         s = Scanner()
         d = Data()
@@ -144,6 +153,148 @@ class TestScanner(MyTestCase):
         )
         d.write(Path(self.tmpdir.name) / "test.sql")
 
+    def test_run_complex_grid(self):
+        s = Scanner()
+        d = Data()
+        s.set_spoints_grid({"a": [1, 2j], "b": [1, 2]})
+        s.set_dfunction(func_zero)
+        s.set_no_workers(1)
+        r = s.run(d)
+        self.assertAllClose(r.spoints, s.spoints)
+        r.write()
+        self.assertEqual(list(d.df.columns), ["a", "im_a", "b", "bin0"])
+        self.assertEqual(d.par_cols, ["a", "im_a", "b"])
+        self.assertAllClose(
+            d.df[d.par_cols].values,
+            [[1, 0, 1], [1, 0, 2], [0, 2, 1], [0, 2, 2]],
+        )
+        d.write(Path(self.tmpdir.name) / "test.sql")
+
+    def test_run_extend(self):
+        s = Scanner()
+        d = Data()
+        s.set_spoints_equidist({"a": (0, 1, 2)})
+        s.set_dfunction(func_identity)
+        s.set_no_workers(1)
+        s.run(d).write()
+        s.set_spoints_equidist({"a": (0, 2, 3)})
+        r = s.run(d, mode="extend")
+        self.assertAllClose(r.spoints, [[2.0]])
+        r.write()
+        self.assertEqual(d.n, 3)
+        self.assertEqual(list(d.df.index), [0, 1, 2])
+        self.assertAllClose(d.df.values, [[0.0, 0.0], [1.0, 1.0], [2.0, 2.0]])
+        self.assertEqual(d.par_cols, ["a"])
+        self.assertEqual(len(d.md["scan"]["previous"]), 1)
+        d.write(Path(self.tmpdir.name) / "test.sql")
+
+    def test_run_extend_nothing_new(self):
+        s = Scanner()
+        d = Data()
+        s.set_spoints_equidist({"a": (0, 1, 2)})
+        s.set_dfunction(func_identity)
+        s.set_no_workers(1)
+        s.run(d).write()
+        s.run(d, mode="extend").write()
+        self.assertEqual(d.n, 2)
+
+    def test_run_extend_incompatible(self):
+        s = Scanner()
+        d = Data()
+        s.set_spoints_equidist({"a": (0, 1, 2)})
+        s.set_dfunction(func_identity)
+        s.set_no_workers(1)
+        s.run(d).write()
+        s.set_spoints_equidist({"a": (0, 1, 2), "b": (0, 1, 2)})
+        with self.assertRaises(ValueError):
+            s.run(d, mode="extend")
+        with self.assertRaises(ValueError):
+            s.run(d, mode="unknown")
+
+    def test_run_streaming(self):
+        path = Path(self.tmpdir.name) / "stream.sql"
+        s = Scanner()
+        s.set_spoints_equidist({"a": (0, 1, 5)})
+        s.set_dfunction(func_identity)
+        s.set_no_workers(1)
+        d_ref = Data()
+        s.run(d_ref).write()
+        s.set_streaming(path, chunksize=2, overwrite="overwrite")
+        d = Data()
+        s.run(d).write()
+        self.assertTrue(path.is_file())
+        self.assertEqual(list(d.df.index), list(d_ref.df.index))
+        self.assertAllClose(d.df.values, d_ref.df.values)
+        self.assertEqual(d.par_cols, ["a"])
+        self.assertIn("run_time", d.md["scan"])
+        self.assertAllClose(Data(path).df.values, d_ref.df.values)
+
+    def test_run_streaming_extend(self):
+        path = Path(self.tmpdir.name) / "stream.sql"
+        s = Scanner()
+        d = Data()
+        s.set_spoints_equidist({"a": (0, 1, 2)})
+        s.set_dfunction(func_identity)
+        s.set_no_workers(1)
+        s.run(d).write()
+        s.set_spoints_equidist({"a": (0, 3, 4)})
+        s.set_streaming(path, chunksize=1, overwrite="overwrite")
+        s.run(d, mode="extend").write()
+        self.assertEqual(d.n, 4)
+        self.assertEqual(list(d.df.index), [0, 1, 2, 3])
+        self.assertAllClose(d.df.values, [[i, i] for i in range(4)])
+        self.assertEqual(len(d.md["scan"]["previous"]), 1)
+
+    def test_run_multicore_stop_early(self):
+        s = Scanner()
+        s.set_spoints_equidist({"a": (0, 1, 20)})
+        s.set_dfunction(func_identity)
+        s.set_progress_bar(False)
+        with mock.patch.object(
+            multiprocessing.pool.Pool,
+            "terminate",
+            autospec=True,
+            side_effect=multiprocessing.pool.Pool.terminate,
+        ) as terminate:
+            rows = s._run_multicore(s.spoints, 2)
+            self.assertAllClose(next(rows), [0.0, 0.0])
+            rows.close()
+            terminate.assert_called_once()
+            terminate.reset_mock()
+            # Running to completion doesn't cancel anything
+            rows = list(s._run_multicore(s.spoints, 2))
+            self.assertEqual(len(rows), 20)
+            terminate.assert_not_called()
+
+    def test_set_streaming_unsupported(self):
+        s = Scanner()
+        with self.assertRaises(ValueError):
+            s.set_streaming(Path(self.tmpdir.name) / "test.parquet")
+
+    def test_estimate(self):
+        s = Scanner()
+        s.set_spoints_equidist({"a": (0, 1, 10), "b": (0, 1, 10)})
+        s.set_dfunction(func_sum_indentity_x, sampling=[0, 1, 2])
+        s.set_no_workers(2)
+        e = s.estimate(sample=3)
+        self.assertEqual(e.n_spoints, 100)
+        self.assertEqual(len(e.times), 3)
+        self.assertAlmostEqual(e.wall_time, 100 * e.time_per_spoint / 2)
+        self.assertGreater(e.memory, 100 * 5 * 8)
+        self.assertGreater(e.file_size, 100 * 5 * 8)
+        str(e)
+        self.assertEqual(e.file_format, "sqlite")
+        e = s.estimate(sample=3, format="numpy")
+        self.assertEqual(e.file_format, "numpy")
+        self.assertGreater(e.file_size, 100 * 5 * 8)
+        s.set_streaming(Path(self.tmpdir.name) / "stream.sql")
+        self.assertEqual(s.estimate(sample=3).file_format, "sqlite")
+        # The global random state is not changed
+        state = np.random.get_state()
+        s.estimate(sample=3)
+        self.assertAllClose(np.random.get_state()[1], state[1])
+        self.assertEqual(np.random.get_state()[2], state[2])
+
     def test_add_gaussian_noise(self):
         s = Scanner()
         s.set_spoints_equidist({"a": (-1, 1, 10), "b": (-1, 1, 10)})
@@ -112,8 +112,8 @@ class WilsonScanner(Scanner):
         self._spoint_calculator.eft = self.eft
         self._spoint_calculator.basis = self.basis
 
-    def set_spoints_grid(self, *args, **kwargs):
-        super().set_spoints_grid(*args, **kwargs)
+    def _set_spoints_product(self, *args, **kwargs):
+        super()._set_spoints_product(*args, **kwargs)
         self._spoint_calculator.coeffs = self.coeffs
 
     @property
@@ -160,18 +160,19 @@ class BMFOM(FOM):
     """
 
     def _fom(self, data1: Data, data2: Data) -> float:
-        clusters1 = set(data1.df["cluster"].unique())
-        clusters2 = set(data2.df["cluster"].unique())
-        if not clusters1 == clusters2:
+        rows1 = data1.cluster_rows("cluster")
+        rows2 = data2.cluster_rows("cluster")
+        if not set(rows1) == set(rows2):
             return np.nan
-        clusters = clusters1
+        is_bpoint1 = data1.df["bpoint"].to_numpy(dtype=bool)
+        is_bpoint2 = data2.df["bpoint"].to_numpy(dtype=bool)
         cluster2bpoint = {}
-        for cluster in clusters:
-            bpoints1 = data1.df[
-                (data1.df["cluster"] == cluster) & data1.df["bpoint"]
+        for cluster in rows1:
+            bpoints1 = data1.df.iloc[
+                rows1[cluster][is_bpoint1[rows1[cluster]]]
             ]
-            bpoints2 = data2.df[
-                (data2.df["cluster"] == cluster) & data2.df["bpoint"]
+            bpoints2 = data2.df.iloc[
+                rows2[cluster][is_bpoint2[rows2[cluster]]]
             ]
             msg = "Found {} bpoints instead of 1 for dataset {}: "
             if len(bpoints1) != 1:
@@ -16,6 +16,7 @@ from clusterking.stability.stabilitytester import (
     SimpleStabilityTesterResult,
 )
 from clusterking.data.data import Data
+from clusterking.data.container import DataContainer
 from clusterking.scan.scanner import Scanner
 from clusterking.cluster.cluster import Cluster
 from clusterking.benchmark.benchmark import AbstractBenchmark
@@ -82,29 +83,67 @@ class NoisySampleResult(AbstractResult):
                 "Unknown option '{}' for non_empty.".format(non_empty)
             )
 
+    def write_container(
+        self, path: Union[str, PurePath], overwrite="ask"
+    ) -> None:
+        """ Write all samples to a single container file (see
+        :class:`~clusterking.data.DataContainer`). The metadata that is
+        common to all samples is only saved once. This is much faster than
+        :meth:`write` for many samples, in particular on network file systems.
+
+        Args:
+            path: Path to output file
+            overwrite: How to proceed if output file already exists, see
+                :meth:`clusterking.data.DFMD.write`
+
+        Returns:
+            None
+        """
+        DataContainer.write(path, self.samples, overwrite=overwrite)
+
     @classmethod
     def load(
         cls, directory: Union[str, PurePath], loader: Optional[Callable] = None
     ) -> "NoisySampleResult":
-        """ Load from output directory
+        """ Load from output directory or container file (see
+        :meth:`write_container`)
 
         Args:
-            directory: Path to directory to load from
-            loader: Function used to load data (optional).
+            directory: Path to directory or container file to load from
+            loader: Function used to load data (optional). For a directory,
+                it is called with the path to each file, for a container file
+                with the :class:`~clusterking.data.DataContainer` and the
+                number of the sample.
 
         Example:
 
         .. code-block:: python
 
             def loader(path):
-                d = clusterking.DataWithError(path)
+                d = clusterking.DataWithErrors(path)
                 d.add_rel_err_uncorr(0.01)
                 return d
 
             nsr = NoisySampleResult.load("/path/to/dir/", loader=loader)
 
+            def container_loader(container, i):
+                d = container.get(i, cls=clusterking.DataWithErrors)
+                d.add_rel_err_uncorr(0.01)
+                return d
+
+            nsr = NoisySampleResult.load(
+                "/path/to/samples.sql", loader=container_loader
+            )
+
         """
         directory = Path(directory)
+        if directory.is_file():
+            container = DataContainer(directory)
+            if loader is None:
+                return NoisySampleResult(samples=list(container))
+            return NoisySampleResult(
+                samples=[loader(container, i) for i in range(len(container))]
+            )
         if not directory.is_dir():
             raise FileNotFoundError(
                 "{} does not exist or is not a directory".format(directory)
@@ -93,20 +93,16 @@ class TrivialClusterMatcher(ClusterMatcher):
         ndata2 = data2.copy(deep=True)
 
         # 1. Throw out
-        index_intersection = set(ndata1.df.index).intersection(
-            set(ndata2.df.index)
-        )
+        index_intersection = ndata1.df.index.intersection(ndata2.df.index)
         ndata1.df = ndata1.df.loc[index_intersection]
         ndata2.df = ndata2.df.loc[index_intersection]
 
         # 2. Rename clusters
-        clusters2 = set(ndata2.df[self.cluster_column])
+        # Both dataframes have the same rows in the same order now
+        clusters1 = ndata1.df[self.cluster_column].to_numpy()
         dct = {}
-        for cluster2 in clusters2:
-            mask = ndata2.df[self.cluster_column] == cluster2
-            most_likely = np.argmax(
-                np.bincount(ndata1.df[self.cluster_column][mask])
-            )
+        for cluster2, rows in ndata2.cluster_rows(self.cluster_column).items():
+            most_likely = np.argmax(np.bincount(clusters1[rows]))
             dct[cluster2] = most_likely
 
         ndata2.df[self.cluster_column] = ndata2.df[self.cluster_column].map(dct)
@@ -142,14 +138,13 @@ class FirstComeFirstServe1DClusterMatcher(ClusterMatcher):
         )
 
     def _get_order_of_clusters(self, data: Data) -> Dict[int, int]:
-        cluster2min = {}
-        uclusters = data.df[self.cluster_column].unique()
-        for ucluster in uclusters:
-            cluster2min[ucluster] = data.df[
-                data.df[self.cluster_column] == ucluster
-            ][data.par_cols[0]].min()
+        values = data.df[data.par_cols[0]].to_numpy()
+        cluster2min = {
+            ucluster: values[rows].min()
+            for ucluster, rows in data.cluster_rows(self.cluster_column).items()
+        }
         sorted_mins = sorted(list(cluster2min.values()))
         return {
             ucluster: sorted_mins.index(cluster2min[ucluster])
-            for ucluster in uclusters
+            for ucluster in cluster2min
         }
@@ -3,6 +3,7 @@
 # std
 import unittest
 import tempfile
+from pathlib import Path
 
 # ours
 from clusterking.stability.noisysamplestability import (
@@ -45,6 +46,18 @@ class TestNoisySample(unittest.TestCase):
                 nsr.samples[i].df.to_dict(), nsr_loaded.samples[i].df.to_dict()
             )
 
+        path = Path(self.tmpdir.name) / "samples.sql"
+        nsr.write_container(path, overwrite="raise")
+        nsr_container = NoisySampleResult.load(path)
+        for i in range(2):
+            self.assertDictEqual(
+                nsr.samples[i].df.to_dict(),
+                nsr_container.samples[i].df.to_dict(),
+            )
+            self.assertDictEqual(
+                nsr_loaded.samples[i].md, nsr_container.samples[i].md
+            )
+
         c = KmeansCluster()
         c.set_kmeans_options(n_clusters=2)
         nsst = NoisySampleStabilityTester()
@@ -48,7 +48,7 @@ with (this_dir / "requirements.txt").open() as rf:
     ]
 
 install_requires = [
-    "pandas",
+    "pandas>=3.0",
     "numpy",
     "scipy",
     "gitpython",
@@ -56,11 +56,12 @@ install_requires = [
     "colorlog",
     "wilson",
     "tqdm",
-    "sqlalchemy",
+    "sqlalchemy>=1.4",
 ]
 
 extras_require = {
     "plotting": ["matplotlib"],
+    "arrow": ["pyarrow"],
     "dev": [
         "pytest>=4.4.0",
         "pytest-subtests",